@@ -16,13 +16,13 @@ along with this program.  If not, see https://www.gnu.org/licenses/."""
 
 import sys, argparse
 from slalom_structures import GlobalState, EnrichmentCountType
-from slalom_auxiliar import CustomHelpFormatter, ArgumentProcessor, CSVParser, InputFileProcessor, DataProcessor
+from slalom_auxiliar import CustomHelpFormatter, ArgumentProcessor, CSVParser, InputFileProcessor, DataProcessor, BatchProcessor, MultiPredictionProcessor, AllVsAllProcessor, ShardMerger, Profiler, ProgressReporter
 
 if __name__ != '__main__':
     sys.exit()
 
 #Parsing input arguments
-usage = '%(prog)s [options] [-s SEQ_LEN_DB_FILE] [-m GROUP_MAP_FILE] -a1 ANNO_1_FILE -a2 ANNO_2_FILE -o OUTPUT_FILE'
+usage = '%(prog)s [options] [-s SEQ_LEN_DB_FILE] [-m GROUP_MAP_FILE] -a1 ANNO_1_FILE -a2 ANNO_2_FILE -o OUTPUT_FILE\n       %(prog)s [options] -M MANIFEST_FILE\n       %(prog)s -merge PARTIAL_FILE [PARTIAL_FILE ...] -o OUTPUT_FILE'
 version = '%(prog)s SLALOM version 2.1.4b'
 arg_parser = argparse.ArgumentParser(usage = usage, allow_abbrev = False, formatter_class=CustomHelpFormatter)
 arg_parser._optionals.title = None
@@ -37,27 +37,55 @@ input_alternatives = arg_parser.add_argument_group('Alternative input options')
 input_controls = arg_parser.add_argument_group('Input controls')
 output_files_extra = arg_parser.add_argument_group('Additional output files')
 output_controls = arg_parser.add_argument_group('Output controls')
+batch_options = arg_parser.add_argument_group('Batch and parallel processing')
 other_options = arg_parser.add_argument_group('Other options')
 main_files.add_argument('-s', '--seqlenfile', metavar = 'SEQ_LEN_DB_FILE', dest = 'len_db', type = str, default = '', help = 'Input file with the table of sequence lengths')
 main_files.add_argument('-m', '--mapfile', metavar = 'GROUP_MAP_FILE', dest = 'group_map', type = str, default = '', help = 'Input file with the sequence group mapping')
-main_files.add_argument('-a1', '--anno1file', metavar = 'ANNO_1_FILE', dest = 'anno1', type = str, required = True, help = 'Input file with the first annotation')
-main_files.add_argument('-a2', '--anno2file', metavar = 'ANNO_2_FILE', dest = 'anno2', type = str, required = True, help = 'Input file with the second annotation')
-main_files.add_argument('-o', '--outfile', dest = 'output_file', type = str, required = True, help = 'Output TSV file with calculated similarity/performance measures')
+main_files.add_argument('-a1', '--anno1file', metavar = 'ANNO_1_FILE', dest = 'anno1', type = str, default = '', help = 'Input file with the first annotation')
+main_files.add_argument('-a2', '--anno2file', metavar = 'ANNO_2_FILE', dest = 'anno2', type = str, nargs = '+', default = '',
+                        help = 'Input file with the second annotation; several files, directories or glob patterns evaluate each of them against the first annotation')
+main_files.add_argument('-o', '--outfile', dest = 'output_file', type = str, default = '', help = 'Output TSV file with calculated similarity/performance measures')
 simplified_mode.add_argument('--genbank', dest = 'genbank', action = 'store_true', help = 'Compare a pair of genomes in GenBank format')
 simplified_mode.add_argument('--bed', dest = 'bed', action = 'store_true', help = 'Compare a pair of genomes in BED format')
 operating_mode.add_argument('-b', '--benchmarking', dest = 'benchmark', action = 'store_true', help = 'Treat the first annotation as benchmark (default: the annotations are equal)')
 operating_mode.add_argument('-E', '--enrichment_count', dest = 'enrichment_count', type = EnrichmentCountType, default = 0,
                             help = "If 0: consider the input sites separately - symbol-resolved mode; if positive int: minimal number of sites with occurrence to consider a position enriched - enrichment mode; " +\
                             "if 'gross': count all the occurrencies - gross mode (default: 0)")
+operating_mode.add_argument('-X', '--all_vs_all', dest = 'all_vs_all', action = 'store_true',
+                            help = 'Compare pairwise all the annotations (the first one and every file of the second one) and write the matrices of F1, MCC and Jaccard index to the output file')
+operating_mode.add_argument('-Xs', '--all_vs_all_sites', dest = 'all_vs_all_sites', action = 'store_true', help = 'Add the matrix of site-wise F1 score to the all-vs-all comparison')
 core_controls.add_argument('-Os', '--overlap_symbols', dest = 'overlap_symbols', type = int, default = 1, help = 'Minimal overlaping symbols of a site to be considered as match, [1,inf.)')
 core_controls.add_argument('-Op', '--overlap_part', dest = 'overlap_part', type = float, default = 0.0, help = 'Minimal overlaping part of a site to be considered as match, [0,1]')
 core_controls.add_argument('-Oa', '--overlap_apply', dest = 'overlap_apply', default = 'shortest', choices = ['shortest', 'longest', 'current', 'patched'],
                            help = "Apply the overlapping criteia to the {shortest} of two site, the {longest}, the {current} or the current allowing {patched} matches (default: 'shortest')")
 core_controls.add_argument('-On', '--overlap_nature', dest = 'predictor_nature', default = 'neutral', choices = ['lagging', 'any', 'leading'],
                            help = "Required overlap nature (benchmark mode only): the predictor is {lagging} (predicted sites start not earlier than the benchmark ones), {any} or {leading} (default: 'any')")
+operating_mode.add_argument('-Es', '--enrichment_sweep', dest = 'enrichment_sweep', type = str, default = '',
+                            help = "Comma-delimited list of values or ranges 'start:stop:step' of enrichment counts for the enrichment sweep (enrichment mode only)")
+core_controls.add_argument('-Om', '--overlap_matching', dest = 'overlap_matching', default = 'any', choices = ['any', 'greedy', 'maximal'],
+                           help = "Site matching: a site is matched by {any} sufficiently overlapping site, or one-to-one with the pairs chosen {greedy} by the overlap size or forming a {maximal} (maximum-cardinality) matching (default: 'any')")
+core_controls.add_argument('-Ot', '--overlap_tolerance', dest = 'overlap_tolerance', type = int, default = None,
+                           help = 'Match every site with its nearest site of the other annotation if they are not farther apart than the given number of symbols (or time units) instead of applying the overlapping criteria, [0,inf.)')
+core_controls.add_argument('-Oss', '--overlap_symbols_sweep', dest = 'overlap_symbols_sweep', type = str, default = '',
+                           help = "Comma-delimited list of values or ranges 'start:stop:step' of minimal overlapping symbols for the overlap threshold sweep (default: the value of '-Os')")
+core_controls.add_argument('-Ops', '--overlap_part_sweep', dest = 'overlap_part_sweep', type = str, default = '',
+                           help = "Comma-delimited list of values or ranges 'start:stop:step' of minimal overlapping parts for the overlap threshold sweep (default: the value of '-Op')")
 core_controls.add_argument('-a', '--averaging', dest = 'averaging', default = 'group', choices = ['sequence', 'group', 'dataset'],
                            help = "Averaging of basic measures: {sequence}-wise (macro-macro), {group}-wise (micro-macro) or {dataset}-wise (micro-micro) (default: 'group')")
 core_controls.add_argument('-A', '--adjust_for_seqlen', dest = 'len_adjust', action = 'store_true', help = "Adjust residue counts for the sequence length (default: plain-sum the counts)")
+core_controls.add_argument('-win', '--window', dest = 'window', type = str, default = '',
+                           help = "Size and optionally step 'SIZE[:STEP]' (in symbols or time units) of the sliding windows along every sequence to calculate the residue-wise measures in (default step: SIZE)")
+core_controls.add_argument('-am', '--averaging_modes', dest = 'averaging_modes', type = str, default = '',
+                           help = "Comma-delimited list of additional averaging modes 'MODE[+A][+z]' (e.g. 'sequence,dataset+A'), each written to the output file name suffixed with the mode")
+core_controls.add_argument('-B', '--bootstrap', dest = 'bootstrap', type = int, default = 0,
+                           help = 'Number of bootstrap resamples of the groups (or the sequences of non-grouped data) for the confidence intervals of the dataset-wide averages (see the option -obs)')
+core_controls.add_argument('-Bs', '--bootstrap_seed', dest = 'bootstrap_seed', type = int, default = 0, help = 'Seed of the random number generator for the bootstrap resamples (default: 0)')
+core_controls.add_argument('-Bl', '--bootstrap_level', dest = 'bootstrap_level', type = float, default = 0.95, help = 'Confidence level of the bootstrap confidence intervals, (0,1) (default: 0.95)')
+core_controls.add_argument('-R', '--permutations', dest = 'permutations', type = int, default = 0,
+                           help = 'Number of random relocations of the sites of the second annotation within every sequence for the permutation test of the dataset-wide averages (see the option -opm)')
+core_controls.add_argument('-Rs', '--permutation_seed', dest = 'permutation_seed', type = int, default = 0, help = 'Seed of the random number generator for the permutations (default: 0)')
+core_controls.add_argument('-Rk', '--permutation_keep', dest = 'permutation_keep', default = 'lengths', choices = ['lengths', 'gaps'],
+                           help = "Relocate every site independently keeping its {lengths} or shift all the sites of a sequence together keeping also the {gaps} between them (default: 'lengths')")
 input_format.add_argument('-sd', '--seqlenfile_delim', dest = 'len_db_delimiter', type = str, default = '\t', help = 'Delimiter in the sequensc length table (default: <tab>)')
 input_format.add_argument('-sh', '--seqlenfile_headers', dest = 'len_db_headers', type = int, default = 0, help = 'Number of header lines to discard in the sequence length table')
 input_format.add_argument('-sc', '--seqlenfile_colnumbers', dest = 'len_db_columns', type = str, default  = '',
@@ -65,7 +93,7 @@ input_format.add_argument('-sc', '--seqlenfile_colnumbers', dest = 'len_db_colum
 input_format.add_argument('-sq', '--seqlenfile_quotes', dest = 'len_db_quotes', action = 'store_true', help = "Read in quotes from the sequence length table (default: ignore quotes)")
 input_format.add_argument('-md', '--mapfile_delim', dest = 'group_map_delimiter', type = str, default = '\t', help = 'Delimiter in the group map file (default: <tab>)')
 input_format.add_argument('-mh', '--mapfile_headers', dest = 'group_map_headers', type = int, default = 0, help = 'Number of header lines to discard in the group map file')
-input_format.add_argument('-mc', '--mapfile_colnumbers', dest = 'group_map_columns', type = str, default  = '1,2', help = "Column numbers (starting from 1) with SID and GID in the group map file (default: '1,2')")
+input_format.add_argument('-mc', '--mapfile_colnumbers', dest = 'group_map_columns', type = str, default  = '1,2', help = "Column numbers (starting from 1) with SID and GID, optionally followed by the GIDs of the higher hierarchy levels, in the group map file (default: '1,2')")
 input_format.add_argument('-mq', '--mapfile_quotes', dest = 'group_map_quotes', action = 'store_true', help = "Read in quotes from the group map file (default: ignore quotes)")
 input_format.add_argument('-a1d', '--anno1file_delim', dest = 'anno1_delimiter', type = str, default = '\t', help = 'Delimiter in the first annotation file (default: <tab>)')
 input_format.add_argument('-a1h', '--anno1file_headers', dest = 'anno1_headers', type = int, default = 0, help = 'Number of header lines to discard in the first annotation file')
@@ -89,6 +117,8 @@ input_alternatives.add_argument('-sg', '--sequences_as_groups', dest = 'sequence
 input_alternatives.add_argument('-nOg', '--non_overlapping_groups', dest = 'non_overlapping_groups', action = 'store_true',
                                 help = "The group mapping contains only non-overlapping groups (GIDs in the annotation files must not be provided)")
 input_controls.add_argument('-n', '--site_names', dest = 'site_names', action = 'store_true', help = "Read in SCE names in addition")
+input_controls.add_argument('-np', '--site_name_patterns', metavar = 'PATTERN', dest = 'site_name_patterns', type = str, nargs = '+', default = [],
+                            help = 'Regular expressions grouping the site names for the site name breakdown (default: every site name separately)')
 input_controls.add_argument('-t', '--time_unit', dest = 'time_unit', default = 'none', choices = ['none', 'sec', 'min', 'hour', 'day'], help = "Time unit if the sequences are time series (default: 'none')")
 input_controls.add_argument('-a1r', '--anno1file_resolve', dest = 'anno1_resolve_overlaps', default = 'all', choices = ['all', 'first', 'last', 'merge'],
                             help = "Resolve overlaps within the first annotation: leave {all} sites, only the {first} one, only the {last} one, or {merge} overlapping sites (default: 'all')")
@@ -101,6 +131,12 @@ input_controls.add_argument('-a2es', '--anno2file_end_shift', dest = 'anno2_end_
 input_controls.add_argument('-e', '--end_overflow_policy', dest = 'end_overflow_policy', default = 'forbid', choices = ['forbid', 'trim', 'ignore', 'circular'],
                             help = "Policy on overflowing site ends: {forbid}, {ignore} site, {trim} it or treat sequences as {circular} (default: 'forbid')")
 input_controls.add_argument('-z', '--zero_for_na', dest = 'na_zeros', action = 'store_true', help = 'Treat NA values as zeros while calculating averages')
+input_controls.add_argument('-gsel', '--groups', metavar = 'GID', dest = 'selected_groups', type = str, nargs = '+', default = [],
+                            help = 'Process only the given groups, reading only the annotation records of their sequences')
+input_controls.add_argument('-ssel', '--sequences', metavar = 'SID', dest = 'selected_sequences', type = str, nargs = '+', default = [],
+                            help = 'Process only the given sequences, reading only their annotation records')
+input_controls.add_argument('-sidx', '--sid_index', dest = 'sid_index', action = 'store_true',
+                            help = "Seek the annotation records of the selected groups and sequences by the byte offsets kept in the SID index files 'ANNOTATION_FILE.sidx', built at the first use and rebuilt if the annotation file changes (efficient for annotation files sorted by SID)")
 input_controls.add_argument('-min', '--min_group_size', dest = 'min_group_size', type = int, default = 1, help = 'Minimal size (number of sequences) of a group')
 input_controls.add_argument('-max', '--max_group_size', dest = 'max_group_size', type = int, default = 0, help = 'Maximal size (number of sequences) of a group (0=infinity)')
 input_controls.add_argument('-d', '--detect', dest = 'detect', default = 'none', choices = ['none', 'strand', 'frame'], help = "Detect {strand} or reading {frame} (GenBank of BED input only) (default; 'none')")
@@ -112,26 +148,95 @@ output_files_extra.add_argument('-oc1', '--outfile_complement_1', dest = 'output
 output_files_extra.add_argument('-oc2', '--outfile_complement_2', dest = 'output_file_complement2', type = str, default = '', help = 'Output TSV file with the complement of the second annotation')
 output_files_extra.add_argument('-ore1', '--outfile_rel_enrichment_1', dest = 'output_file_re1', type = str, default = '', help = 'Output TSV file with the sites of relative enrichement in the first annotation')
 output_files_extra.add_argument('-ore2', '--outfile_rel_enrichment_2', dest = 'output_file_re2', type = str, default = '', help = 'Output TSV file with the sites of relative enrichement in the second annotation')
+output_files_extra.add_argument('-osw', '--outfile_sweep', dest = 'output_file_sweep', type = str, default = '',
+                                help = 'Output TSV file with the dataset-wide statistics for the grid of overlap thresholds or enrichment counts (see the options -Oss, -Ops and -Es)')
+output_files_extra.add_argument('-on', '--outfile_names', dest = 'output_file_names', type = str, default = '',
+                                help = 'Output TSV file with the dataset-wide statistics calculated separately for every site name or name pattern (see the option -np)')
+output_files_extra.add_argument('-ow', '--outfile_windows', dest = 'output_file_windows', type = str, default = '',
+                                help = 'Output TSV file with the residue-wise statistics for every sliding window of every sequence (see the option -win)')
+output_files_extra.add_argument('-odi', '--outfile_distances', dest = 'output_file_distances', type = str, default = '',
+                                help = 'Output TSV file with the distribution of the distances between the matched sites and their nearest partners (see the option -Ot)')
+output_files_extra.add_argument('-obs', '--outfile_bootstrap', dest = 'output_file_bootstrap', type = str, default = '',
+                                help = 'Output TSV file with the percentile bootstrap confidence intervals of the dataset-wide averages (see the option -B)')
+output_files_extra.add_argument('-opm', '--outfile_permutations', dest = 'output_file_permutations', type = str, default = '',
+                                help = 'Output TSV file with the z-scores and the empirical p-values of the dataset-wide averages under the permutation test (see the option -R)')
+output_files_extra.add_argument('-oj', '--outfile_jsonl', dest = 'output_file_jsonl', type = str, default = '',
+                                help = 'Output JSON Lines file with the measure descriptions, the group-wise performance measures and the dataset-wide averages and sums in full precision')
+output_files_extra.add_argument('-onp', '--outfile_npz', dest = 'output_file_npz', type = str, default = '',
+                                help = 'Output NumPy archive (.npz) with the measure descriptions, the group-wise performance measures and the dataset-wide averages and sums in full precision')
+output_files_extra.add_argument('-opq', '--outfile_parquet', dest = 'output_file_parquet', type = str, default = '',
+                                help = 'Output Parquet file with the group-wise performance measures and the dataset-wide averages and sums in full precision (requires pyarrow)')
+output_controls.add_argument('-odl', '--outfile_detailed_level', dest = 'detailed_level', default = 'site', choices = ['group', 'sequence', 'site'],
+                             help = "Level of detail of the detailed output file: group summaries only ({group}), symbol and site counts for every sequence ({sequence}) or every site as well ({site}) (default: 'site')")
+output_controls.add_argument('-odf', '--outfile_detailed_format', dest = 'detailed_format', default = 'text', choices = ['text', 'tsv', 'jsonl'],
+                             help = "Format of the detailed output file: sentences ({text}) or one event per TSV row ({tsv}) or JSON record ({jsonl}) (default: 'text')")
 output_controls.add_argument('-osd', '--outfile_sites_diff', dest = 'site_difference', default = 'all', choices = ['all', 'matched', 'unmatched', 'discrepant'],
                              help = "Limit site-wise statics to {matched}, {unmatched} or {discrepant} sites (default: 'all')")
 output_controls.add_argument('-c', '--clean', dest = 'clean', action = 'store_true', help = 'Produce cleaned output TSV (without comments and averaged values)')
 output_controls.add_argument('-sort', '--sort_output', dest = 'sort_output', action = 'store_true', help = 'Sort the main output table by GID')
 output_controls.add_argument('-sum', '--calculate_sums', dest = 'calculate_sums', action = 'store_true', help = 'Calculate sums in addition to averages for counts')
+batch_options.add_argument('-M', '--manifest', dest = 'manifest', type = str, default = '',
+                           help = 'TSV or JSON file listing comparison jobs, one set of command line options per job; the options given directly are shared by all the jobs')
+batch_options.add_argument('-shard', '--shard', dest = 'shard', type = str, default = '',
+                           help = "Process only the K-th of N shards of the groups ('K/N') and save the partial results to the output file to be merged later")
+batch_options.add_argument('-merge', '--merge', metavar = 'PARTIAL_FILE', dest = 'merge', type = str, nargs = '+', default = [],
+                           help = 'Merge the partial result files of all the shards into the output file of a full run')
+batch_options.add_argument('-P', '--processes', dest = 'processes', type = int, default = 1, help = 'Number of worker processes (default: 1)')
+other_options.add_argument('-engine', '--engine', dest = 'engine', default = 'reference', choices = ['reference', 'indexed', 'differential'],
+                           help = "Calculation engine: the per-symbol {reference} one, the {indexed} one based on precomputed annotation coverage or both of them with the outputs of the reference one and the basic measures of every sequence compared, stopping at the first divergence {differential} (default: 'reference')")
+other_options.add_argument('-prof', '--profile', dest = 'profile_file', type = str, default = '',
+                           help = 'Output JSON file with the wall-clock time, CPU time and peak memory of every processing phase and the numbers of processed sequences, symbols and sites (a summary line is printed as well)')
+other_options.add_argument('-profm', '--profile_memory', dest = 'profile_memory', default = 'rss', choices = ['rss', 'tracemalloc'],
+                           help = "Peak memory measure of the profile: the peak resident set size of the process ({rss}) or the peak memory allocated by Python traced in every phase ({tracemalloc}, slower) (default: 'rss')")
+other_options.add_argument('-profg', '--profile_groups', dest = 'profile_groups', action = 'store_true', help = 'Add the time and the numbers of processed sequences, symbols and sites of every group to the profile')
+other_options.add_argument('-pr', '--progress', dest = 'progress', default = '', choices = ['text', 'jsonl'],
+                           help = "Report to stderr the processed groups and sequences, the symbols and sites processed per second and the estimated remaining time as human-readable lines ({text}) or JSON Lines ({jsonl}) (default: no reporting)")
+other_options.add_argument('-pri', '--progress_interval', dest = 'progress_interval', type = float, default = 10.0, help = 'Minimal interval in seconds between the progress reports (default: 10)')
+other_options.add_argument('-ckpt', '--checkpoint', dest = 'checkpoint_file', type = str, default = '',
+                           help = 'Checkpoint file to save the results of the completed groups and the offsets of the output files to, periodically, so that an interrupted run can be resumed; it is removed when the run is completed')
+other_options.add_argument('-ckpti', '--checkpoint_interval', dest = 'checkpoint_interval', type = float, default = 60.0,
+                           help = 'Minimal interval in seconds between the checkpoints; 0 - after every group (default: 60)')
+other_options.add_argument('-resume', '--resume', dest = 'resume', action = 'store_true',
+                           help = 'Resume an interrupted run with the same options from its checkpoint, skipping the completed groups (if the checkpoint file does not exist, the run is started from the beginning)')
 other_options.add_argument('-preparse', '--preparse_mapfile', dest = 'preparse_group_map', action = 'store_true', help = 'Preparse the group mapping before parsing the sequence length table file')
 other_options.add_argument('-w', '--warning_level', dest = 'warnings', type = int, default = 1, help = 'Warnings level: 0 - no warnings, 1- standard')
 other_options.add_argument('-q', '--quiet', dest = 'quiet', action = 'store_true', help = 'Quiet run: do not print progress')
 arg_processor = ArgumentProcessor(arg_parser)
 opt = arg_processor.prepare_input_options()
-global_state = GlobalState(opt)
 
-#Parsing input files
-file_parser = CSVParser(opt, global_state)
-input_file_processor = InputFileProcessor(opt, file_parser)
-input_data = input_file_processor.process_input_files()
+if opt.merge:
+    #Merging the partial results of the shards
+    shard_merger = ShardMerger(opt)
+    shard_merger.process()
+elif opt.manifest:
+    #Processing the batch of jobs listed in the manifest
+    batch_processor = BatchProcessor(opt, arg_processor)
+    batch_processor.process()
+elif opt.all_vs_all:
+    #Comparing all the annotations pairwise
+    all_vs_all_processor = AllVsAllProcessor(opt, arg_processor)
+    all_vs_all_processor.process()
+elif len(opt.anno2_files) > 1:
+    #Evaluating several predictions against the first annotation
+    multi_prediction_processor = MultiPredictionProcessor(opt, arg_processor)
+    multi_prediction_processor.process()
+else:
+    global_state = GlobalState(opt)
+    if opt.profile_file:
+        global_state.profiler = Profiler(opt)
+    if opt.progress:
+        global_state.progress = ProgressReporter(opt)
 
-#Processing data
-data_processor = DataProcessor(opt, global_state, input_data)
-data_processor.process()
+    #Parsing input files
+    file_parser = CSVParser(opt, global_state)
+    input_file_processor = InputFileProcessor(opt, file_parser)
+    input_data = input_file_processor.process_input_files()
+
+    #Processing data
+    data_processor = DataProcessor(opt, global_state, input_data)
+    data_processor.process()
+    if global_state.profiler is not None:
+        global_state.profiler.write()
 
 if not opt.quiet:
     print('Finished!')
\ No newline at end of file
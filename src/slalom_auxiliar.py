@@ -14,10 +14,19 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see https://www.gnu.org/licenses/."""
 
-import os, sys, re, math, datetime, time, copy, linecache, argparse
+import os, sys, re, math, datetime, time, copy, linecache, argparse, shlex, json, glob, hashlib, multiprocessing, heapq, itertools, tracemalloc
 import numpy as np
 from operator import itemgetter
-from slalom_structures import DefaultOrderedDict, InputData, CurrentSequence, BasicBooleanMeasures, BasicEnrichmentMeasures, PerformanceMeasures, FileHandlers, EnrichmentCountType
+from collections import defaultdict
+try:
+    import pyarrow, pyarrow.parquet
+except ImportError:
+    pyarrow = None
+try:
+    import resource
+except ImportError:
+    resource = None
+from slalom_structures import DefaultOrderedDict, InputData, CurrentSequence, BasicBooleanMeasures, BasicEnrichmentMeasures, PerformanceMeasures, FileHandlers, EnrichmentCountType, GlobalState
 
 def error(message):
     """Function for error reporting"""
@@ -25,6 +34,17 @@ def error(message):
     sys.stderr.flush()
     sys.exit(1)
 
+def open_output_file(filepath, offset = None, buffering = -1):
+    """Function to open an output file for writing or, if an offset is given, to reopen it truncated at the offset to continue an interrupted run"""
+    if offset is None:
+        return open(filepath, 'w', buffering = buffering)
+    if (not os.path.isfile(filepath)) or (os.path.getsize(filepath) < offset):
+        error('The output file "{}" is missing or shorter than recorded in the checkpoint'.format(filepath))
+    file_handler = open(filepath, 'r+', buffering = buffering)
+    file_handler.seek(offset)
+    file_handler.truncate()
+    return file_handler
+
 class CustomHelpFormatter(argparse.HelpFormatter):
     def _format_action_invocation(self, action):
         if not action.option_strings:
@@ -116,7 +136,7 @@ class BEDMethods:
                 if BEDMethods.frame_regex.search(SID):
                     error('If strand detection in BED files is enabled, chromosome names ending with "{}" are not allowed'.format(SID[-2: ]))
                 for frame in range(1, 4):
-                    seq_len_db[SID + sign + frame] = seq_length
+                    seq_len_db[SID + sign + str(frame)] = seq_length
             else:
                 seq_len_db[SID + sign] = seq_length
     def gen_record(file_obj, detect_strand, detect_frame, site_names, seq_len_map = None):
@@ -133,7 +153,8 @@ class BEDMethods:
                     if strand not in ('+', '-'):
                         error('Error while parsing the line {} of the file "{}". The strand must be eithe \'+\' or \'-\''.format(line_idx + 1, file_obj.name))
                     if detect_frame:
-                        if strand == '+':
+                        strand_forward = strand == '+'
+                        if strand_forward:
                             begin_idx = int(fields[1])
                         else:
                             end_res = int(fields[2])
@@ -144,14 +165,66 @@ class BEDMethods:
                     SID += '{:+d}'.format(reminder * (1 if strand == '+' else -1)) if detect_frame else strand
                 yield line_idx, '{}\t{}\t{}{}'.format(SID, fields[1], fields[2], ('\t' + fields[3]) if site_names else '')
             except IndexError:
-                errot('Error while parsing the line {} of the file "{}". Not enough columns'.format(line_idx + 1, file_obj.name))
+                error('Error while parsing the line {} of the file "{}". Not enough columns'.format(line_idx + 1, file_obj.name))
+
+class SIDIndex:
+    """Class to hold the byte offsets of the runs of consecutive lines with the same SID in an annotation file, kept in a file next to it and rebuilt if the file or its format options change"""
+    version = 1
+    def __init__(self, filepath, key):
+        self.filepath = filepath
+        self.index_filepath = filepath + '.sidx'
+        file_stat = os.stat(filepath)
+        self.key = dict(key, version = SIDIndex.version, size = file_stat.st_size, mtime_ns = file_stat.st_mtime_ns)
+        self.ranges = None
+    def load(self):
+        """Method to read the index file if it matches the annotation file and its format options"""
+        try:
+            with open(self.index_filepath, 'r') as ifile:
+                index = json.load(ifile)
+        except (OSError, ValueError, UnicodeDecodeError):
+            return False
+        if (not isinstance(index, dict)) or (index.get('key') != self.key) or (not isinstance(index.get('ranges'), dict)):
+            return False
+        self.ranges = index['ranges']
+        return True
+    def build(self, get_SID, headers_n, encoding):
+        """Method to build the index in one pass over the annotation file and to save it, returning whether it could be saved"""
+        self.ranges = defaultdict(list)
+        offset = 0
+        last_SID = None
+        with open(self.filepath, 'rb') as ifile:
+            for i in range(headers_n):
+                offset += len(ifile.readline())
+            for line_idx, line in enumerate(ifile):
+                SID = get_SID(line.decode(encoding).replace('\r\n', '\n'))
+                if SID == last_SID:
+                    self.ranges[SID][-1][2] += 1
+                else:
+                    self.ranges[SID].append([offset, line_idx, 1])
+                    last_SID = SID
+                offset += len(line)
+        try:
+            with open(self.index_filepath, 'w') as ofile:
+                json.dump({'key': self.key, 'ranges': self.ranges}, ofile, separators = (',', ':'))
+        except OSError:
+            return False
+        return True
+    def gen_lines(self, ifile, SIDs):
+        """Generator of the numbers and the contents of the lines with given SIDs, in the order of the file"""
+        for offset, line_idx, lines_n in sorted(x for SID in SIDs for x in self.ranges.get(SID, [])):
+            ifile.seek(offset)
+            for k in range(lines_n):
+                yield line_idx + k, ifile.readline()
 
 class ArgumentValidator:
     """Class that contain means to command line argument validation"""
     prefixes = {'s': 'len_db', 'm': 'group_map', 'a1': 'anno1', 'a2': 'anno2'}
     suffixes = {'d': 'delimiter', 'h': 'headers', 'c': 'columns', 'q': 'quotes', 'bs': 'begin_shift', 'es': 'end_shift'}
-    misc_keys = {'-Os': 'overlap_symbols', '-Op': 'overlap_part', '-max': 'max_group_size', '-w': 'warnings', '-l': 'seq_len'}
+    misc_keys = {'-Os': 'overlap_symbols', '-Op': 'overlap_part', '-max': 'max_group_size', '-w': 'warnings', '-l': 'seq_len', '-P': 'processes', '-Oss': 'overlap_symbols_sweep', '-Ops': 'overlap_part_sweep', '-Es': 'enrichment_sweep',
+                 '-B': 'bootstrap', '-Bs': 'bootstrap_seed', '-R': 'permutations', '-Rs': 'permutation_seed'}
     nonnegative_int_regex = re.compile('^\+?\d+$')
+    shard_regex = re.compile('^(\d+)/(\d+)$')
+    window_regex = re.compile('^(\d+)(?::(\d+))?$')
     def __init__(self, opt):
         self.opt = opt
         self.file_control_regex = '-({})({})'.format('|'.join(self.prefixes), '|'.join(self.suffixes))
@@ -175,6 +248,31 @@ class ArgumentValidator:
             error('Column numbers in the annotation files cannot be changed in simplified (GenBank or BED) modes')
         if self.opt.genbank and ((getattr(self.opt, self.misc_keys['-l']) > 0) or (self.opt.len_db)):
             error('Sequence lenght must not be provided in the simplified GenBank mode. This information will be read from the annotation files')
+    def expand_annotation_files(self):
+        """Method to expand the directories and glob patterns given for the second annotation into the list of files"""
+        values = self.opt.anno2 if isinstance(self.opt.anno2, list) else ([self.opt.anno2] if self.opt.anno2 else [])
+        self.opt.anno2_files = []
+        for value in values:
+            if os.path.isdir(value):
+                self.opt.anno2_files.extend(sorted(os.path.join(value, x) for x in os.listdir(value) if (not x.startswith('.')) and os.path.isfile(os.path.join(value, x))))
+            elif glob.has_magic(value):
+                fnames = sorted(x for x in glob.glob(value) if os.path.isfile(x))
+                if not fnames:
+                    error('No files match the pattern "{}" given for the second annotation'.format(value))
+                self.opt.anno2_files.extend(fnames)
+            else:
+                self.opt.anno2_files.append(value)
+        if values and (not self.opt.anno2_files):
+            error('No files with the second annotation are found')
+        self.opt.anno2 = self.opt.anno2_files[0] if self.opt.anno2_files else ''
+    def validate_required_options(self):
+        """Method to check that the obligatory input and output files are provided"""
+        if not self.opt.anno1:
+            error('Input file with the first annotation is not provided')
+        if not self.opt.anno2:
+            error('Input file with the second annotation is not provided')
+        if not self.opt.output_file:
+            error('Output file is not provided')
     def preliminary_set_the_internal_parameters(self):
         """Method for setting the iternal options relevant for the simplified modes on the basis of user input"""
         self.opt.detect_strand = True if self.opt.detect != 'none' else False
@@ -222,8 +320,9 @@ class ArgumentValidator:
                 error('Input file with the sequence group mapping does not exist')
         if not os.path.isfile(self.opt.anno1):
             error('Input file with the first annotation does not exist')
-        if not os.path.isfile(self.opt.anno2):
-            error('Input file with the second annotation does not exist')
+        for fname in self.opt.anno2_files:
+            if not os.path.isfile(fname):
+                error('Input file with the second annotation "{}" does not exist'.format(fname))
     def validate_file_column_numbers(self):
         """Method to check for validity the options listing column numbers in the files"""
         for key in ('-sc', '-mc', '-a1c', '-a2c'):
@@ -232,7 +331,7 @@ class ArgumentValidator:
             if key == '-mc':
                 if not self.opt.group_map:
                     continue
-                n = 2
+                n = max(value.count(',') + 1, 2)
             elif key == '-sc':
                 if not self.opt.len_db:
                     continue
@@ -269,6 +368,64 @@ class ArgumentValidator:
                     error("Invalid format for the option '{}'. Expected a positive integer".format(key))
             if default_:
                 self._set_file_control_option_value(key, value)
+    def _parse_value_list(self, key, value, type_):
+        """Method to parse a comma-delimited list of values, each being either a single value or an inclusive range 'start:stop:step'"""
+        values = []
+        for item in value.split(','):
+            try:
+                bounds = [type_(x) for x in item.split(':')]
+            except ValueError:
+                error("Invalid value for the option '{}'. Expected a comma-delimited list of values or ranges 'start:stop:step'".format(key))
+            if len(bounds) == 1:
+                values.extend(bounds)
+            elif (len(bounds) == 3) and (bounds[2] > 0) and (bounds[0] <= bounds[1]):
+                steps_n = int(math.floor((bounds[1] - bounds[0]) / bounds[2] + 1e-9))
+                values.extend(type_(round(bounds[0] + k * bounds[2], 10)) for k in range(steps_n + 1))
+            else:
+                error("Invalid range '{}' for the option '{}'. Expected 'start:stop:step' with a positive step".format(item, key))
+        return sorted(set(values))
+    def parse_value_lists(self):
+        """Method to convert the options listing multiple values into lists"""
+        self.opt.enrichment_sweep = self._parse_value_list('-Es', self.opt.enrichment_sweep, int) if self.opt.enrichment_sweep else []
+        self.opt.overlap_symbols_sweep = self._parse_value_list('-Oss', self.opt.overlap_symbols_sweep, int) if self.opt.overlap_symbols_sweep else []
+        self.opt.overlap_part_sweep = self._parse_value_list('-Ops', self.opt.overlap_part_sweep, float) if self.opt.overlap_part_sweep else []
+    def parse_averaging_modes(self):
+        """Method to convert the list of additional averaging modes into the tuples of the averaging, length adjustment and NA treatment"""
+        averaging_modes = []
+        for value in self.opt.averaging_modes.split(',') if self.opt.averaging_modes else []:
+            parts = value.strip().split('+')
+            if (parts[0] not in ('sequence', 'group', 'dataset')) or (not set(parts[1: ]) <= {'A', 'z'}) or (len(set(parts[1: ])) < len(parts) - 1):
+                error("Invalid averaging mode '{}' for the option '-am'. Expected 'MODE[+A][+z]' with MODE being 'sequence', 'group' or 'dataset'".format(value))
+            averaging_mode = (parts[0], 'A' in parts[1: ], 'z' in parts[1: ])
+            if (averaging_mode[0] == 'sequence') and averaging_mode[1]:
+                error("Invalid averaging mode '{}' for the option '-am'. Sequence length adjustment is not applicable under sequence-wise averaging".format(value))
+            if (averaging_mode != (self.opt.averaging, self.opt.len_adjust, self.opt.na_zeros)) and (averaging_mode not in averaging_modes):
+                averaging_modes.append(averaging_mode)
+        self.opt.averaging_modes = averaging_modes
+    def parse_shard(self):
+        """Method to convert the shard specification into the tuple of the shard number and the number of shards"""
+        if not self.opt.shard:
+            self.opt.shard = None
+            return
+        regex_search = ArgumentValidator.shard_regex.search(self.opt.shard)
+        if not regex_search:
+            error("Invalid value for the option '-shard'. Expected 'K/N'")
+        self.opt.shard = (int(regex_search.group(1)), int(regex_search.group(2)))
+        if not (1 <= self.opt.shard[0] <= self.opt.shard[1]):
+            error("Invalid value for the option '-shard'. The shard number K must be in the range [1,N]")
+    def parse_window(self):
+        """Method to convert the sliding window specification into the tuple of the window size and step"""
+        if not self.opt.window:
+            self.opt.window = None
+            return
+        regex_search = ArgumentValidator.window_regex.search(self.opt.window)
+        if not regex_search:
+            error("Invalid value for the option '-win'. Expected 'SIZE[:STEP]'")
+        size = int(regex_search.group(1))
+        step = int(regex_search.group(2)) if regex_search.group(2) else size
+        if (size == 0) or (step == 0):
+            error("Invalid value for the option '-win'. The window size and step must be positive")
+        self.opt.window = (size, step)
     def validate_delimiters(self):
         """Method to check for validity the delimiters for the input files"""
         regex = re.compile('''^[ \t,;.:/]?$''')
@@ -281,7 +438,7 @@ class ArgumentValidator:
         for key in ('-sh', '-mh', '-a1h', '-a2h'):
             if self._get_file_control_option_value(key) < 0:
                 error("Invalid value for the option '{}'. Expected a non-negative integer".format(key))
-        for key in ('-l', '-max'):
+        for key in ('-l', '-max', '-B', '-Bs', '-R', '-Rs'):
             if getattr(self.opt, self.misc_keys[key]) < 0:
                 error("Invalid value for the option '{}'. Expected a non-negative integer".format(key))
         for key in ('-Os', ):
@@ -291,10 +448,30 @@ class ArgumentValidator:
             value = getattr(self.opt, self.misc_keys[key])
             if (value < 0.0) or (value > 1.0):
                 error("Invalid value for the option '{}'. Expected a value in range [0,1]".format(key))
+        for key in ('-Oss', ):
+            if any(x < 1 for x in getattr(self.opt, self.misc_keys[key])):
+                error("Invalid value for the option '{}'. Expected positive integers".format(key))
+        for key in ('-Es', ):
+            if any(x < 1 for x in getattr(self.opt, self.misc_keys[key])):
+                error("Invalid value for the option '{}'. Expected positive integers".format(key))
+        if (self.opt.overlap_tolerance is not None) and (self.opt.overlap_tolerance < 0):
+            error("Invalid value for the option '-Ot'. Expected a non-negative integer")
+        if (self.opt.bootstrap_level <= 0.0) or (self.opt.bootstrap_level >= 1.0):
+            error("Invalid value for the option '-Bl'. Expected a value in range (0,1)")
+        if self.opt.progress_interval <= 0.0:
+            error("Invalid value for the option '-pri'. Expected a positive value")
+        if self.opt.checkpoint_interval < 0.0:
+            error("Invalid value for the option '-ckpti'. Expected a non-negative value")
+        for key in ('-Ops', ):
+            if any((x < 0.0) or (x > 1.0) for x in getattr(self.opt, self.misc_keys[key])):
+                error("Invalid value for the option '{}'. Expected values in range [0,1]".format(key))
         for key in ('-w', ):
             value = getattr(self.opt, self.misc_keys[key])
             if (value < 0) or (value > 1):
                 error("Invalid value for the option '{}'. Expected an integer in range [0,1]".format(key))
+        for key in ('-P', ):
+            if getattr(self.opt, self.misc_keys[key]) < 1:
+                error("Invalid value for the option '{}'. Expected a positive integer".format(key))
     def validate_logic(self):
         """Method to validate the logic of the interplay of different parameters"""
         present = False
@@ -367,6 +544,102 @@ class ArgumentValidator:
             error('Lagging or leading predictor nature is not compatible with circular sequences')
         if self.opt.circular and (self.opt.time_unit != 'none'):
             error('Time series cannot be circular')
+        if (self.opt.overlap_symbols_sweep or self.opt.overlap_part_sweep or self.opt.enrichment_sweep) and (not self.opt.output_file_sweep):
+            error('The output file for the threshold sweep must be provided if the threshold lists are given')
+        if (self.opt.overlap_symbols_sweep or self.opt.overlap_part_sweep) and self.opt.enrichment_count:
+            error('The overlap threshold sweep is applicable only in symbol-resolved and gross modes')
+        if self.opt.enrichment_sweep and ((not self.opt.enrichment_count) or self.opt.gross):
+            error('The enrichment count sweep is applicable only in enrichment mode')
+        if self.opt.all_vs_all_sites and (not self.opt.all_vs_all):
+            error('The site-wise all-vs-all matrix can be calculated only in the all-vs-all mode')
+        if self.opt.all_vs_all:
+            if self.opt.benchmark or self.opt.enrichment_count or self.opt.gross:
+                error('The all-vs-all comparison is applicable only in symbol-resolved mode without a benchmark')
+            if any(getattr(self.opt, 'output_file_' + x) for x in FileHandlers.output_file_types + ('sweep', 'names', 'windows', 'distances', 'bootstrap', 'permutations') + StructuredOutput.formats):
+                error('Only the main output file is written in the all-vs-all mode')
+            if (not (self.opt.len_db or self.opt.group_map)) or self.opt.sequences_as_groups:
+                error('The all-vs-all comparison requires the sequences to be defined independently of the annotations by a sequence length table or a group mapping file')
+            if self.opt.all_vs_all_sites and ((self.opt.overlap_apply == 'patched') or (self.opt.overlap_matching != 'any') or (self.opt.overlap_tolerance is not None)):
+                error('The site-wise all-vs-all matrix is applicable only if a site is matched by any sufficiently overlapping site of the other annotation')
+            if len(self.opt.anno2_files) + 1 > AllVsAllProcessor.max_annotations_n:
+                error('Maximal number of annotations compared all-vs-all is {}'.format(AllVsAllProcessor.max_annotations_n))
+        if self.opt.shard is not None:
+            if not self.opt.grouped:
+                error('Only grouped data can be processed in shards')
+            if any(getattr(self.opt, 'output_file_' + x) for x in FileHandlers.output_file_types + ('sweep', 'names', 'windows', 'distances', 'bootstrap', 'permutations') + StructuredOutput.formats):
+                error('Only the main output file with the partial results is written while processing a shard')
+            if (len(self.opt.anno2_files) > 1) or self.opt.all_vs_all:
+                error('Several files with the second annotation cannot be processed in shards')
+            if self.opt.averaging_modes:
+                error('Additional averaging modes are not supported while processing a shard')
+            if self.opt.group_map_columns.count(',') > 1:
+                error('Higher levels of the group hierarchy are not supported while processing a shard')
+        if self.opt.overlap_tolerance is not None:
+            if self.opt.enrichment_count:
+                error('Tolerance matching is applicable only in symbol-resolved and gross modes')
+            if self.opt.overlap_symbols_sweep or self.opt.overlap_part_sweep:
+                error('The overlap threshold sweep is not applicable to tolerance matching')
+            if self.opt.predictor_nature != 'neutral':
+                error('Lagging or leading predictor nature is not applicable to tolerance matching')
+        elif self.opt.output_file_distances:
+            error('The distribution of the match distances can be calculated only with tolerance matching')
+        if self.opt.overlap_matching != 'any':
+            if self.opt.enrichment_count:
+                error('One-to-one site matching is applicable only in symbol-resolved and gross modes')
+            if (self.opt.overlap_apply == 'patched') or (self.opt.overlap_tolerance is not None):
+                error('One-to-one site matching is not applicable to patched matches or tolerance matching')
+            if self.opt.overlap_symbols_sweep or self.opt.overlap_part_sweep:
+                error('The overlap threshold sweep is not applicable to one-to-one site matching')
+        if (self.opt.window is not None) != bool(self.opt.output_file_windows):
+            error('The sliding window size and the output file for the sliding windows must be provided together')
+        if self.opt.output_file_names and (not self.opt.site_names):
+            error('The site name breakdown requires site names to be read in')
+        if self.opt.site_name_patterns and (not self.opt.output_file_names):
+            error('The output file for the site name breakdown must be provided if the site name patterns are given')
+        for pattern in self.opt.site_name_patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                error('Invalid site name pattern "{}": {}'.format(pattern, str(e)))
+        if self.opt.profile_file and ((len(self.opt.anno2_files) > 1) or self.opt.all_vs_all):
+            error('Profiling is supported only for a single comparison')
+        if self.opt.checkpoint_file and ((len(self.opt.anno2_files) > 1) or self.opt.all_vs_all):
+            error('Checkpointing is supported only for a single comparison')
+        if (self.opt.resume or (self.opt.checkpoint_interval != 60.0)) and (not self.opt.checkpoint_file):
+            error('The checkpoint file must be provided if the run is resumed or the checkpoint interval is given')
+        if self.opt.checkpoint_file and (self.opt.output_file_sweep or self.opt.output_file_names or self.opt.output_file_distances or self.opt.bootstrap or self.opt.permutations or
+                                         (self.opt.group_map_columns.count(',') > 1)):
+            error('Checkpointing is not supported together with the threshold sweep, the site name breakdown, the match distances, the bootstrap, the permutation test or the group hierarchy')
+        if self.opt.progress and ((len(self.opt.anno2_files) > 1) or self.opt.all_vs_all):
+            error('Progress reporting is supported only for a single comparison')
+        if (self.opt.progress_interval != 10.0) and (not self.opt.progress):
+            error('The progress reporting format must be provided if its interval is given')
+        if ((self.opt.profile_memory != 'rss') or self.opt.profile_groups) and (not self.opt.profile_file):
+            error('The output file for the profile must be provided if its memory measure or the group-wise profile is given')
+        if self.opt.profile_file and (self.opt.profile_memory == 'rss') and (resource is None):
+            error("The resident set size cannot be measured on this platform. Use the option '-profm tracemalloc'")
+        if self.opt.output_file_parquet and (pyarrow is None):
+            error('The Parquet output requires the pyarrow package to be installed')
+        if ((self.opt.detailed_level != 'site') or (self.opt.detailed_format != 'text')) and (not self.opt.output_file_detailed):
+            error('The detailed output file must be provided if its level of detail or format is given')
+        if bool(self.opt.bootstrap) != bool(self.opt.output_file_bootstrap):
+            error('The number of bootstrap resamples and the output file for the bootstrap confidence intervals must be provided together')
+        if bool(self.opt.permutations) != bool(self.opt.output_file_permutations):
+            error('The number of permutations and the output file for the permutation test must be provided together')
+        if self.opt.permutations and (self.opt.enrichment_count or (self.opt.overlap_tolerance is not None) or (self.opt.overlap_matching != 'any')):
+            error('The permutation test is applicable only in symbol-resolved and gross modes with a site matched by any sufficiently overlapping site of the other annotation')
+        if self.opt.averaging_modes and self.opt.all_vs_all:
+            error('Additional averaging modes are not supported in the all-vs-all mode')
+        if self.opt.selected_groups and (not self.opt.group_map) and (not self.opt.sequences_as_groups):
+            error('Groups can be selected only if the group mapping is provided or the sequences are treated as groups')
+        if (self.opt.selected_groups or self.opt.selected_sequences) and (self.opt.single_sequence or self.opt.genbank or self.opt.bed):
+            error('Groups and sequences cannot be selected in the single sequence or simplified (GenBank or BED) modes')
+        if self.opt.sid_index and (not (self.opt.selected_groups or self.opt.selected_sequences)):
+            error('The SID index can be used only if groups or sequences are selected')
+        if self.opt.sid_index and (self.opt.anno1_all_sequences or self.opt.anno2_all_sequences):
+            error('The SID index requires SIDs in both annotation files')
+        if (len(self.opt.anno2_files) > 1) and (self.opt.genbank or self.opt.bed):
+            error('Several files with the second annotation are not supported in simplified (GenBank or BED) modes')
         if self.opt.circular and ((self.opt.anno1_resolve_overlaps in ('first', 'last')) or (self.opt.anno2_resolve_overlaps in ('first', 'last'))):
             error("For circular sequences, only the following choices for overlap resolving are supported: 'all', 'merge'")
 
@@ -379,21 +652,198 @@ class ArgumentProcessor:
         if len(sys.argv) == 1:
             self.arg_parser.print_help()
             sys.exit()
-    def prepare_input_options(self):
+    def prepare_input_options(self, args = None):
         """Method to genarae validated object with the command line options"""
-        self._check_if_empty()
-        opt = self.arg_parser.parse_args()
+        if args is None:
+            self._check_if_empty()
+            args = sys.argv[1: ]
+        opt = self.arg_parser.parse_args(args)
+        opt.command_line = list(args)
         validator = ArgumentValidator(opt)
+        validator.expand_annotation_files()
+        if (opt.merge or opt.manifest) and opt.profile_file:
+            error('Profiling is supported only for a single comparison')
+        if (opt.merge or opt.manifest) and opt.progress:
+            error('Progress reporting is supported only for a single comparison')
+        if (opt.merge or opt.manifest) and opt.checkpoint_file:
+            error('Checkpointing is supported only for a single comparison')
+        if opt.merge:
+            if opt.manifest:
+                error('Merging of partial results is not compatible with the manifest file')
+            if not opt.output_file:
+                error('Output file is not provided')
+            return opt
+        if opt.manifest:
+            return opt
+        validator.validate_required_options()
         validator.preliminary_set_the_internal_parameters()
         validator.set_the_simplified_mode()
         validator.set_the_internal_parameters()
         validator.validate_file_paths()
         validator.validate_file_column_numbers()
         validator.validate_delimiters()
+        validator.parse_value_lists()
+        validator.parse_shard()
+        validator.parse_window()
+        validator.parse_averaging_modes()
         validator.validate_numerical_options_boundaries()
         validator.validate_logic()
         return opt
         
+class Profiler:
+    """Class to measure the wall-clock time, the CPU time and the peak memory of every processing phase, the time spent in a nested phase being counted only towards the latter"""
+    def __init__(self, opt):
+        self.opt = opt
+        self.phases = {}
+        self.stack = []
+        self.groups = []
+        self.counts = {'groups': 0, 'sequences': 0, 'symbols': 0, 'sites1': 0, 'sites2': 0}
+        if opt.profile_memory == 'tracemalloc':
+            tracemalloc.start()
+        self.started = self._get_times()
+    @staticmethod
+    def _get_times():
+        """Method to get the current wall-clock and CPU time"""
+        return time.perf_counter(), time.process_time()
+    def _get_peak_memory(self):
+        """Method to get the peak memory in bytes: the peak of the memory traced since the last reset or the peak resident set size of the process"""
+        if self.opt.profile_memory == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[1]
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    def _charge(self, phase, times):
+        """Method to add the time elapsed since the phase was started or resumed to the phase"""
+        name, resumed = phase
+        record = self.phases[name]
+        record[1] += times[0] - resumed[0]
+        record[2] += times[1] - resumed[1]
+        record[3] = max(record[3], self._get_peak_memory())
+    def start(self, name):
+        """Method to start a phase, pausing the current one"""
+        times = self._get_times()
+        if self.stack:
+            self._charge(self.stack[-1], times)
+        if self.opt.profile_memory == 'tracemalloc':
+            tracemalloc.reset_peak()
+        if name not in self.phases:
+            self.phases[name] = [0, 0.0, 0.0, 0]
+        self.phases[name][0] += 1
+        self.stack.append([name, times])
+    def stop(self):
+        """Method to stop the current phase, resuming the enclosing one"""
+        times = self._get_times()
+        self._charge(self.stack.pop(), times)
+        if self.stack:
+            self.stack[-1][1] = times
+            self.phases[self.stack[-1][0]][3] = max(self.phases[self.stack[-1][0]][3], self._get_peak_memory())
+        if self.opt.profile_memory == 'tracemalloc':
+            tracemalloc.reset_peak()
+    def switch(self, name):
+        """Method to stop the current phase and to start the next one"""
+        self.stop()
+        self.start(name)
+    def add_sequence(self, current_seq):
+        """Method to count the symbols and sites of a processed sequence"""
+        self.counts['sequences'] += 1
+        self.counts['symbols'] += current_seq.length
+        self.counts['sites1'] += len(current_seq.sites[1])
+        self.counts['sites2'] += len(current_seq.sites[2])
+    def start_group(self):
+        """Method to get the times and counts at the start of a group"""
+        self.counts['groups'] += 1
+        return self._get_times(), dict(self.counts)
+    def add_group(self, GID, group_start):
+        """Method to record the time and the counts of a processed group"""
+        if not self.opt.profile_groups:
+            return
+        times = self._get_times()
+        (wall, cpu), counts = group_start
+        group = {'group': GID, 'wall': times[0] - wall, 'cpu': times[1] - cpu}
+        group.update((x, self.counts[x] - counts[x]) for x in ('sequences', 'symbols', 'sites1', 'sites2'))
+        self.groups.append(group)
+    def write(self):
+        """Method to write the profile to the JSON file and to print its summary line"""
+        wall, cpu = (x - y for x, y in zip(self._get_times(), self.started))
+        phases = [{'phase': x, 'calls': y[0], 'wall': y[1], 'cpu': y[2], 'peak_memory': y[3]} for x, y in self.phases.items()]
+        peak_memory = max([x['peak_memory'] for x in phases] + [self._get_peak_memory()])
+        sites_n = self.counts['sites1'] + self.counts['sites2']
+        report = {'command_line': self.opt.command_line, 'wall': wall, 'cpu': cpu, 'peak_memory': peak_memory, 'memory_measure': self.opt.profile_memory,
+                  'unprofiled_wall': wall - sum(x['wall'] for x in phases), 'phases': phases, 'counts': self.counts,
+                  'throughput': {'symbols_per_second': self.counts['symbols'] / wall if wall else None, 'sites_per_second': sites_n / wall if wall else None}}
+        if self.opt.profile_groups:
+            report['groups'] = self.groups
+        with open(self.opt.profile_file, 'w') as ofile:
+            json.dump(report, ofile, indent = 1)
+        slowest = max(phases, key = lambda x: x['wall']) if phases else None
+        message = 'Profile: {:.2f} s wall, {:.2f} s CPU, peak memory {:.1f} MiB; {} sequences, {} symbols and {} sites processed ({:.0f} symbols/s)'
+        message = message.format(wall, cpu, peak_memory / (1 << 20), self.counts['sequences'], self.counts['symbols'], sites_n, report['throughput']['symbols_per_second'] or 0)
+        if slowest is not None:
+            message += '; the slowest phase is {} ({:.0f}% of the wall-clock time)'.format(slowest['phase'], 100 * slowest['wall'] / wall if wall else 0)
+        print(message)
+        if not self.opt.quiet:
+            print("The profile file '{}' has been written".format(self.opt.profile_file))
+
+class ProgressReporter:
+    """Class to report to stderr, at most once per interval, the processed groups and sequences, the throughput and the estimated remaining time"""
+    def __init__(self, opt):
+        self.opt = opt
+        self.totals = None
+        self.counts = {'groups': 0, 'sequences': 0, 'symbols': 0, 'sites': 0}
+        self.started = None
+        self.next_report = None
+    def start(self, GIDs, input_data):
+        """Method to calculate the totals of the groups to be processed from the sequence lengths and the site counts, and to start the clock"""
+        self.totals = {'groups': len(GIDs), 'sequences': 0, 'symbols': 0, 'sites': 0}
+        for GID in GIDs:
+            SIDs = input_data.group_map[GID]
+            self.totals['sequences'] += len(SIDs)
+            self.totals['symbols'] += sum(input_data.seq_len[SID] for SID in SIDs)
+            self.totals['sites'] += sum(len(input_data.sites[i][GID][SID]) for i in (1, 2) for SID in SIDs)
+        self.started = time.perf_counter()
+        self.next_report = self.started + self.opt.progress_interval
+        self._report('start', self.started)
+    def add_sequence(self, current_seq):
+        """Method to count a processed sequence, reporting the progress if the interval has passed"""
+        self.counts['sequences'] += 1
+        self.counts['symbols'] += current_seq.length
+        self.counts['sites'] += len(current_seq.sites[1]) + len(current_seq.sites[2])
+        now = time.perf_counter()
+        if now >= self.next_report:
+            self._report('progress', now)
+    def add_group(self):
+        """Method to count a processed group"""
+        self.counts['groups'] += 1
+    def finish(self):
+        """Method to report the completion"""
+        self._report('finish', time.perf_counter())
+    def _get_state(self, event, now):
+        """Method to get the counts, the throughput and the estimated remaining time, the latter extrapolated from the processed part of the symbols"""
+        elapsed = now - self.started
+        key = 'symbols' if self.totals['symbols'] else 'sequences'
+        fraction = self.counts[key] / self.totals[key] if self.totals[key] else 1.0
+        state = {'event': event, 'elapsed': elapsed, 'fraction': fraction}
+        for key in ('groups', 'sequences', 'symbols', 'sites'):
+            state[key] = self.counts[key]
+            state[key + '_total'] = self.totals[key]
+        state['symbols_per_second'] = self.counts['symbols'] / elapsed if elapsed else None
+        state['sites_per_second'] = self.counts['sites'] / elapsed if elapsed else None
+        state['eta'] = elapsed * (1.0 - fraction) / fraction if fraction else None
+        return state
+    def _format_text(self, state):
+        """Method to format the progress as a human-readable line"""
+        line = 'Progress: {}/{} groups, {}/{} sequences, {:.1f}% of the symbols, elapsed {}'.format(state['groups'], state['groups_total'], state['sequences'], state['sequences_total'],
+                                                                                     100 * state['fraction'], datetime.timedelta(seconds = int(state['elapsed'])))
+        if state['event'] != 'start':
+            line += ', {:.0f} symbols/s, {:.1f} sites/s'.format(state['symbols_per_second'] or 0, state['sites_per_second'] or 0)
+        if state['event'] == 'progress':
+            line += ', ETA {}'.format(datetime.timedelta(seconds = int(state['eta'])) if state['eta'] is not None else 'unknown')
+        return line
+    def _report(self, event, now):
+        """Method to write the progress to stderr and to schedule the next report"""
+        state = self._get_state(event, now)
+        sys.stderr.write((json.dumps(state) if self.opt.progress == 'jsonl' else self._format_text(state)) + '\n')
+        sys.stderr.flush()
+        self.next_report = now + self.opt.progress_interval
+
 class CSVParser:
     """Class to parse the input CSV files"""
     field_regex_quoted = '''((?:[^{0}"']|"[^"]*(?:"|$)|'[^']*(?:'|$))+|(?={0}{0})|(?={0}$)|(?=^{0}))'''
@@ -407,6 +857,27 @@ class CSVParser:
         self.opt = opt
         self.global_state = global_state
         self.input_data = InputData()
+        self.selected_SIDs = None
+    def _get_SID_index(self, opt_prefix, ifile, column_indices, file_field, collapse_spaces, quotes_as_escaped):
+        """Method to get the SID index of an annotation file, building it if it is missing or outdated"""
+        def get_SID(line):
+            """Closure to extract the SID from a line the same way as while parsing"""
+            if collapse_spaces:
+                line = re.sub(' +', ' ', line).strip()
+            values = file_field.findall(line.strip('\n'))
+            SID = values[column_indices[2]] if len(values) > column_indices[2] else ''
+            return SID if quotes_as_escaped else CSVParser.quote_compiled.sub('', SID)
+        filename = getattr(self.opt, opt_prefix)
+        headers_n = getattr(self.opt, opt_prefix + '_headers')
+        key = {'headers': headers_n, 'delimiter': getattr(self.opt, opt_prefix + '_delimiter'), 'quotes': quotes_as_escaped, 'SID_column': column_indices[2]}
+        SID_index = SIDIndex(filename, key)
+        if not SID_index.load():
+            if not SID_index.build(get_SID, headers_n, ifile.encoding):
+                if self.opt.warnings:
+                    print('Warning: the SID index file "{}" cannot be written. The index is used only in the current run'.format(SID_index.index_filepath))
+            elif not self.opt.quiet:
+                print('The SID index "{}" has been built'.format(SID_index.index_filepath))
+        return SID_index
     def _parse_input_file(self, opt_prefix, preliminary = False):
         """Method to parse an input file"""
         column_indices = tuple(int(x) - 1 for x in getattr(self.opt, opt_prefix + '_columns').split(','))
@@ -425,6 +896,8 @@ class CSVParser:
                     line_generator = GenBankMethods.gen_record(ifile, self.opt.detect_strand, self.opt.detect_frame, self.auto_seq_len)
                 elif self.opt.bed:
                     line_generator = BEDMethods.gen_record(ifile, self.opt.detect_strand, self.opt.detect_frame, self.opt.site_names, self.input_data.seq_len)
+                elif self.opt.sid_index and (self.selected_SIDs is not None):
+                    line_generator = self._get_SID_index(opt_prefix, ifile, column_indices, file_field, collapse_spaces, quotes_as_escaped).gen_lines(ifile, self.selected_SIDs)
             for line_idx, line in line_generator:
                 if collapse_spaces:
                     line = re.sub(' +', ' ', line).strip()
@@ -443,6 +916,8 @@ class CSVParser:
         return math.floor((time.mktime(finish_time_point) - time.mktime(start_time_point)) / self.global_state.time_unit_seconds)
     def _convert_interval_to_time_structs(self, interval):
         """Mathod to convert time strings in an interval to time_struct objects"""
+        if self.global_state.profiler is not None:
+            self.global_state.profiler.start('time_conversion')
         for interval_idx, time_str in enumerate(interval):
             if ' ' not in time_str:
                 time_str += ' 00:00'
@@ -452,11 +927,15 @@ class CSVParser:
                     recognized = True
                     try:
                         interval[interval_idx] = time.strptime(time_str, CSVParser.time_formats[time_format_idx])
+                        if self.input_data.time_format is None:
+                            self.input_data.time_format = CSVParser.time_formats[time_format_idx]
                     except ValueError:
                         raise RuntimeError('Time format was not recognized. Supported formats: "mm/dd/yyyy HH:MM[:SS]" and "dd.mm.yyyy HH:MM[:SS]"') from None
                     break
             if not recognized:
                 raise RuntimeError('Time format was not recognized. Supported formats: "mm/dd/yyyy HH:MM[:SS]" and "dd.mm.yyyy HH:MM[:SS]"')
+        if self.global_state.profiler is not None:
+            self.global_state.profiler.stop()
     def _save_seq_len_db_record(self, values, not_first_to_check):
         """Method to save a sequence length table record"""
         def _save_record():
@@ -506,7 +985,7 @@ class CSVParser:
             raise RuntimeError('Inconsistency in the sequence length table. Different start values for a duplicating SID "{}".'.format(SID))
     def _save_group_map_record(self, values, preliminary = False):
         """Method to save a group mapping record"""
-        SID, GID = values
+        SID, GID = values[: 2]
         if not GID:
             raise RuntimeError('A GID cannot be empty')
         if '"' in GID:
@@ -519,6 +998,11 @@ class CSVParser:
             if self.opt.warnings:
                 print('Warning: SID "{}" is not the sequence length table. The group mapping record is ignored'.format(SID))
             return
+        for level_idx, parent_GID in enumerate(values[2: ]):
+            if len(self.input_data.group_levels) <= level_idx:
+                self.input_data.group_levels.append(DefaultOrderedDict(list))
+            if parent_GID and (GID not in self.input_data.group_levels[level_idx][parent_GID]):
+                self.input_data.group_levels[level_idx][parent_GID].append(GID)
         if SID not in self.input_data.group_map[GID]:
             self.input_data.group_map[GID].append(SID)
             if self.opt.non_overlapping_groups:
@@ -548,6 +1032,10 @@ class CSVParser:
             GID = ''
         if self.opt.sequences_as_groups:
             GID = SID
+        if (self.selected_SIDs is not None) and SID and (SID not in self.selected_SIDs):
+            return
+        if self.opt.selected_groups and GID and (GID not in self.opt.selected_groups):
+            return
         GID_list = [GID] if GID else list(self.input_data.group_map.keys())
         for GID_ in GID_list:
             SID_list = [SID] if SID else self.input_data.group_map[GID_]
@@ -590,9 +1078,10 @@ class CSVParser:
                         raise RuntimeError('Site length cannot exceed the sequence length')
                     if begin_ > end_:
                         raise RuntimeError('Site begin position cannot exceed the end position. For circular sequences, end positions exceeding the sequence length should be used')
-                    if (begin_ < 1) or (end_ > self.input_data.seq_len[SID_]):
-                        begin_ = begin_ % self.input_data.seq_len[SID_]
-                        end_ = end_ % self.input_data.seq_len[SID_] + self.input_data.seq_len[SID_]
+                    if (begin_ < 1) or (begin_ > self.input_data.seq_len[SID_]):
+                        shift = ((begin_ - 1) // self.input_data.seq_len[SID_]) * self.input_data.seq_len[SID_]
+                        begin_ -= shift
+                        end_ -= shift
                 else:
                     if begin_ < 1:
                         if self.opt.end_overflow_policy == 'forbid':
@@ -626,45 +1115,43 @@ class CSVParser:
             self._save_group_map_record(values, preliminary)
         elif opt_prefix in ('anno1', 'anno2'):   
             self._save_annotation_record(opt_prefix, values)
-    def _sort_annotations(self):
+    def _sort_annotation(self, i):
         """Method to sort the annotated sites for every sequence by begin symbol number"""
-        for i in (1, 2):
-            for group in self.input_data.sites[i].values():
-                for sites in group.values():
-                    sites.sort(key = lambda x: x[0])
-    def _resolve_overlaps_within_annotations(self):
+        for group in self.input_data.sites[i].values():
+            for sites in group.values():
+                sites.sort(key = lambda x: x[0])
+    def _resolve_overlaps_within_annotation(self, i):
         """Method to resolve groups of overlapping sites within a given annotation according to the user-defined policy"""
-        for i in (1, 2):
-            policy = getattr(self.opt, 'anno{}_resolve_overlaps'.format(i))
-            if policy == 'all':
-                continue
-            for group in self.input_data.sites[i].values():
-                for sites in group.values():
-                    sites_new = []
-                    if policy == 'first':
-                        last_end = 0
-                        for site in sites:
-                            if site[0] > last_end:
-                                sites_new.append(site)
-                            last_end = site[1]
-                    elif policy == 'last':
-                        next_begin = float('inf')
-                        for site in reversed(sites):
-                            if site[1] < next_begin:
-                                sites_new.insert(0, site)
-                            next_begin = site[0]
-                    elif policy == 'merge':
-                        last_end = 0
-                        new_begin = 0
-                        for site in sites:
-                            if site[0] > last_end:
-                                if new_begin > 0:
-                                    sites_new.append([new_begin, last_end])
-                                new_begin = site[0]
-                            last_end = site[1]
-                        if new_begin > 0:
-                            sites_new.append([new_begin, last_end])
-                    sites[: ] = sites_new       
+        policy = getattr(self.opt, 'anno{}_resolve_overlaps'.format(i))
+        if policy == 'all':
+            return
+        for group in self.input_data.sites[i].values():
+            for sites in group.values():
+                sites_new = []
+                if policy == 'first':
+                    last_end = 0
+                    for site in sites:
+                        if site[0] > last_end:
+                            sites_new.append(site)
+                        last_end = site[1]
+                elif policy == 'last':
+                    next_begin = float('inf')
+                    for site in reversed(sites):
+                        if site[1] < next_begin:
+                            sites_new.insert(0, site)
+                        next_begin = site[0]
+                elif policy == 'merge':
+                    last_end = 0
+                    new_begin = 0
+                    for site in sites:
+                        if site[0] > last_end:
+                            if new_begin > 0:
+                                sites_new.append([new_begin, last_end])
+                            new_begin = site[0]
+                        last_end = site[1]
+                    if new_begin > 0:
+                        sites_new.append([new_begin, last_end])
+                sites[: ] = sites_new       
     def calc_and_set_auto_seq_len(self):
         """Method to calculate the sequence length and, if applicable, the start of time series, on the basis of the input parameters if the sequence length table is not provided"""
         if self.opt.len_db:
@@ -682,7 +1169,11 @@ class CSVParser:
                 self.auto_series_start = interval[0]
     def parse_sequence_length_db(self):
         """Method to parse the input sequence length table file"""
+        if self.global_state.profiler is not None:
+            self.global_state.profiler.start('sequence_length_parsing')
         self._parse_input_file('len_db')
+        if self.global_state.profiler is not None:
+            self.global_state.profiler.stop()
         if self.opt.preparse_group_map:
             for SID in list(self.input_data.seq_len.keys()):
                 if self.input_data.seq_len[SID] is None:
@@ -704,10 +1195,16 @@ class CSVParser:
                 if self.opt.single_sequence:
                     self.input_data.group_map[''] = ['']
                     self.input_data.seq_len[''] = self.auto_seq_len
+                    if self.global_state.time_unit_seconds:
+                        self.input_data.time_series_starts[''] = self.auto_series_start
             return
         if self.opt.non_overlapping_groups:
             self.reverse_group_map = {}
+        if self.global_state.profiler is not None:
+            self.global_state.profiler.start('group_map_parsing')
         self._parse_input_file('group_map', preliminary)
+        if self.global_state.profiler is not None:
+            self.global_state.profiler.stop()
         if (self.opt.min_group_size > 1) or (self.opt.max_group_size > 0):
             for GID in list(self.input_data.group_map.keys()):
                 SID_list = self.input_data.group_map[GID]
@@ -717,38 +1214,139 @@ class CSVParser:
             error('The sequence length table does not contain any SIDs that can be retained')
         if not self.opt.quiet:
             print('The group mapping has been{} read from "{}"'.format(' preliminary' if self.auto_seq_len is None else '', getattr(self.opt, 'group_map')))
-    def parse_annotations(self):
-        """Method to parse the input annotation files"""
+    def select_groups_and_sequences(self):
+        """Method to restrict the group mapping to the selected groups and sequences"""
+        if not (self.opt.selected_groups or self.opt.selected_sequences):
+            return
+        group_map = self.input_data.group_map
+        if not any(group_map.values()):
+            return
+        if self.opt.selected_groups:
+            for GID in self.opt.selected_groups:
+                if (GID not in group_map) and self.opt.warnings:
+                    print('Warning: GID "{}" is not in the group mapping. The selection of the group is ignored'.format(GID))
+            for GID in list(group_map.keys()):
+                if GID not in self.opt.selected_groups:
+                    del group_map[GID]
+        if self.opt.selected_sequences:
+            selected_sequences = set(self.opt.selected_sequences)
+            found_SIDs = set()
+            for GID in list(group_map.keys()):
+                group_map[GID] = [x for x in group_map[GID] if x in selected_sequences]
+                found_SIDs.update(group_map[GID])
+                if not group_map[GID]:
+                    del group_map[GID]
+            for SID in self.opt.selected_sequences:
+                if (SID not in found_SIDs) and self.opt.warnings:
+                    print('Warning: SID "{}" is not in the selected groups. The selection of the sequence is ignored'.format(SID))
+        if not group_map:
+            error('None of the selected groups and sequences is present in the input data')
+    def _get_selected_SIDs(self):
+        """Method to get the SIDs the annotation records are to be read for, or None if all of them are required"""
+        if not (self.opt.selected_groups or self.opt.selected_sequences):
+            return None
+        SIDs = {SID for SID_list in self.input_data.group_map.values() for SID in SID_list}
+        if SIDs:
+            return SIDs
+        SIDs = set(self.opt.selected_sequences) if self.opt.selected_sequences else None
+        if self.opt.sequences_as_groups and self.opt.selected_groups:
+            SIDs = set(self.opt.selected_groups) if SIDs is None else (SIDs & set(self.opt.selected_groups))
+        return SIDs
+    def parse_annotations(self, cache = None):
+        """Method to parse the input annotation files, reusing the ones already present in the cache of a batch run"""
         if (self.opt.len_db and (not self.input_data.seq_len)) or ((not self.input_data.group_map) and (not self.opt.sequences_as_groups)):
             error('The annotation files must be parsed after the sequence length table and the group mapping')
-        self._parse_input_file('anno1')
-        if not self.opt.quiet:
-            print('The first annotation has been read from "{}"'.format(getattr(self.opt, 'anno1')))
-        self._parse_input_file('anno2')
-        if not self.opt.quiet:
-            print('The second annotation has been read from "{}"'.format(getattr(self.opt, 'anno2')))
+        self.selected_SIDs = self._get_selected_SIDs()
+        for i, ordinal in ((1, 'first'), (2, 'second')):
+            opt_prefix = 'anno{}'.format(i)
+            key = cache.get_annotation_key(self.opt, i) if (cache is not None) and cache.annotations_are_independent(self.opt) else None
+            if (key is not None) and (key in cache.annotations):
+                self.input_data.sites[i] = cache.annotations[key]
+                if not self.opt.quiet:
+                    print('The {} annotation read from "{}" has been reused'.format(ordinal, getattr(self.opt, opt_prefix)))
+                continue
+            profiler = self.global_state.profiler
+            if profiler is not None:
+                profiler.start('annotation_parsing')
+            self._parse_input_file(opt_prefix)
+            if not self.opt.quiet:
+                print('The {} annotation has been read from "{}"'.format(ordinal, getattr(self.opt, opt_prefix)))
+            if profiler is not None:
+                profiler.switch('sorting')
+            self._sort_annotation(i)
+            if profiler is not None:
+                profiler.switch('overlap_resolution')
+            self._resolve_overlaps_within_annotation(i)
+            if profiler is not None:
+                profiler.stop()
+            if key is not None:
+                cache.annotations[key] = self.input_data.sites[i]
         if (not self.input_data.sites[1]) or (not self.input_data.sites[2]):
-            print(self.input_data.sites[2].keys())##/
             error('An annotation must not be empty')
-        self._sort_annotations()
-        self._resolve_overlaps_within_annotations()
+    def get_base_data(self):
+        """Method to get the parsed sequence length table and group mapping, which do not depend on the annotations"""
+        return self.input_data.seq_len, self.input_data.time_series_starts, self.input_data.group_map, self.input_data.group_levels, getattr(self, 'reverse_group_map', None)
+    def set_base_data(self, base_data):
+        """Method to set the previously parsed sequence length table and group mapping"""
+        self.input_data.seq_len, self.input_data.time_series_starts, self.input_data.group_map, self.input_data.group_levels, self.reverse_group_map = base_data
     def get_data(self):
         return self.input_data
 
+class InputDataCache:
+    """Class to keep the parsed input data shared between the jobs of a batch run"""
+    base_options = ('len_db', 'len_db_delimiter', 'len_db_headers', 'len_db_columns', 'len_db_quotes', 'group_map', 'group_map_delimiter', 'group_map_headers', 'group_map_columns',
+                    'group_map_quotes', 'seq_len', 'single_sequence', 'series_start', 'series_finish', 'time_unit', 'sequences_as_groups', 'non_overlapping_groups',
+                    'preparse_group_map', 'min_group_size', 'max_group_size', 'genbank', 'bed', 'detect', 'selected_groups', 'selected_sequences')
+    annotation_options = ('', '_delimiter', '_headers', '_columns', '_quotes', '_begin_shift', '_end_shift', '_all_sequences', '_all_groups', '_resolve_overlaps')
+    def __init__(self):
+        self.base = {}
+        self.annotations = {}
+        self.full = {}
+    def get_base_key(self, opt):
+        """Method to form the key identifying the sequence length table and group mapping parsed with given options"""
+        return tuple(tuple(getattr(opt, x)) if isinstance(getattr(opt, x), list) else getattr(opt, x) for x in InputDataCache.base_options)
+    def get_annotation_key(self, opt, i):
+        """Method to form the key identifying an annotation file parsed with given options"""
+        opt_prefix = 'anno{}'.format(i)
+        values = tuple(getattr(opt, opt_prefix + x) for x in InputDataCache.annotation_options)
+        return self.get_base_key(opt) + values + (opt.site_names, opt.end_overflow_policy, opt.genbank and opt.anno1)
+    def get_full_key(self, opt):
+        """Method to form the key identifying the whole input data set"""
+        return self.get_annotation_key(opt, 1) + self.get_annotation_key(opt, 2)
+    def annotations_are_independent(self, opt):
+        """Method to check if parsing of an annotation leaves the sequence length table and group mapping intact, so that annotations can be shared separately"""
+        return bool(opt.len_db or opt.group_map) and (not opt.sequences_as_groups)
+
 class InputFileProcessor:
     """Class for coordinating the input file processing"""
-    def __init__(self, opt, file_parser):
+    def __init__(self, opt, file_parser, cache = None):
         self.opt = opt
         self.file_parser = file_parser
+        self.cache = cache
     def process_input_files(self):
         """Method to coordinate processing of the input files"""
+        if self.cache is not None:
+            full_key = self.cache.get_full_key(self.opt)
+            if full_key in self.cache.full:
+                return self.cache.full[full_key]
+            base_key = self.cache.get_base_key(self.opt)
         self.file_parser.calc_and_set_auto_seq_len()
-        if self.opt.preparse_group_map or (not self.opt.len_db):
-            self.file_parser.parse_group_map(preliminary = True)
-        if self.opt.len_db:
-            self.file_parser.parse_sequence_length_db()
-            self.file_parser.parse_group_map()
-        self.file_parser.parse_annotations()
+        if (self.cache is not None) and (base_key in self.cache.base):
+            base_data = self.cache.base[base_key]
+            self.file_parser.set_base_data(base_data if self.cache.annotations_are_independent(self.opt) else copy.deepcopy(base_data))
+        else:
+            if self.opt.preparse_group_map or (not self.opt.len_db):
+                self.file_parser.parse_group_map(preliminary = True)
+            if self.opt.len_db:
+                self.file_parser.parse_sequence_length_db()
+                self.file_parser.parse_group_map()
+            self.file_parser.select_groups_and_sequences()
+            if self.cache is not None:
+                base_data = self.file_parser.get_base_data()
+                self.cache.base[base_key] = base_data if self.cache.annotations_are_independent(self.opt) else copy.deepcopy(base_data)
+        self.file_parser.parse_annotations(self.cache)
+        if self.cache is not None:
+            self.cache.full[full_key] = self.file_parser.get_data()
         return self.file_parser.get_data()
 
 class BasicSequenceCalculator:
@@ -807,27 +1405,60 @@ class BasicSequenceCalculator:
                         in_site = False
                 if in_site:
                     self._write_site(file_handler, begin_idx, last_end_res if last_end_res else self.current_seq.length)
+    def _get_output_mask(self, type_):
+        """Method to get the membership of all the symbols in a given output annotation"""
+        raise NotImplementedError("Method '_get_output_mask' is not implemented")
+    def _write_runs_to_files(self, file_handlers):
+        """Method to write the required output annotations from the runs of the symbols in them, joining the runs at both ends of circular sequences"""
+        for type_ in FileHandlers.output_file_types:
+            file_handler = getattr(file_handlers, type_)
+            if (file_handler is None) or (type_ in ('detailed', 'site')):
+                continue
+            edges = np.diff(np.concatenate(([0], self._get_output_mask(type_).astype('i1'), [0])))
+            begins = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1)
+            if self.opt.circular and (len(begins) > 1) and (begins[0] == 0) and (ends[-1] == self.current_seq.length):
+                ends = np.concatenate((ends[1: -1], [ends[0] + self.current_seq.length]))
+                begins = begins[1: ]
+            for begin_idx, end_res in zip(begins.tolist(), ends.tolist()):
+                self._write_site(file_handler, begin_idx, end_res)
     def calculate_residue_wise(self):
         """Method to calculate residue-wise measures for a given sequence"""
         raise NotImplementedError("Method 'calculate_residue_wise' is not implemented")
+    def _sum_in_windows(self, values, begins, ends):
+        """Method to sum the per-symbol values over the windows [begin, end) from their cumulative sums, wrapping the windows around the end of circular sequences"""
+        prefix = np.concatenate(([0], np.cumsum(values, dtype = 'i8')))
+        sums = prefix[np.minimum(ends, self.seq_length)] - prefix[begins]
+        wrapped = ends > self.seq_length
+        sums[wrapped] += prefix[ends[wrapped] - self.seq_length]
+        return sums
+    def calculate_residue_wise_windows(self, begins, ends):
+        """Method to calculate residue-wise measures for every window of a given sequence"""
+        raise NotImplementedError("Method 'calculate_residue_wise_windows' is not implemented")
     def get_results(self):
         return self.results
 
 class BasicBooleanSequenceCalculator(BasicSequenceCalculator):
     """Class for calculating basic Boolean measures and write into files required output annotations in a particular sequence"""
-    def __init__(self, global_state, opt, current_seq):
+    def __init__(self, global_state, opt, current_seq, benchmark_index = None):
         BasicSequenceCalculator.__init__(self, global_state, opt, current_seq)
         self.seq_length = current_seq.length
         self.seq = np.zeros(shape = current_seq.length, dtype = 'i1')
         self.results = BasicBooleanMeasures()
+        self.match_distances = [None, None, None]
+        self.unrolled_sites = [None, None, None]
+        self.benchmark_index = benchmark_index
         self._classify_symbols()
     def _classify_symbols(self):
         """Method to classify symbols in the sequence by their occurrence in the annotations"""
-        for site in self.current_seq.sites[1]:
-            for idx in range(site[0] - 1, site[1]):
-                if self.opt.circular and (idx >= self.seq_length):
-                    idx -= self.seq_length
-                self.seq[idx] = 1
+        if self.benchmark_index is not None:
+            self.seq[self.benchmark_index.coverage > 0] = 1
+        else:
+            for site in self.current_seq.sites[1]:
+                for idx in range(site[0] - 1, site[1]):
+                    if self.opt.circular and (idx >= self.seq_length):
+                        idx -= self.seq_length
+                    self.seq[idx] = 1
         for site in self.current_seq.sites[2]:
             for idx in range(site[0] - 1, site[1]):
                 if self.opt.circular and (idx >= self.seq_length):
@@ -873,23 +1504,82 @@ class BasicBooleanSequenceCalculator(BasicSequenceCalculator):
             return max(site[1] - site[0], site_[1] - site_[0]) + 1
         elif self.opt.overlap_apply in ('current', 'patched'):
             return site[1] - site[0] + 1
+    def _get_patched_symbols(self, site):
+        """Method to calculate number of symbols of a site shared with any sites of the other annotation"""
+        if self.opt.circular and (site[1] > self.seq_length):
+            return np.sum(self.seq[site[0] - 1: ] == 3) + np.sum(self.seq[: site[1] - self.seq_length] == 3)
+        return np.sum(self.seq[site[0] - 1: site[1]] == 3)
+    def _get_overlapping_partners(self, site, i):
+        """Generator of the partner sites possibly overlapping a given site together with the shared symbols, in the order of the other annotation"""
+        for site_ in self.current_seq.sites[3 - i]:
+            if (not self.opt.circular) and (site_[0] > site[1]):
+                break
+            yield site_, self._get_overlapped_symbols(site, site_, i)
+    def _get_overlap_candidates(self, site, i):
+        """Method to get the overlapped symbols and the effective site lengths for all the partner sites overlapping a given site"""
+        if self.opt.overlap_apply == 'patched':
+            return [(self._get_patched_symbols(site), site[1] - site[0] + 1)]
+        candidates = []
+        for site_, overlapped_symbols in self._get_overlapping_partners(site, i):
+            if overlapped_symbols > 0:
+                candidates.append((overlapped_symbols, self._get_site_length(site, site_)))
+        return candidates
+    def calculate_site_wise_sweep(self, symbols_thresholds, part_thresholds):
+        """Method to calculate numbers of matched sites for the whole grid of overlap thresholds (both sorted ascending) at once"""
+        site_m = [None, None, None]
+        for i in (1, 2):
+            best_parts = np.full((len(self.current_seq.sites[i]), len(symbols_thresholds)), -np.inf)
+            for site_idx, site in enumerate(self.current_seq.sites[i]):
+                candidates = self._get_overlap_candidates(site, i)
+                if not candidates:
+                    continue
+                candidates.sort(key = lambda x: -x[0])
+                overlapped = np.array([x[0] for x in candidates])
+                best_part = np.maximum.accumulate(np.array([x[0] / x[1] for x in candidates]))
+                candidates_n = np.searchsorted(-overlapped, -np.array(symbols_thresholds), side = 'right')
+                present = candidates_n > 0
+                best_parts[site_idx, present] = best_part[candidates_n[present] - 1]
+            best_parts.sort(axis = 0)
+            site_m[i] = np.array([len(best_parts) - np.searchsorted(best_parts[:, k], part_thresholds, side = 'left') for k in range(len(symbols_thresholds))])
+        return site_m
+    def _get_coverage(self, i):
+        """Method to get number of sites of an annotation covering every symbol of the sequence"""
+        return AnnotationIndex(self.current_seq.sites[i], self.seq_length, self.opt.circular).coverage
+    def calculate_residue_wise_windows(self, begins, ends):
+        """Method to calculate Boolean residue-wise measures for every window of a given sequence, with the gross counts of the sites clipped to the window"""
+        counts = {}
+        for attr_name, class_ in (('pp', 3), ('pa', 1), ('ap', 2), ('aa', 0)):
+            counts[attr_name] = self._sum_in_windows(self.seq == class_, begins, ends)
+        if self.opt.gross:
+            matched = self.seq == 3
+            for i in (1, 2):
+                coverage = self._get_coverage(i)
+                counts['pp' + str(i)] = self._sum_in_windows(coverage * matched, begins, ends)
+                counts['pa' if i == 1 else 'ap'] = self._sum_in_windows(coverage * (~matched), begins, ends)
+        results_list = []
+        for k in range(len(begins)):
+            results = BasicBooleanMeasures()
+            if self.opt.gross:
+                results.pp_[1] = int(counts['pp1'][k])
+                results.pp_[2] = int(counts['pp2'][k])
+            else:
+                results.pp = int(counts['pp'][k])
+                results.pp_[1] = results.pp
+                results.pp_[2] = results.pp
+            results.pa = int(counts['pa'][k])
+            results.ap = int(counts['ap'][k])
+            results.aa = int(counts['aa'][k])
+            results_list.append(results)
+        return results_list
     def _check_overlap_sufficiency(self, overlapped_symbols, site_length):
         """Method to check if a goven overlap between sites satisfies the input overlap criteria"""
         return (overlapped_symbols >= self.opt.overlap_symbols) and (overlapped_symbols / site_length >= self.opt.overlap_part)
-    def _write_measure_info_to_detailed_file(self, type_, description, detailed_file_h):
-        """Writing the information on sybol counts in a specific category"""
-        symbols_n = getattr(self.results, type_)
-        category_name = getattr(self.global_state, type_ + '_name')
-        ending = '{} is' if symbols_n == 1 else 's{} are'
-        ending = ending.format(' gross' if (self.opt.gross and (type_ != 'aa')) else '')
-        detailed_file_h.write('{}{} symbol{} {}{}'.format(self.global_state.indent_site, symbols_n, ending, description, category_name) + os.linesep)
     def calculate_residue_wise(self, detailed_file_h):
         """Method to calculate Boolean residue-wise measures for a given sequence and write the information to the detailed output file"""
         if self.opt.gross:
             self.results.pa = 0
             self.results.ap = 0
             for i in (1, 2):
-                j = 3 - i
                 for site in self.current_seq.sites[i]:
                     matched_symbols_n = np.sum(self.seq[site[0] - 1: site[1]] == 3)
                     site_length = site[1] - site[0] + 1
@@ -898,37 +1588,238 @@ class BasicBooleanSequenceCalculator(BasicSequenceCalculator):
                     attr_name = 'pa' if i == 1 else 'ap'
                     setattr(self.results, attr_name, getattr(self.results, attr_name) + unmatched_symbols_n)
                 if detailed_file_h:
-                    ending = ('' if self.results.pp_[i] == 1 else 's') + ' gross'
-                    message = '{}{} symbol{} present in the {} are also present in the {}'
-                    detailed_file_h.write(message.format(self.global_state.indent_site, self.results.pp_[i], ending, self.global_state.anno_name[i], self.global_state.anno_name[j]) + os.linesep)
+                    detailed_file_h.add('gross_symbols', i, self.results.pp_[i])
         else:
             self.results.pp = np.sum(self.seq == 3)
             self.results.pp_[1] = self.results.pp
             self.results.pp_[2] = self.results.pp
             if detailed_file_h:
-                self._write_measure_info_to_detailed_file('pp', 'present in both annotations', detailed_file_h)
+                detailed_file_h.add('symbols', 'pp', self.results.pp)
             self.results.pa = np.sum(self.seq == 1)
             self.results.ap = np.sum(self.seq == 2)
         self.results.aa = np.sum(self.seq == 0)
         if detailed_file_h:
-            description = 'present exclusively in the ' + self.global_state.anno_name[1]
-            self._write_measure_info_to_detailed_file('pa', description, detailed_file_h)
-            description = 'present exclusively in the ' + self.global_state.anno_name[2]
-            self._write_measure_info_to_detailed_file('ap', description, detailed_file_h)
-            self._write_measure_info_to_detailed_file('aa', 'absent in both annotations', detailed_file_h)
+            for type_ in ('pa', 'ap', 'aa'):
+                detailed_file_h.add('symbols', type_, getattr(self.results, type_))
+    def _write_site_match(self, i, site, site_, overlapped_symbols, detailed_file_h, site_file_h):
+        """Method to write the information on the partner site matched with a site (None if the site is unmatched) to the detailed output file and to the site-wise statistics file"""
+        found_match = site_ is not None
+        if found_match:
+            length_perc_1 = round(100 * overlapped_symbols / (site[1] - site[0] + 1))
+            length_perc_2 = round(100 * overlapped_symbols / (site_[1] - site_[0] + 1))
+            begin_ = site_[0]
+            end_ = site_[1]
+        else:
+            overlapped_symbols = length_perc_1 = length_perc_2 = 0
+            begin_ = end_ = '-'
+        if detailed_file_h is not None:
+            site_name = site[2] if self.opt.site_names else None
+            site_name_ = site_[2] if self.opt.site_names and found_match else None
+            detailed_file_h.add('site_overlap', i, site[0], site[1], site_name, found_match, begin_, end_, site_name_, overlapped_symbols, length_perc_1, length_perc_2)
+        if site_file_h is not None:
+            if self.opt.site_difference == 'matched':
+                if not found_match:
+                    return
+            elif self.opt.site_difference == 'unmatched':
+                if found_match:
+                    return
+            elif self.opt.site_difference == 'discrepant':
+                if (length_perc_1 == 100) and (length_perc_2 == 100):
+                    return
+            if self.opt.site_names:
+                site_file_h.add((self.global_state.anno_short_name[i], site[0], site[1], site[2], overlapped_symbols, length_perc_1, length_perc_2, begin_, end_, site_[2] if found_match else ''))
+            else:
+                site_file_h.add((self.global_state.anno_short_name[i], site[0], site[1], overlapped_symbols, length_perc_1, length_perc_2, begin_, end_))
+    def _get_unrolled_sites(self, i):
+        """Method to get the site boundaries of an annotation sorted by the site begins, with copies shifted by the sequence length in both directions for circular sequences, so that the wrapping sites can be handled in linear coordinates"""
+        if self.unrolled_sites[i] is None:
+            sites = self.current_seq.sites[i]
+            begins = np.fromiter((x[0] for x in sites), dtype = 'i8', count = len(sites))
+            ends = np.fromiter((x[1] for x in sites), dtype = 'i8', count = len(sites))
+            indices = np.arange(len(sites))
+            if self.opt.circular:
+                shifts = np.repeat(np.array([-self.seq_length, 0, self.seq_length], dtype = 'i8'), len(sites))
+                begins = np.tile(begins, 3) + shifts
+                ends = np.tile(ends, 3) + shifts
+                indices = np.tile(indices, 3)
+            order = np.argsort(begins, kind = 'stable')
+            self.unrolled_sites[i] = (begins[order], ends[order], indices[order])
+        return self.unrolled_sites[i]
+    def _get_nearest_partners(self, i):
+        """Method to find the nearest site of the other annotation and the distance to it for every site of an annotation by binary search over the sorted partner begins"""
+        sites = self.current_seq.sites[i]
+        partners = self.current_seq.sites[3 - i]
+        begins = np.fromiter((x[0] for x in sites), dtype = 'i8', count = len(sites))
+        ends = np.fromiter((x[1] for x in sites), dtype = 'i8', count = len(sites))
+        if not partners:
+            return np.full(len(sites), -1, dtype = 'i8'), np.full(len(sites), -1, dtype = 'i8')
+        partner_begins, partner_ends, partner_indices = self._get_unrolled_sites(3 - i)
+        #The partners beginning not later than the site end: the one with the farthest end is the nearest
+        running_max_ends = np.maximum.accumulate(partner_ends)
+        running_max_idx = np.maximum.accumulate(np.where(partner_ends == running_max_ends, np.arange(len(partner_ends)), 0))
+        right_idx = np.searchsorted(partner_begins, ends, side = 'right')
+        left_idx = running_max_idx[np.maximum(right_idx - 1, 0)]
+        left_distances = np.where(right_idx > 0, np.maximum(begins - partner_ends[left_idx], 0), np.iinfo('i8').max)
+        #The first partner beginning after the site end
+        right_idx_ = np.minimum(right_idx, len(partner_begins) - 1)
+        right_distances = np.where(right_idx < len(partner_begins), partner_begins[right_idx_] - ends, np.iinfo('i8').max)
+        use_left = left_distances <= right_distances
+        distances = np.where(use_left, left_distances, right_distances)
+        nearest = partner_indices[np.where(use_left, left_idx, right_idx_)]
+        return distances, nearest
+    def _calculate_site_wise_tolerant(self, detailed_file_h, site_file_h):
+        """Method to match every site with its nearest partner lying within the tolerance and write the site-wise information to the detailed output file"""
+        tolerance = self.opt.overlap_tolerance
+        for i in (1, 2):
+            j = 3 - i
+            distances, nearest = self._get_nearest_partners(i)
+            matched = (nearest >= 0) & (distances <= tolerance)
+            self.results.site_m[i] += int(np.sum(matched))
+            self.results.site_nm[i] += len(matched) - int(np.sum(matched))
+            self.match_distances[i] = distances[matched]
+            if self.opt.gross:
+                self.results.site_len[i] += sum(site[1] - site[0] + 1 for site in self.current_seq.sites[i])
+            if (detailed_file_h is None) and (site_file_h is None):
+                continue
+            for site, distance, partner_idx, found_match in zip(self.current_seq.sites[i], distances, nearest, matched):
+                site_ = self.current_seq.sites[j][partner_idx] if partner_idx >= 0 else None
+                if detailed_file_h is not None:
+                    if found_match:
+                        detailed_file_h.add('site_nearest', i, site[0], site[1], site[2] if self.opt.site_names else None, True, site_[0], site_[1], site_[2] if self.opt.site_names else None, int(distance))
+                    else:
+                        detailed_file_h.add('site_nearest', i, site[0], site[1], site[2] if self.opt.site_names else None, False, '-', '-', None, '-')
+                if site_file_h is not None:
+                    if self.opt.site_difference == 'matched':
+                        if not found_match:
+                            continue
+                    elif self.opt.site_difference == 'unmatched':
+                        if found_match:
+                            continue
+                    elif self.opt.site_difference == 'discrepant':
+                        if found_match and (site[0] == site_[0]) and (site[1] == site_[1]):
+                            continue
+                    partner = (distance, site_[0], site_[1]) if site_ is not None else ('-', '-', '-')
+                    if self.opt.site_names:
+                        site_file_h.add((self.global_state.anno_short_name[i], site[0], site[1], site[2]) + partner + (site_[2] if site_ is not None else '', ))
+                    else:
+                        site_file_h.add((self.global_state.anno_short_name[i], site[0], site[1]) + partner)
+    def _get_candidate_pairs(self):
+        """Method to find all the pairs of sites of the two annotations satisfying the overlapping criteria for both sites by a sweep over the sites sorted by their begins"""
+        intervals = [(site[0], site[1], 1, site_idx) for site_idx, site in enumerate(self.current_seq.sites[1])]
+        shifts = (-self.seq_length, 0, self.seq_length) if self.opt.circular else (0, )
+        for shift in shifts:
+            intervals.extend((site[0] + shift, site[1] + shift, 2, site_idx) for site_idx, site in enumerate(self.current_seq.sites[2]))
+        intervals.sort()
+        active = [None, [], []]
+        pairs = set()
+        for begin, end, i, site_idx in intervals:
+            j = 3 - i
+            while active[j] and (active[j][0][0] < begin):
+                heapq.heappop(active[j])
+            for end_, site_idx_ in active[j]:
+                pairs.add((site_idx, site_idx_) if i == 1 else (site_idx_, site_idx))
+            heapq.heappush(active[i], (end, site_idx))
+        candidates = []
+        for site_idx_1, site_idx_2 in sorted(pairs):
+            site = self.current_seq.sites[1][site_idx_1]
+            site_ = self.current_seq.sites[2][site_idx_2]
+            overlapped_symbols = self._get_overlapped_symbols(site, site_, 1)
+            if self._check_overlap_sufficiency(overlapped_symbols, self._get_site_length(site, site_)) and self._check_overlap_sufficiency(overlapped_symbols, self._get_site_length(site_, site)):
+                candidates.append((overlapped_symbols, site_idx_1, site_idx_2))
+        return candidates
+    def _match_greedy(self, candidates):
+        """Method to choose the pairs of matched sites in the order of decreasing overlap, skipping the pairs with an already matched site"""
+        partners = [None, {}, {}]
+        for overlapped_symbols, site_idx_1, site_idx_2 in sorted(candidates, key = lambda x: (-x[0], x[1], x[2])):
+            if (site_idx_1 not in partners[1]) and (site_idx_2 not in partners[2]):
+                partners[1][site_idx_1] = (site_idx_2, overlapped_symbols)
+                partners[2][site_idx_2] = (site_idx_1, overlapped_symbols)
+        return partners
+    def _match_maximal(self, candidates):
+        """Method to choose the maximal number of pairs of matched sites by the Hopcroft-Karp algorithm"""
+        adjacency = defaultdict(list)
+        overlaps = {}
+        for overlapped_symbols, site_idx_1, site_idx_2 in sorted(candidates, key = lambda x: (-x[0], x[1], x[2])):
+            adjacency[site_idx_1].append(site_idx_2)
+            overlaps[(site_idx_1, site_idx_2)] = overlapped_symbols
+        match_1 = {}
+        match_2 = {}
+        while True:
+            #Breadth-first search for the layers of the shortest augmenting paths
+            layer = {x: 0 for x in adjacency if x not in match_1}
+            queue = list(layer)
+            found = False
+            for site_idx_1 in queue:
+                for site_idx_2 in adjacency[site_idx_1]:
+                    site_idx_1_ = match_2.get(site_idx_2)
+                    if site_idx_1_ is None:
+                        found = True
+                    elif site_idx_1_ not in layer:
+                        layer[site_idx_1_] = layer[site_idx_1] + 1
+                        queue.append(site_idx_1_)
+            if not found:
+                break
+            #Depth-first search for vertex-disjoint augmenting paths along the layers
+            for root in [x for x in adjacency if x not in match_1]:
+                stack = [(root, iter(adjacency[root]))]
+                path = []
+                while stack:
+                    site_idx_1, neighbours = stack[-1]
+                    for site_idx_2 in neighbours:
+                        site_idx_1_ = match_2.get(site_idx_2)
+                        if site_idx_1_ is None:
+                            path.append((site_idx_1, site_idx_2))
+                            stack = []
+                            break
+                        if layer.get(site_idx_1_) == layer[site_idx_1] + 1:
+                            path.append((site_idx_1, site_idx_2))
+                            stack.append((site_idx_1_, iter(adjacency[site_idx_1_])))
+                            break
+                    else:
+                        layer[site_idx_1] = None
+                        stack.pop()
+                        if path:
+                            path.pop()
+                        continue
+                    if not stack:
+                        for site_idx_1_, site_idx_2_ in path:
+                            match_1[site_idx_1_] = site_idx_2_
+                            match_2[site_idx_2_] = site_idx_1_
+        partners = [None, {}, {}]
+        for site_idx_1, site_idx_2 in match_1.items():
+            partners[1][site_idx_1] = (site_idx_2, overlaps[(site_idx_1, site_idx_2)])
+            partners[2][site_idx_2] = (site_idx_1, overlaps[(site_idx_1, site_idx_2)])
+        return partners
+    def _calculate_site_wise_one_to_one(self, detailed_file_h, site_file_h):
+        """Method to match the sites one-to-one and write the site-wise information to the detailed output file"""
+        candidates = self._get_candidate_pairs()
+        partners = self._match_greedy(candidates) if self.opt.overlap_matching == 'greedy' else self._match_maximal(candidates)
+        for i in (1, 2):
+            j = 3 - i
+            self.results.site_m[i] += len(partners[i])
+            self.results.site_nm[i] += len(self.current_seq.sites[i]) - len(partners[i])
+            for site_idx, site in enumerate(self.current_seq.sites[i]):
+                if self.opt.gross:
+                    self.results.site_len[i] += site[1] - site[0] + 1
+                if (detailed_file_h is not None) or (site_file_h is not None):
+                    partner_idx, overlapped_symbols = partners[i].get(site_idx, (None, 0))
+                    site_ = self.current_seq.sites[j][partner_idx] if partner_idx is not None else None
+                    self._write_site_match(i, site, site_, overlapped_symbols, detailed_file_h, site_file_h)
     def calculate_site_wise(self, detailed_file_h, site_file_h):
         """Method to calculate site-wise measures and write the site-wise information to the detailed output file"""
-        if self.opt.overlap_apply in ('shortest', 'longest', 'current'):
+        summary_file_h = detailed_file_h
+        detailed_file_h = detailed_file_h if (detailed_file_h is not None) and detailed_file_h.site else None
+        if self.opt.overlap_tolerance is not None:
+            self._calculate_site_wise_tolerant(detailed_file_h, site_file_h)
+        elif self.opt.overlap_matching != 'any':
+            self._calculate_site_wise_one_to_one(detailed_file_h, site_file_h)
+        elif self.opt.overlap_apply in ('shortest', 'longest', 'current'):
             for i in (1, 2):
-                j = 3 - i
                 for site in self.current_seq.sites[i]:
                     if self.opt.gross:
                         self.results.site_len[i] += site[1] - site[0] + 1
                     found_match = False
-                    for site_ in self.current_seq.sites[j]:
-                        if (not self.opt.circular) and (site_[0] > site[1]):
-                            break
-                        overlapped_symbols = self._get_overlapped_symbols(site, site_, i)
+                    for site_, overlapped_symbols in self._get_overlapping_partners(site, i):
                         site_length_effective = self._get_site_length(site, site_)
                         if self._check_overlap_sufficiency(overlapped_symbols, site_length_effective):
                             self.results.site_m[i] += 1
@@ -937,51 +1828,11 @@ class BasicBooleanSequenceCalculator(BasicSequenceCalculator):
                     if not found_match:
                         self.results.site_nm[i] += 1
                     if (detailed_file_h is not None) or (site_file_h is not None):
-                        if found_match:
-                            length_perc_1 = round(100 * overlapped_symbols / (site[1] - site[0] + 1))
-                            length_perc_2 = round(100 * overlapped_symbols / (site_[1] - site_[0] + 1))
-                            begin_ = site_[0]
-                            end_ = site_[1]
-                        else:
-                            overlapped_symbols = length_perc_1 = length_perc_2 = 0
-                            begin_ = end_ = '-'
-                        if detailed_file_h is not None:
-                            site_name_addition = ' ("{}")'.format(site[2]) if self.opt.site_names else ''
-                            message = '{}Site {}-{}{} of the {}: '.format(self.global_state.indent_site, site[0], site[1], site_name_addition, self.global_state.anno_name[i])
-                            if found_match:
-                                ending = '' if overlapped_symbols == 1 else 's'
-                                site_name_addition_ = ' ("{}")'.format(site_[2]) if self.opt.site_names else ''
-                                message += 'overlaps with site {}-{}{} of the {} by {} symbol{} ({}% and {}% of the site lengths respectively)'
-                                message = message.format(site_[0], site_[1], site_name_addition_, self.global_state.anno_name[j], overlapped_symbols, ending, length_perc_1, length_perc_2)
-                            else:
-                                message += 'no sufficient overlap found'
-                            detailed_file_h.write(message + os.linesep)
-                        if site_file_h is not None:
-                            if self.opt.site_difference == 'matched':
-                                if not found_match:
-                                    continue
-                            elif self.opt.site_difference == 'unmatched':
-                                if found_match:
-                                    continue
-                            elif self.opt.site_difference == 'discrepant':
-                                if (length_perc_1 == 100) and (length_perc_2 == 100):
-                                    continue
-                            list_ = [self.current_seq.GID] if self.opt.group_map else []
-                            list_.extend([self.current_seq.SID, self.global_state.anno_short_name[i], site[0], site[1]])
-                            if self.opt.site_names:
-                                list_.append(site[2])
-                            list_.extend([overlapped_symbols, length_perc_1, length_perc_2, begin_, end_])
-                            if self.opt.site_names:
-                                list_.append(site_[2] if found_match else '')
-                            message = ('{}\t' * (len(list_) - 1) + '{}').format(*list_)
-                            site_file_h.write(message + os.linesep)
+                        self._write_site_match(i, site, site_ if found_match else None, overlapped_symbols if found_match else 0, detailed_file_h, site_file_h)
         elif self.opt.overlap_apply == 'patched':
             for i in (1, 2):
                 for site in self.current_seq.sites[i]:
-                    if self.opt.circular and (site[1] > self.seq_length):
-                        matched_symbols = np.sum(self.seq[site[0] - 1: ] == 3) + np.sum(self.seq[: site[1] - self.seq_length] == 3)
-                    else:
-                        matched_symbols = np.sum(self.seq[site[0] - 1: site[1]] == 3)
+                    matched_symbols = self._get_patched_symbols(site)
                     site_length = site[1] - site[0] + 1
                     found_match = self._check_overlap_sufficiency(matched_symbols, site_length)
                     if found_match:
@@ -994,64 +1845,43 @@ class BasicBooleanSequenceCalculator(BasicSequenceCalculator):
                         else:
                             length_perc = 0
                         if detailed_file_h is not None:
-                            message = '{}Site {}-{} of the {}: '.format(self.global_state.indent_site, site[0], site[1], self.global_state.anno_name[i])
-                            if found_match:
-                                ending = '' if matched_symbols == 1 else 's'
-                                message += 'overlaps by total {} symbol{} ({}% of the site length) with sites from the {}'.format(matched_symbols, ending, length_perc, self.global_state.anno_name[j])
-                            else:
-                                message += 'no sufficient overlap found'
-                            detailed_file_h.write(message + os.linesep)
+                            detailed_file_h.add('site_patched', i, site[0], site[1], found_match, matched_symbols if found_match else 0, length_perc)
                     if site_file_h is not None:
-                        if found_match and (self.opt.site_difference == 'unmatched'):
+                        if (self.opt.site_difference == 'matched') and (not found_match):
+                            continue
+                        if (self.opt.site_difference == 'unmatched') and found_match:
                             continue
-                        list_ = [self.current_seq.GID] if self.opt.group_map else []
-                        list_.extend([self.current_seq.SID, self.global_state.anno_short_name[i], site[0], site[1]])
                         if self.opt.site_names:
-                            list_.append(site[2])
-                        list_.extend([overlapped_symbols, length_perc])
-                        message = ('{}\t' * (len(list_) - 1) + '{}').format(*list_)
-                        site_file_h.write(message + os.linesep)
+                            site_file_h.add((self.global_state.anno_short_name[i], site[0], site[1], site[2], matched_symbols if found_match else 0, length_perc))
+                        else:
+                            site_file_h.add((self.global_state.anno_short_name[i], site[0], site[1], matched_symbols if found_match else 0, length_perc))
         else:
             error('Unknown overlap apply method')
         for i in (1, 2):
             if not self.opt.gross:
                 self.results.site_len[i] = int(np.sum(self.seq == i) + np.sum(self.seq == 3))
-            sites_n = self.results.site_m[i] + self.results.site_nm[i]
-            if sites_n == 0:
-                if detailed_file_h:
-                    detailed_file_h.write('{}There are no sites in the {}'.format(self.global_state.indent_site, self.global_state.anno_name[i]) + os.linesep)
-                continue
-            else:
-                ending = '' if sites_n == 1 else 's'
-                verb = 'is' if sites_n == 1 else 'are'
-                symbols = self.results.site_len[i]
-                ending1 = '' if symbols == 1 else 's'
-                insert0 = '' if self.opt.gross else ' unique'
-                insert1 = ' gross' if self.opt.gross else ''
-                message_base = '{}There {} {} site{} in the {} with total length {}{} symbol{}{}'
-                if detailed_file_h:
-                    detailed_file_h.write(message_base.format(self.global_state.indent_site, verb, sites_n, ending, self.global_state.anno_name[i], symbols, insert0, ending1, insert1) + os.linesep)
-            if detailed_file_h:
-                sites_n = self.results.site_m[i]
-                ending = ' is' if sites_n == 1 else 's are'
-                detailed_file_h.write('{}{} {} site{} matched in the {}'.format(self.global_state.indent_site, sites_n, self.global_state.anno_name[i], ending, self.global_state.anno_name[j]) + os.linesep)
-                sites_n = self.results.site_nm[i]
-                ending = ' has' if sites_n == 1 else 's have'
-                detailed_file_h.write('{}{} {} site{} no match in the {}'.format(self.global_state.indent_site, sites_n, self.global_state.anno_name[i], ending, self.global_state.anno_name[j]) + os.linesep)
+            if summary_file_h:
+                if self.results.site_m[i] + self.results.site_nm[i] == 0:
+                    summary_file_h.add('no_sites', i)
+                else:
+                    summary_file_h.add('sites', i, self.results.site_m[i] + self.results.site_nm[i], self.results.site_len[i], self.results.site_m[i], self.results.site_nm[i])
         
 class BasicEnrichmentSequenceCalculator(BasicSequenceCalculator):
     """Class for calculating basic enrichment measures and write into files required output annotations in a particular sequence"""
-    def __init__(self, global_state, opt, current_seq):
+    def __init__(self, global_state, opt, current_seq, benchmark_index = None):
         BasicSequenceCalculator.__init__(self, global_state, opt, current_seq)
         self.n = self.opt.enrichment_count
         bytes_required = self._estimate_required_precison()
         self.seq_length = current_seq.length
         self.seq = [None] + [np.zeros(shape = current_seq.length, dtype = 'i' + str(bytes_required)) for x in range(2)]
         self.results = BasicEnrichmentMeasures()
+        self.benchmark_index = benchmark_index
         self._count_occurrences()
     def _count_occurrences(self):
         """Method to count the occurences in the annotations for each symbol in the sequence"""
-        for i in (1, 2):
+        if self.benchmark_index is not None:
+            self.seq[1][:] = self.benchmark_index.coverage
+        for i in ((2, ) if self.benchmark_index is not None else (1, 2)):
             for site in self.current_seq.sites[i]:
                 for idx in range(site[0] - 1, site[1]):
                     if self.opt.circular and (idx >= self.seq_length):
@@ -1090,27 +1920,188 @@ class BasicEnrichmentSequenceCalculator(BasicSequenceCalculator):
             error("Too  many sites annotated. Maximal number is {}".format(2 ** 63 - 1))
         bytes_required = [1, 1, 2, 4, 4, 8, 8, 8, 8][bytes_required]
         return bytes_required
-    def _write_measure_info_to_detailed_file(self, symbols_n, description, file_handler):
-        """Writing the information on symbol counts in a specific category"""
-        ending = ' is' if symbols_n == 1 else 's are'
-        file_handler.write('{}{} symbol{} enriched in {}'.format(self.global_state.indent_site, symbols_n, ending, description) + os.linesep)
     def calculate_residue_wise(self, detailed_file_h):
         """Method to calculate count residue-wise measures for a given sequence"""
         for i in (1, 2):
             j = 2 if i == 1 else 1
             self.results.e[i] = np.sum(self.seq[i] >= self.n)
-            description = 'the ' + self.global_state.anno_name[i]
             if detailed_file_h:
-                self._write_measure_info_to_detailed_file(self.results.e[i], description, detailed_file_h)
+                detailed_file_h.add('enriched', 'e{}'.format(i), self.results.e[i])
             self.results.re[i] = np.sum((self.seq[i] - self.seq[j]) >= self.n)
         self.results.ee = np.sum((self.seq[1] >= self.n) * (self.seq[2] >= self.n))
         if detailed_file_h:
-            self._write_measure_info_to_detailed_file(self.results.ee, 'both annotations', detailed_file_h)
+            detailed_file_h.add('enriched', 'ee', self.results.ee)
         self.results.ne = np.sum((self.seq[1] < self.n) * (self.seq[2] < self.n))
         if detailed_file_h:
-            self._write_measure_info_to_detailed_file(self.results.ne, 'neither annotations', detailed_file_h)
+            detailed_file_h.add('enriched', 'ne', self.results.ne)
         self.results.nre = len(self.seq) - self.results.re[1] - self.results.re[2]
         
+    def calculate_residue_wise_sweep(self, thresholds):
+        """Method to calculate count residue-wise measures for a list of enrichment counts from the joint histogram of the numbers of the counts reached by the occurrence numbers"""
+        sorted_thresholds = np.unique(np.array(thresholds, dtype = 'i8'))
+        size = len(sorted_thresholds) + 1
+        reached = [None] + [np.searchsorted(sorted_thresholds, self.seq[i], side = 'right') for i in (1, 2)]
+        suffix = np.bincount(reached[1] * size + reached[2], minlength = size * size).reshape(size, size)
+        suffix = suffix[:: -1, :: -1].cumsum(axis = 0).cumsum(axis = 1)[:: -1, :: -1]
+        differences = self.seq[1].astype('i8') - self.seq[2]
+        differences_suffix = [None] + [np.bincount(np.searchsorted(sorted_thresholds, x, side = 'right'), minlength = size)[:: -1].cumsum()[:: -1] for x in (differences, -differences)]
+        results_list = []
+        for n in thresholds:
+            k = int(np.searchsorted(sorted_thresholds, n)) + 1
+            results = BasicEnrichmentMeasures()
+            results.e[1] = suffix[k, 0]
+            results.e[2] = suffix[0, k]
+            results.ee = suffix[k, k]
+            results.ne = suffix[0, 0] - results.e[1] - results.e[2] + results.ee
+            results.re[1] = differences_suffix[1][k]
+            results.re[2] = differences_suffix[2][k]
+            results.nre = len(self.seq) - results.re[1] - results.re[2]
+            results_list.append(results)
+        return results_list
+    def calculate_residue_wise_windows(self, begins, ends):
+        """Method to calculate count residue-wise measures for every window of a given sequence"""
+        enriched = [None] + [self.seq[i] >= self.n for i in (1, 2)]
+        counts = {}
+        counts['e1'] = self._sum_in_windows(enriched[1], begins, ends)
+        counts['e2'] = self._sum_in_windows(enriched[2], begins, ends)
+        counts['ee'] = self._sum_in_windows(enriched[1] & enriched[2], begins, ends)
+        counts['ne'] = self._sum_in_windows((~enriched[1]) & (~enriched[2]), begins, ends)
+        counts['re1'] = self._sum_in_windows((self.seq[1] - self.seq[2]) >= self.n, begins, ends)
+        counts['re2'] = self._sum_in_windows((self.seq[2] - self.seq[1]) >= self.n, begins, ends)
+        results_list = []
+        for k in range(len(begins)):
+            results = BasicEnrichmentMeasures()
+            for i in (1, 2):
+                results.e[i] = int(counts['e' + str(i)][k])
+                results.re[i] = int(counts['re' + str(i)][k])
+            results.ee = int(counts['ee'][k])
+            results.ne = int(counts['ne'][k])
+            results.nre = int(ends[k] - begins[k]) - results.re[1] - results.re[2]
+            results_list.append(results)
+        return results_list
+
+class AnnotationIndex:
+    """Class to hold the site boundaries and the symbol coverage of an annotation in a particular sequence"""
+    def __init__(self, sites, seq_length, circular, coverage = None):
+        self.seq_length = seq_length
+        self.begins = np.fromiter((x[0] for x in sites), dtype = 'i8', count = len(sites))
+        self.ends = np.fromiter((x[1] for x in sites), dtype = 'i8', count = len(sites))
+        self.coverage = self._calculate_coverage(circular) if coverage is None else coverage
+    def _calculate_coverage(self, circular):
+        """Method to calculate number of sites covering every symbol of the sequence"""
+        linear_ends = np.minimum(self.ends, self.seq_length)
+        differences = np.bincount(self.begins - 1, minlength = self.seq_length + 1) - np.bincount(linear_ends, minlength = self.seq_length + 1)
+        if circular:
+            wrapped_ends = self.ends[self.ends > self.seq_length] - self.seq_length
+            differences[0] += len(wrapped_ends)
+            differences -= np.bincount(wrapped_ends, minlength = self.seq_length + 1)
+        return np.cumsum(differences[: -1])
+
+class TrackIndex:
+    """Class to hold the annotation indices and the symbol classes of several tracks (strands or reading frames) of the same sequence, calculated for all the tracks in one pass"""
+    def __init__(self, track_sites, seq_length, circular):
+        tracks_n = len(track_sites)
+        self.annotation_indices = [[None, None, None] for x in range(tracks_n)]
+        coverage = [None, None, None]
+        for i in (1, 2):
+            sites_n = [len(x[i]) for x in track_sites]
+            offsets = np.repeat(np.arange(tracks_n, dtype = 'i8') * (seq_length + 1), sites_n)
+            begins = np.fromiter((x[0] for sites in track_sites for x in sites[i]), dtype = 'i8', count = sum(sites_n))
+            ends = np.fromiter((x[1] for sites in track_sites for x in sites[i]), dtype = 'i8', count = sum(sites_n))
+            size = tracks_n * (seq_length + 1)
+            differences = np.bincount(offsets + begins - 1, minlength = size) - np.bincount(offsets + np.minimum(ends, seq_length), minlength = size)
+            if circular:
+                wrapped = ends > seq_length
+                differences += np.bincount(offsets[wrapped], minlength = size) - np.bincount(offsets[wrapped] + ends[wrapped] - seq_length, minlength = size)
+            coverage[i] = np.cumsum(differences.reshape(tracks_n, seq_length + 1)[:, : -1], axis = 1)
+            for track_idx in range(tracks_n):
+                self.annotation_indices[track_idx][i] = AnnotationIndex(track_sites[track_idx][i], seq_length, circular, coverage[i][track_idx])
+        self.symbol_classes = (coverage[1] > 0).astype('i1') + 2 * (coverage[2] > 0).astype('i1')
+
+class IndexedBooleanSequenceCalculator(BasicBooleanSequenceCalculator):
+    """Class for calculating basic Boolean measures with the symbol classification based on the annotation coverage"""
+    def __init__(self, global_state, opt, current_seq, annotation_indices = None, symbol_classes = None):
+        self.annotation_indices = annotation_indices if annotation_indices is not None else [None, None, None]
+        self.symbol_classes = symbol_classes
+        self.max_lengths = [None, None, None]
+        BasicBooleanSequenceCalculator.__init__(self, global_state, opt, current_seq)
+    def _classify_symbols(self):
+        """Method to classify symbols in the sequence by their occurrence in the annotations"""
+        if self.symbol_classes is not None:
+            self.seq = self.symbol_classes
+            return
+        for i in (1, 2):
+            if self.annotation_indices[i] is None:
+                self.annotation_indices[i] = AnnotationIndex(self.current_seq.sites[i], self.seq_length, self.opt.circular)
+            self.seq += np.where(self.annotation_indices[i].coverage > 0, i, 0).astype('i1')
+    def _get_coverage(self, i):
+        """Method to get number of sites of an annotation covering every symbol of the sequence from the annotation index"""
+        return self.annotation_indices[i].coverage
+    def _get_overlapping_partners(self, site, i):
+        """Generator of the partner sites overlapping a given site together with the shared symbols, found by binary search over the unrolled partner begins"""
+        begins, ends, indices = self._get_unrolled_sites(3 - i)
+        if len(begins) == 0:
+            return
+        if self.max_lengths[3 - i] is None:
+            self.max_lengths[3 - i] = int(np.max(ends - begins))
+        lo = np.searchsorted(begins, site[0] - self.max_lengths[3 - i], side = 'left')
+        hi = np.searchsorted(begins, site[1], side = 'right')
+        overlaps = {}
+        for begin_, end_, site_idx_ in zip(begins[lo: hi].tolist(), ends[lo: hi].tolist(), indices[lo: hi].tolist()):
+            overlapped_symbols = min(site[1], end_) - max(site[0], begin_) + 1
+            if overlapped_symbols > overlaps.get(site_idx_, 0):
+                overlaps[site_idx_] = overlapped_symbols
+        for site_idx_ in sorted(overlaps):
+            site_ = self.current_seq.sites[3 - i][site_idx_]
+            if self.opt.predictor_nature != 'neutral':
+                yield site_, self._get_overlapped_symbols(site, site_, i)
+            else:
+                yield site_, overlaps[site_idx_]
+    def _get_output_mask(self, type_):
+        """Method to get the membership of all the symbols in a given Boolean output annotation"""
+        if type_ == 'union':
+            return self.seq >= 1
+        elif type_ == 'intersection':
+            return self.seq == 3
+        elif type_ == 'complement1':
+            return self.seq == 2
+        elif type_ == 'complement2':
+            return self.seq == 1
+        raise NotImplementedError("Output annotation '{}' is not implemented".format(type_))
+    def write_to_files(self, file_handlers):
+        """Method to write the required output annotations"""
+        self._write_runs_to_files(file_handlers)
+
+class IndexedEnrichmentSequenceCalculator(BasicEnrichmentSequenceCalculator):
+    """Class for calculating basic enrichment measures with the occurrences counted from the annotation coverage"""
+    def __init__(self, global_state, opt, current_seq, annotation_indices = None):
+        self.annotation_indices = annotation_indices if annotation_indices is not None else [None, None, None]
+        BasicEnrichmentSequenceCalculator.__init__(self, global_state, opt, current_seq)
+    def _count_occurrences(self):
+        """Method to count the occurences in the annotations for each symbol in the sequence"""
+        for i in (1, 2):
+            if self.annotation_indices[i] is None:
+                self.annotation_indices[i] = AnnotationIndex(self.current_seq.sites[i], self.seq_length, self.opt.circular)
+            self.seq[i][: ] = self.annotation_indices[i].coverage
+    def _get_output_mask(self, type_):
+        """Method to get the membership of all the symbols in a given enrichment output annotation"""
+        if type_ == 'union':
+            return (self.seq[1] >= self.n) | (self.seq[2] >= self.n)
+        elif type_ == 'intersection':
+            return (self.seq[1] >= self.n) & (self.seq[2] >= self.n)
+        elif type_ == 'complement1':
+            return (self.seq[1] < self.n) & (self.seq[2] >= self.n)
+        elif type_ == 'complement2':
+            return (self.seq[1] >= self.n) & (self.seq[2] < self.n)
+        elif type_ == 're1':
+            return self.seq[1] - self.seq[2] >= self.n
+        elif type_ == 're2':
+            return self.seq[2] - self.seq[1] >= self.n
+        raise NotImplementedError("Output annotation '{}' is not implemented".format(type_))
+    def write_to_files(self, file_handlers):
+        """Method to write the required output annotations"""
+        self._write_runs_to_files(file_handlers)
+
 class PerformanceCalculator:
     """Class to calculate all selected performance measures on the basis of the basic measures"""
     def __init__(self, basic_measures, performance_maeasures):
@@ -1337,82 +2328,1067 @@ class PerformanceCalculator:
         for measure in self.performance_measures.name_map:
             getattr(self, '_calc_' + measure.var_name)()
 
+class ThresholdSweep:
+    """Abstract class to calculate performance measures for a whole grid of thresholds in a single pass"""
+    column_names = ()
+    def __init__(self, opt):
+        self.opt = opt
+        self.seq_records = defaultdict(list)
+    def add_sequence(self, GID, basic_sequence_calculator, seq_length):
+        """Method to calculate and save the basic measures of a sequence for all the thresholds"""
+        raise NotImplementedError("Method 'add_sequence' is not implemented")
+    def get_grid(self):
+        """Method to get the threshold values for every grid point"""
+        raise NotImplementedError("Method 'get_grid' is not implemented")
+    def get_group_records(self, GID, grid_idx):
+        """Method to get the basic measures for every sequence of a group at a given grid point"""
+        raise NotImplementedError("Method 'get_group_records' is not implemented")
+    def write(self, ofile, calculator, group_order, measures):
+        """Method to calculate dataset-wide averages of the measures for every grid point and write them to the file"""
+        attr_names = [x.var_name for x in measures]
+        ofile.write('\t'.join(self.column_names + tuple(x.displayed_name for x in measures)) + os.linesep)
+        for grid_idx, thresholds in enumerate(self.get_grid()):
+            accumulator = DatasetAccumulator(self.opt)
+            for GID in group_order:
+                accumulator.add_group(*calculator.aggregate_group(self.get_group_records(GID, grid_idx)))
+            accumulator.finalize()
+            averages = accumulator.get_bottom_line_values(attr_names)[0]
+            row = '\t'.join(str(x) for x in thresholds)
+            for value in averages:
+                row += '\t' + DataProcessor._format_average(value)
+            ofile.write(row + os.linesep)
+
+class OverlapSweep(ThresholdSweep):
+    """Class to calculate site-wise measures for a whole grid of overlap thresholds in a single pass"""
+    column_names = ('Os', 'Op')
+    description = 'site-wise measures for every combination of minimal overlapping symbols (Os) and part (Op)'
+    def __init__(self, opt):
+        ThresholdSweep.__init__(self, opt)
+        self.symbols_thresholds = sorted(opt.overlap_symbols_sweep) if opt.overlap_symbols_sweep else [opt.overlap_symbols]
+        self.part_thresholds = sorted(opt.overlap_part_sweep) if opt.overlap_part_sweep else [opt.overlap_part]
+    def add_sequence(self, GID, basic_sequence_calculator, seq_length):
+        """Method to calculate and save the numbers of matched sites in a sequence for all the thresholds"""
+        site_m = basic_sequence_calculator.calculate_site_wise_sweep(self.symbols_thresholds, self.part_thresholds)
+        self.seq_records[GID].append((basic_sequence_calculator.get_results(), site_m, seq_length))
+    def get_grid(self):
+        """Method to get the threshold values for every grid point"""
+        return [(x, y) for x in self.symbols_thresholds for y in self.part_thresholds]
+    def get_group_records(self, GID, grid_idx):
+        """Method to get basic measures for every sequence of a group, with the site-wise ones for given thresholds"""
+        symbols_idx, part_idx = divmod(grid_idx, len(self.part_thresholds))
+        seq_records = []
+        for seq_counts, site_m, seq_length in self.seq_records[GID]:
+            seq_counts_ = copy.copy(seq_counts)
+            seq_counts_.site_m = [None, 0, 0]
+            seq_counts_.site_nm = [None, 0, 0]
+            for i in (1, 2):
+                seq_counts_.site_m[i] = int(site_m[i][symbols_idx, part_idx])
+                seq_counts_.site_nm[i] = seq_counts.site_m[i] + seq_counts.site_nm[i] - seq_counts_.site_m[i]
+            seq_records.append((seq_counts_, seq_length))
+        return seq_records
+
+class EnrichmentSweep(ThresholdSweep):
+    """Class to calculate enrichment measures for a range of enrichment counts in a single pass"""
+    column_names = ('n', )
+    description = 'measures for every minimal number of sites to consider a symbol enriched (n)'
+    def __init__(self, opt):
+        ThresholdSweep.__init__(self, opt)
+        self.thresholds = sorted(opt.enrichment_sweep)
+    def add_sequence(self, GID, basic_sequence_calculator, seq_length):
+        """Method to calculate and save the basic enrichment measures of a sequence for all the enrichment counts"""
+        self.seq_records[GID].append((basic_sequence_calculator.calculate_residue_wise_sweep(self.thresholds), seq_length))
+    def get_grid(self):
+        """Method to get the threshold values for every grid point"""
+        return [(x, ) for x in self.thresholds]
+    def get_group_records(self, GID, grid_idx):
+        """Method to get basic measures for every sequence of a group for a given enrichment count"""
+        return [(seq_counts[grid_idx], seq_length) for seq_counts, seq_length in self.seq_records[GID]]
+
+class SiteNameBreakdown:
+    """Class to calculate the performance measures separately for every site name or site name pattern"""
+    def __init__(self, opt, input_data):
+        self.opt = opt
+        self.input_data = input_data
+        self.patterns = [re.compile(x) for x in opt.site_name_patterns]
+        self.keys = list(opt.site_name_patterns) if self.patterns else self._get_site_names()
+        self.accumulators = {key: DatasetAccumulator(opt) for key in self.keys}
+        #If the sequences are defined by the annotations, a run on the sites of one name only would not contain the sequences without such sites
+        self.sequences_fixed = bool(opt.len_db or opt.group_map) and (not opt.sequences_as_groups)
+    def _get_site_names(self):
+        """Method to collect all the distinct site names in both annotations"""
+        site_names = set()
+        for i in (1, 2):
+            for sites_per_SID in self.input_data.sites[i].values():
+                for sites in sites_per_SID.values():
+                    site_names.update(site[2] for site in sites)
+        return sorted(site_names)
+    def _get_keys(self, site_name):
+        """Method to get the names or patterns a site belongs to"""
+        if not self.patterns:
+            return (site_name, )
+        return [key for key, pattern in zip(self.keys, self.patterns) if pattern.search(site_name)]
+    def add_group(self, GID, calculator):
+        """Method to calculate the performance measures of a group for every site name, classifying only the sequences with sites of the name"""
+        seq_records = {key: [] for key in self.keys}
+        for SID in self.input_data.group_map[GID]:
+            seq_length = self.input_data.seq_len[SID]
+            split_sites = {}
+            for i in (1, 2):
+                for site in self.input_data.sites[i][GID][SID]:
+                    for key in self._get_keys(site[2]):
+                        split_sites.setdefault(key, [None, [], []])[i].append(site)
+            empty_seq_counts = None
+            for key in self.keys:
+                if key in split_sites:
+                    seq_counts = calculator.calculate_sequence_counts(CurrentSequence(GID, SID, seq_length, split_sites[key]))
+                elif not self.sequences_fixed:
+                    continue
+                else:
+                    if empty_seq_counts is None:
+                        empty_seq_counts = calculator.calculate_sequence_counts(CurrentSequence(GID, SID, seq_length, [None, [], []]))
+                    seq_counts = empty_seq_counts
+                seq_records[key].append((seq_counts, seq_length))
+        for key in self.keys:
+            if seq_records[key]:
+                self.accumulators[key].add_group(*calculator.aggregate_group(seq_records[key]))
+    def write(self, ofile, measures):
+        """Method to calculate dataset-wide averages of the measures for every site name and write them to the file"""
+        attr_names = [x.var_name for x in measures]
+        ofile.write('\t'.join(['Name'] + [x.displayed_name for x in measures]) + os.linesep)
+        for key in self.keys:
+            accumulator = self.accumulators[key]
+            accumulator.finalize()
+            row = key
+            for value in accumulator.get_bottom_line_values(attr_names)[0]:
+                row += '\t' + DataProcessor._format_average(value)
+            ofile.write(row + os.linesep)
+
+class MatchDistanceDistribution:
+    """Class to accumulate the dataset-wide distribution of the distances between the sites matched under tolerance matching and their nearest partners"""
+    def __init__(self, opt):
+        self.opt = opt
+        self.counts = [None] + [np.zeros(opt.overlap_tolerance + 1, dtype = 'i8') for i in (1, 2)]
+    def add_sequence(self, basic_sequence_calculator):
+        """Method to add the match distances of a sequence"""
+        for i in (1, 2):
+            self.counts[i] += np.bincount(basic_sequence_calculator.match_distances[i], minlength = self.opt.overlap_tolerance + 1)
+    def write(self, ofile):
+        """Method to write the numbers of matched sites of both annotations for every distance"""
+        column_names = ('SiteNBm', 'SiteNPm') if self.opt.benchmark else ('SiteN1m', 'SiteN2m')
+        ofile.write('\t'.join(('Distance', ) + column_names) + os.linesep)
+        for distance in range(self.opt.overlap_tolerance + 1):
+            ofile.write('{}\t{}\t{}'.format(distance, self.counts[1][distance], self.counts[2][distance]) + os.linesep)
+
+class SequenceWindows:
+    """Class to calculate and write the residue-wise performance measures for the sliding windows along every sequence"""
+    def __init__(self, opt, global_state, input_data, ofile, measures):
+        self.opt = opt
+        self.global_state = global_state
+        self.input_data = input_data
+        self.ofile = ofile
+        self.measures = [x for x in measures if not (x.var_name.startswith('site_') or x.var_name.endswith('seq_n'))]
+    def write_header(self):
+        """Method to write the column names"""
+        column_names = (['Group'] if self.opt.grouped else []) + ['Sequence', 'Begin', 'End'] + [x.displayed_name for x in self.measures]
+        self.ofile.write('\t'.join(column_names) + os.linesep)
+    def get_bounds(self, seq_length):
+        """Method to get the begin (0-based) and end (exclusive) positions of all the windows in a sequence, the last window being truncated in a linear sequence and wrapped around the end of a circular one"""
+        size, step = self.opt.window
+        begins = np.arange(0, seq_length, step, dtype = 'i8')
+        if self.opt.circular:
+            return begins, begins + min(size, seq_length)
+        begins = begins[(begins == 0) | (begins - step + size < seq_length)]
+        return begins, np.minimum(begins + size, seq_length)
+    def _format_bounds(self, SID, begin, end):
+        """Method to represent the window boundaries as the numbers of its first and last symbols or, for time series, as its start and finish time points"""
+        if not self.global_state.time_unit_seconds:
+            return '{}\t{}'.format(begin + 1, end)
+        series_start = time.mktime(self.input_data.time_series_starts[SID])
+        return '\t'.join(time.strftime(self.input_data.time_format, time.localtime(series_start + x * self.global_state.time_unit_seconds)) for x in (begin, end))
+    def add_sequence(self, current_seq, basic_sequence_calculator):
+        """Method to calculate the performance measures for every window of a sequence and write them to the file"""
+        begins, ends = self.get_bounds(current_seq.length)
+        prefix = (current_seq.GID + '\t' if self.opt.grouped else '') + current_seq.SID + '\t'
+        for begin, end, window_counts in zip(begins, ends, basic_sequence_calculator.calculate_residue_wise_windows(begins, ends)):
+            window_counts.seq_n = 1
+            window_counts /= int(end - begin)
+            window_performance_measures = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross)
+            PerformanceCalculator(window_counts, window_performance_measures).calculate_performance_measures()
+            row = prefix + self._format_bounds(current_seq.SID, int(begin), int(end))
+            for measure in self.measures:
+                value = window_performance_measures.get_value(measure.var_name)
+                row += '\t' + ('{:.4f}'.format(value) if type(value) != int else str(value))
+            self.ofile.write(row + os.linesep)
+
+def _process_bootstrap_chunk(chunk_idx):
+    """Function to calculate the dataset-wide averages for a chunk of bootstrap resamples in a worker process"""
+    return BootstrapEstimator.current.process_chunk(chunk_idx)
+
+class BootstrapEstimator:
+    """Class to estimate the percentile confidence intervals of the dataset-wide averages by resampling the groups (or the sequences of non-grouped data) with replacement"""
+    current = None
+    chunk_elements_n = 1 << 22
+    max_chunk_resamples_n = 64
+    def __init__(self, opt, calculator):
+        self.opt = opt
+        self.calculator = calculator
+        self.measure_types = {x.var_name: x.type_ for x in PerformanceMeasures(opt.enrichment_count, opt.benchmark, opt.gross).name_map}
+        self.counts_template = None
+        self.rows = []
+        self.matrix = None
+        self.seeds = []
+    def _flatten_measures(self, performance_measures):
+        """Method to represent the performance measures as the list of the values, counts and validity flags, NA values being left out of the sums"""
+        row = []
+        for attr in performance_measures._attr_list:
+            value, count = getattr(performance_measures, attr)
+            row += [0, 0, 0] if math.isnan(value) else [value, count, 1]
+        return row
+    def _restore_measures(self, values):
+        """Method to restore the performance measures from the summed values, counts and validity flags"""
+        performance_measures = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross)
+        for attr_idx, attr in enumerate(performance_measures._attr_list):
+            value, count, valid = values[3 * attr_idx: 3 * attr_idx + 3]
+            if self.measure_types[attr] == 'int':
+                setattr(performance_measures, attr, [int(round(value)), int(round(count))])
+            else:
+                setattr(performance_measures, attr, [float(value) if valid else float('nan'), int(round(count))])
+        return performance_measures
+    @staticmethod
+    def _get_counts_items(counts):
+        """Method to get the basic measures present in the object, in a fixed order"""
+        return [(key, value) for key, value in sorted(vars(counts).items()) if (not key.startswith('_')) and (value is not None)]
+    def _flatten_counts(self, counts):
+        """Method to represent the basic measures as a list"""
+        if self.counts_template is None:
+            self.counts_template = copy.deepcopy(counts)
+        row = []
+        for key, value in BootstrapEstimator._get_counts_items(counts):
+            row += value[1: ] if isinstance(value, list) else [value]
+        return row
+    def _restore_counts(self, values):
+        """Method to restore the basic measures from the summed list, keeping the integer ones integer"""
+        counts = copy.deepcopy(self.counts_template)
+        idx = 0
+        for key, value in BootstrapEstimator._get_counts_items(counts):
+            if isinstance(value, list):
+                for i in (1, 2):
+                    value[i] = int(round(values[idx])) if isinstance(value[i], (int, np.integer)) else float(values[idx])
+                    idx += 1
+            else:
+                setattr(counts, key, int(round(values[idx])) if isinstance(value, (int, np.integer)) else float(values[idx]))
+                idx += 1
+        return counts
+    def add_group(self, seq_records, group_result):
+        """Method to add the results of a group as a resampling unit or, for non-grouped data, the basic measures of its sequences as the resampling units"""
+        group_performance_measures, group_counts, seq_length_sum = group_result
+        if self.opt.grouped:
+            self.rows.append(self._flatten_counts(group_counts) + [seq_length_sum] if self.opt.averaging == 'dataset' else self._flatten_measures(group_performance_measures))
+            return
+        for seq_counts, seq_length in seq_records:
+            if self.opt.averaging == 'sequence':
+                self.rows.append(self._flatten_measures(self.calculator.calculate_sequence_measures(seq_counts)) + [seq_length])
+            else:
+                self.rows.append(self._flatten_counts(seq_counts / seq_length if self.opt.len_adjust else seq_counts) + [seq_length])
+    def _get_averages(self, values, units_n, attr_names):
+        """Method to calculate the dataset-wide averages from the weighted sums over the resampling units"""
+        accumulator = DatasetAccumulator(self.opt)
+        if not self.opt.grouped:
+            if self.opt.averaging == 'sequence':
+                group_result = self.calculator.finalize_group(self._restore_measures(values[: -1]), None, units_n, int(round(values[-1])))
+            else:
+                group_result = self.calculator.finalize_group(None, self._restore_counts(values[: -1]), units_n, int(round(values[-1])))
+            accumulator.add_group(*group_result)
+        elif self.opt.averaging == 'dataset':
+            accumulator.counts = self._restore_counts(values[: -1])
+            accumulator.seq_length_sum = int(round(values[-1]))
+        else:
+            accumulator.performance_measures = self._restore_measures(values)
+        if self.opt.grouped:
+            accumulator.groups_n = units_n
+        accumulator.finalize()
+        return accumulator.get_bottom_line_values(attr_names)[0]
+    def _get_chunk_weights(self, chunk_idx):
+        """Method to draw the numbers of times every unit is taken into the resamples of a chunk"""
+        units_n = len(self.matrix)
+        chunk_size = self._get_chunk_size()
+        resamples_n = min(chunk_size, self.opt.bootstrap - chunk_idx * chunk_size)
+        picks = np.random.default_rng(self.seeds[chunk_idx]).integers(0, units_n, size = (resamples_n, units_n))
+        picks += (np.arange(resamples_n) * units_n)[:, None]
+        return np.bincount(picks.ravel(), minlength = resamples_n * units_n).reshape(resamples_n, units_n)
+    def _get_chunk_size(self):
+        """Method to get the number of resamples in a chunk, which depends only on the number of units for the results not to depend on the number of processes"""
+        return max(1, min(BootstrapEstimator.max_chunk_resamples_n, BootstrapEstimator.chunk_elements_n // len(self.matrix)))
+    def process_chunk(self, chunk_idx):
+        """Method to calculate the dataset-wide averages for every resample of a chunk"""
+        attr_names = list(self.measure_types)
+        return [self._get_averages(values, len(self.matrix), attr_names) for values in self._get_chunk_weights(chunk_idx) @ self.matrix]
+    def _run_chunks(self, chunks_n):
+        """Method to process all the chunks of resamples over the pool of worker processes, in the chunk order"""
+        BootstrapEstimator.current = self
+        processes = min(self.opt.processes, chunks_n)
+        context = None
+        if (processes > 1) and (not multiprocessing.current_process().daemon):
+            try:
+                context = multiprocessing.get_context('fork')
+            except ValueError:
+                if self.opt.warnings:
+                    print('Warning: worker processes are not supported on this platform. The bootstrap resamples are processed sequentially')
+        if context is not None:
+            with context.Pool(processes) as pool:
+                return list(pool.imap(_process_bootstrap_chunk, range(chunks_n)))
+        return [self.process_chunk(chunk_idx) for chunk_idx in range(chunks_n)]
+    def get_intervals(self):
+        """Method to get the lower and upper percentile bounds of every dataset-wide average over all the resamples"""
+        self.matrix = np.array(self.rows, dtype = 'f8')
+        chunks_n = -(-self.opt.bootstrap // self._get_chunk_size())
+        self.seeds = np.random.SeedSequence(self.opt.bootstrap_seed).spawn(chunks_n)
+        averages = np.array([x for chunk_averages in self._run_chunks(chunks_n) for x in chunk_averages], dtype = 'f8')
+        tail = (1.0 - self.opt.bootstrap_level) / 2 * 100
+        intervals = []
+        for values in averages.T:
+            values = values[~np.isnan(values)]
+            intervals.append(tuple(np.percentile(values, (tail, 100 - tail))) if len(values) else (float('nan'), float('nan')))
+        return intervals
+    def write(self, ofile, measures, estimates):
+        """Method to write the point estimates and the confidence intervals of the dataset-wide averages to the file"""
+        ofile.write('\t'.join(('Measure', 'Estimate', 'Lower', 'Upper')) + os.linesep)
+        for measure, estimate, (lower, upper) in zip(measures, estimates, self.get_intervals()):
+            ofile.write('{}\t{}\t{:.4f}\t{:.4f}'.format(measure.displayed_name, '{:.4f}'.format(estimate) if type(estimate) != int else str(estimate), lower, upper) + os.linesep)
+
+def _process_permutation_chunk(chunk_idx):
+    """Function to calculate the dataset-wide averages for a chunk of permutations in a worker process"""
+    return PermutationTest.current.process_chunk(chunk_idx)
+
+class PermutationTest:
+    """Class to test the dataset-wide averages against the null model of the sites of the second annotation randomly relocated within every sequence, counting the basic measures for a whole batch of relocations at once"""
+    current = None
+    chunk_permutations_n = 16
+    batch_elements_n = 1 << 22
+    def __init__(self, opt, input_data, calculator):
+        self.opt = opt
+        self.input_data = input_data
+        self.calculator = calculator
+        self.group_order = []
+        self.seeds = []
+        self.empty_results = BasicBooleanMeasures()
+    @staticmethod
+    def _get_bounds(sites):
+        """Method to get the begins and ends of the sites as arrays"""
+        begins = np.fromiter((x[0] for x in sites), dtype = 'i8', count = len(sites))
+        ends = np.fromiter((x[1] for x in sites), dtype = 'i8', count = len(sites))
+        return begins, ends
+    def draw_begins(self, rng, seq_length, begins, ends, permutations_n):
+        """Method to draw the begins of the relocated sites, either independently keeping the site lengths or by a common shift keeping also the gaps between the sites"""
+        if self.opt.permutation_keep == 'gaps':
+            if self.opt.circular:
+                shifts = rng.integers(0, seq_length, size = (permutations_n, 1))
+                return (begins[None, :] - 1 + shifts) % seq_length + 1
+            shifts = rng.integers(1 - begins.min(), seq_length - ends.max() + 1, size = (permutations_n, 1))
+            return begins[None, :] + shifts
+        if self.opt.circular:
+            return rng.integers(1, seq_length + 1, size = (permutations_n, len(begins)))
+        return rng.integers(1, np.maximum(seq_length - (ends - begins), 1) + 1, size = (permutations_n, len(begins)))
+    def _get_coverage(self, seq_length, begins, ends):
+        """Method to calculate the number of sites covering every symbol of the sequence for every row of the site boundaries"""
+        rows_n = len(begins)
+        offsets = (np.arange(rows_n, dtype = 'i8') * (seq_length + 1))[:, None]
+        size = rows_n * (seq_length + 1)
+        differences = np.bincount((offsets + begins - 1).ravel(), minlength = size) - np.bincount((offsets + np.minimum(ends, seq_length)).ravel(), minlength = size)
+        if self.opt.circular:
+            wrapped = np.broadcast_to(ends > seq_length, ends.shape)
+            wrapped_offsets = np.broadcast_to(offsets, ends.shape)[wrapped]
+            differences += np.bincount(wrapped_offsets, minlength = size) - np.bincount(wrapped_offsets + ends[wrapped] - seq_length, minlength = size)
+        return np.cumsum(differences.reshape(rows_n, seq_length + 1)[:, : -1], axis = 1)
+    def _sum_in_sites(self, prefix_sums, begins, ends, seq_length, wrap):
+        """Method to sum the symbol values over every site from their prefix sums, either wrapping the sites around the end of a circular sequence or truncating them at it"""
+        sums = np.take_along_axis(prefix_sums, np.minimum(ends, seq_length), axis = 1) - np.take_along_axis(prefix_sums, begins - 1, axis = 1)
+        if wrap:
+            sums += np.take_along_axis(prefix_sums, np.maximum(ends - seq_length, 0), axis = 1)
+        return sums
+    def _count_matched_sites(self, seq_length, begins1, ends1, begins2, ends2):
+        """Method to count the matched sites of both annotations for every row of the relocated sites, checking only the pairs of sites which may overlap, found by binary search over the begins sorted within every row"""
+        rows_n, sites_n = begins2.shape
+        site_m = [None, np.zeros(rows_n, dtype = 'i8'), np.zeros(rows_n, dtype = 'i8')]
+        if (len(begins1) == 0) or (sites_n == 0):
+            return site_m
+        indices2 = np.broadcast_to(np.arange(sites_n), begins2.shape)
+        if self.opt.circular:
+            begins2 = np.concatenate((begins2 - seq_length, begins2, begins2 + seq_length), axis = 1)
+            ends2 = np.concatenate((ends2 - seq_length, ends2, ends2 + seq_length), axis = 1)
+            indices2 = np.tile(indices2, 3)
+        #Every row is moved to its own range of keys, so that a single sorted array holds all the rows
+        span = 5 * seq_length
+        offsets = (np.arange(rows_n, dtype = 'i8') * span + 2 * seq_length)[:, None]
+        order = np.argsort((begins2 + offsets).ravel(), kind = 'stable')
+        keys = (begins2 + offsets).ravel()[order]
+        max_length = int((ends2 - begins2).max()) + 1
+        lows = np.searchsorted(keys, (begins1[None, :] - max_length + 1 + offsets).ravel(), side = 'left')
+        highs = np.searchsorted(keys, (ends1[None, :] + offsets).ravel(), side = 'right')
+        counts = highs - lows
+        pairs1 = np.repeat(np.arange(len(counts)), counts)
+        pairs2 = order[np.repeat(lows - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        begin1 = begins1[pairs1 % len(begins1)]
+        end1 = ends1[pairs1 % len(begins1)]
+        begin2 = begins2.ravel()[pairs2]
+        end2 = ends2.ravel()[pairs2]
+        overlapped_symbols = np.maximum(np.minimum(np.minimum(end1 - begin2, end2 - begin1), np.minimum(end1 - begin1, end2 - begin2)) + 1, 0)
+        if self.opt.predictor_nature == 'lagging':
+            overlapped_symbols[begin2 < begin1] = 0
+        elif self.opt.predictor_nature == 'leading':
+            overlapped_symbols[begin2 > begin1] = 0
+        site_length = [None, end1 - begin1 + 1, end2 - begin2 + 1]
+        for i in (1, 2):
+            if self.opt.overlap_apply == 'shortest':
+                site_length_effective = np.minimum(site_length[1], site_length[2])
+            elif self.opt.overlap_apply == 'longest':
+                site_length_effective = np.maximum(site_length[1], site_length[2])
+            else:
+                site_length_effective = site_length[i]
+            sufficient = (overlapped_symbols >= self.opt.overlap_symbols) & (overlapped_symbols / site_length_effective >= self.opt.overlap_part)
+            if i == 1:
+                matched = np.bincount(pairs1[sufficient], minlength = rows_n * len(begins1)) > 0
+            else:
+                matched = np.bincount((pairs2 // begins2.shape[1] * sites_n + indices2.ravel()[pairs2])[sufficient], minlength = rows_n * sites_n) > 0
+            site_m[i] = matched.reshape(rows_n, -1).sum(axis = 1)
+        return site_m
+    def count_sequence(self, seq_length, sites1, begins2, ends2):
+        """Method to calculate the basic measures of a sequence for every row of the begins and ends of the relocated sites of the second annotation"""
+        begins1, ends1 = PermutationTest._get_bounds(sites1)
+        rows_n = len(begins2)
+        coverage1 = self._get_coverage(seq_length, begins1[None, :], ends1[None, :]) > 0
+        coverage2 = self._get_coverage(seq_length, begins2, ends2) > 0
+        matched = coverage1 & coverage2
+        present = [None, coverage1.sum(), coverage2.sum(axis = 1)]
+        pp = matched.sum(axis = 1)
+        aa = seq_length - present[1] - present[2] + pp
+        prefix_sums = np.zeros((rows_n, seq_length + 1), dtype = 'i8')
+        np.cumsum(matched, axis = 1, out = prefix_sums[:, 1: ])
+        bounds = [None, (np.broadcast_to(begins1, begins2.shape[: 1] + begins1.shape), np.broadcast_to(ends1, begins2.shape[: 1] + ends1.shape)), (begins2, ends2)]
+        lengths = [None] + [(bounds[i][1] - bounds[i][0] + 1).sum(axis = 1) for i in (1, 2)]
+        if self.opt.gross:
+            pp_ = [None] + [self._sum_in_sites(prefix_sums, bounds[i][0], bounds[i][1], seq_length, False).sum(axis = 1) for i in (1, 2)]
+            pa = lengths[1] - pp_[1]
+            ap = lengths[2] - pp_[2]
+        else:
+            pp_ = [None, pp, pp]
+            pa = present[1] - pp
+            ap = present[2] - pp
+        if self.opt.overlap_apply == 'patched':
+            site_m = [None]
+            for i in (1, 2):
+                matched_symbols = self._sum_in_sites(prefix_sums, bounds[i][0], bounds[i][1], seq_length, self.opt.circular)
+                site_length = bounds[i][1] - bounds[i][0] + 1
+                site_m.append(((matched_symbols >= self.opt.overlap_symbols) & (matched_symbols / site_length >= self.opt.overlap_part)).sum(axis = 1))
+        else:
+            site_m = self._count_matched_sites(seq_length, begins1, ends1, begins2, ends2)
+        if not self.opt.gross:
+            site_len = [None, np.broadcast_to(present[1], (rows_n, )), present[2]]
+        elif self.opt.overlap_apply != 'patched':
+            site_len = lengths
+        else:
+            site_len = [None, np.zeros(rows_n, dtype = 'i8'), np.zeros(rows_n, dtype = 'i8')]
+        sites_n = [None, len(begins1), begins2.shape[1]]
+        results_list = []
+        for k in range(rows_n):
+            #Copying an empty object is much faster than creating one
+            results = copy.copy(self.empty_results)
+            if not self.opt.gross:
+                results.pp = int(pp[k])
+            results.pp_ = [None, int(pp_[1][k]), int(pp_[2][k])]
+            results.pa = int(pa[k])
+            results.ap = int(ap[k])
+            results.aa = int(aa[k])
+            results.site_m = [None, int(site_m[1][k]), int(site_m[2][k])]
+            results.site_nm = [None, sites_n[1] - results.site_m[1], sites_n[2] - results.site_m[2]]
+            results.site_len = [None, int(site_len[1][k]), int(site_len[2][k])]
+            results_list.append(results)
+        return results_list
+    def _get_chunk_size(self, chunk_idx):
+        """Method to get the number of permutations in a chunk"""
+        return min(PermutationTest.chunk_permutations_n, self.opt.permutations - chunk_idx * PermutationTest.chunk_permutations_n)
+    def process_chunk(self, chunk_idx):
+        """Method to calculate the dataset-wide averages for every permutation of a chunk, relocating the sites sequence by sequence in batches of permutations"""
+        permutations_n = self._get_chunk_size(chunk_idx)
+        rng = np.random.default_rng(self.seeds[chunk_idx])
+        group_seq_records = [[] for k in range(permutations_n)]
+        for GID in self.group_order:
+            for seq_records in group_seq_records:
+                seq_records.append([])
+            for SID in self.input_data.group_map[GID]:
+                seq_length = self.input_data.seq_len[SID]
+                sites1 = self.input_data.sites[1][GID][SID]
+                begins, ends = PermutationTest._get_bounds(self.input_data.sites[2][GID][SID])
+                begins2 = self.draw_begins(rng, seq_length, begins, ends, permutations_n) if len(begins) else np.zeros((permutations_n, 0), dtype = 'i8')
+                ends2 = begins2 + (ends - begins)[None, :]
+                batch_size = max(1, PermutationTest.batch_elements_n // (seq_length + 1 + 3 * len(begins) + len(sites1)))
+                for k in range(0, permutations_n, batch_size):
+                    for seq_records, seq_counts in zip(group_seq_records[k: k + batch_size], self.count_sequence(seq_length, sites1, begins2[k: k + batch_size], ends2[k: k + batch_size])):
+                        seq_records[-1].append((seq_counts, seq_length))
+        attr_names = [x.var_name for x in PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross).name_map]
+        averages = []
+        for seq_records in group_seq_records:
+            accumulator = DatasetAccumulator(self.opt)
+            for group_records in seq_records:
+                accumulator.add_group(*self.calculator.aggregate_group(group_records))
+            accumulator.finalize()
+            averages.append(accumulator.get_bottom_line_values(attr_names)[0])
+        return averages
+    def _run_chunks(self, chunks_n):
+        """Method to process all the chunks of permutations over the pool of worker processes, in the chunk order"""
+        PermutationTest.current = self
+        processes = min(self.opt.processes, chunks_n)
+        context = None
+        if (processes > 1) and (not multiprocessing.current_process().daemon):
+            try:
+                context = multiprocessing.get_context('fork')
+            except ValueError:
+                if self.opt.warnings:
+                    print('Warning: worker processes are not supported on this platform. The permutations are processed sequentially')
+        if context is not None:
+            with context.Pool(processes) as pool:
+                return list(pool.imap(_process_permutation_chunk, range(chunks_n)))
+        return [self.process_chunk(chunk_idx) for chunk_idx in range(chunks_n)]
+    def write(self, ofile, group_order, measures, observed):
+        """Method to write the observed dataset-wide averages together with the mean and the standard deviation of their null distribution, the z-scores and the empirical p-values for both tails"""
+        self.group_order = group_order
+        chunks_n = -(-self.opt.permutations // PermutationTest.chunk_permutations_n)
+        self.seeds = np.random.SeedSequence(self.opt.permutation_seed).spawn(chunks_n)
+        averages = np.array([x for chunk_averages in self._run_chunks(chunks_n) for x in chunk_averages], dtype = 'f8')
+        ofile.write('\t'.join(('Measure', 'Observed', 'Mean', 'SD', 'Z', 'P_greater', 'P_less')) + os.linesep)
+        for measure, value, values in zip(measures, observed, averages.T):
+            values = values[~np.isnan(values)]
+            if len(values) and (not math.isnan(value)):
+                mean = values.mean()
+                sd = values.std(ddof = 1) if len(values) > 1 else float('nan')
+                z_score = (value - mean) / sd if sd > 1e-12 * max(1.0, abs(mean)) else float('nan')
+                p_greater = (1 + np.sum(values >= value)) / (1 + len(values))
+                p_less = (1 + np.sum(values <= value)) / (1 + len(values))
+            else:
+                mean = sd = z_score = p_greater = p_less = float('nan')
+            row = '{}\t{}'.format(measure.displayed_name, '{:.4f}'.format(value) if type(value) != int else str(value))
+            row += '\t{:.4f}\t{:.4f}\t{:.4f}\t{:.4g}\t{:.4g}'.format(mean, sd, z_score, p_greater, p_less)
+            ofile.write(row + os.linesep)
+
+class EngineComparator:
+    """Class to compare the basic and performance measures of every sequence calculated by the reference and the indexed engines, stopping at the first divergence"""
+    def __init__(self, opt):
+        self.opt = opt
+        self.seq_n = 0
+    @staticmethod
+    def _are_equal(value, value_):
+        """Method to check if two values are exactly the same, NaN being equal to NaN"""
+        if (value is None) or (value_ is None):
+            return (value is None) and (value_ is None)
+        return (value == value_) or (math.isnan(value) and math.isnan(value_))
+    def _get_basic_divergence(self, results, results_):
+        """Method to get the name and the values of the first diverging basic measure, if any"""
+        for attr in results._attr_list:
+            content = getattr(results, attr)
+            content_ = getattr(results_, attr)
+            if not isinstance(content, list):
+                if not self._are_equal(content, content_):
+                    return "'{}'".format(attr), content, content_
+                continue
+            for i in (1, 2):
+                if not self._are_equal(content[i], content_[i]):
+                    return "'{}' of the annotation {}".format(attr, i), content[i], content_[i]
+        return None
+    def _get_diverging_measures(self, results, results_):
+        """Method to get the names of the performance measures diverging due to the basic measures"""
+        measures = [PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross) for x in range(2)]
+        for counts, performance_measures in zip((results, results_), measures):
+            PerformanceCalculator(copy.deepcopy(counts), performance_measures).calculate_performance_measures()
+        return [x.displayed_name for x in measures[0].name_map if not self._are_equal(measures[0].get_value(x.var_name), measures[1].get_value(x.var_name))]
+    def add_sequence(self, current_seq, results, results_):
+        """Method to compare the basic measures of a sequence calculated by the reference and the indexed engines"""
+        self.seq_n += 1
+        divergence = self._get_basic_divergence(results, results_)
+        if divergence is None:
+            return
+        location = "the sequence '{}'".format(current_seq.SID) + (" of the group '{}'".format(current_seq.GID) if self.opt.grouped else '')
+        measures = self._get_diverging_measures(results, results_)
+        message = 'The engines diverge in {} (no. {} in the order of processing): the basic measure {} is {} with the reference engine and {} with the indexed one; the diverging performance measures: {}'
+        error(message.format(location, self.seq_n, *divergence, ', '.join(measures) if measures else 'none'))
+    def report(self):
+        """Method to print the outcome of the comparison"""
+        if not self.opt.quiet:
+            print('The reference and the indexed engines agree on all the {} sequences'.format(self.seq_n))
+
 class CalculationCoordinator():
     """Class to coordinate the process of performance measures calculation in accordance with the given averaging approach"""
-    def __init__(self, global_state, opt, input_data, file_handlers):
+    def __init__(self, global_state, opt, input_data, file_handlers, benchmark_indices = None):
         self.global_state = global_state
         self.opt = opt
         self.input_data = input_data
         self.file_handlers = file_handlers
+        self.benchmark_indices = benchmark_indices
+        if not opt.output_file_sweep:
+            self.threshold_sweep = None
+        else:
+            self.threshold_sweep = EnrichmentSweep(opt) if opt.enrichment_sweep else OverlapSweep(opt)
+        self.sequence_windows = None
+        self.match_distances = MatchDistanceDistribution(opt) if getattr(opt, 'output_file_distances', '') else None
+        self.track_indices = {}
+        self.engine_comparator = EngineComparator(opt) if opt.engine == 'differential' else None
+    def _create_sequence_calculator(self, current_seq, benchmark_index = None, use_track_index = False, engine = None):
+        """Method to create the basic measures calculator for a sequence in accordance with the operating mode and the engine"""
+        args = (self.global_state, self.opt, current_seq)
+        if (engine if engine else self.opt.engine) == 'indexed':
+            if use_track_index:
+                track_index, track_idx = self.get_track_index(current_seq)
+                if self.opt.enrichment_count == 0:
+                    return IndexedBooleanSequenceCalculator(*args, track_index.annotation_indices[track_idx], track_index.symbol_classes[track_idx])
+                return IndexedEnrichmentSequenceCalculator(*args, track_index.annotation_indices[track_idx])
+            args += ([None, benchmark_index, None], )
+            return IndexedBooleanSequenceCalculator(*args) if self.opt.enrichment_count == 0 else IndexedEnrichmentSequenceCalculator(*args)
+        args += (benchmark_index, )
+        return BasicBooleanSequenceCalculator(*args) if self.opt.enrichment_count == 0 else BasicEnrichmentSequenceCalculator(*args)
+    def calculate_sequence_counts(self, current_seq):
+        """Method to calculate basic measures for a sequence without writing any output"""
+        basic_sequence_calculator = self._create_sequence_calculator(current_seq)
+        basic_sequence_calculator.calculate_residue_wise(None)
+        if self.opt.enrichment_count == 0:
+            basic_sequence_calculator.calculate_site_wise(None, None)
+        return basic_sequence_calculator.get_results()
     def _process_sequence(self, current_seq):
         """Method to calculate basic measures for annotatopns of sites in a particular sequence in a particular group"""
-        args = (self.global_state, self.opt, current_seq)
-        if self.file_handlers.detailed is not None:
-            ending = '' if current_seq.length == 1 else 's'
-            seq_description = 'sequence "{}"'.format(current_seq.SID) if current_seq.SID else 'unnamed sequence'
-            self.file_handlers.detailed.write('{}Information on the {} (length {} symbol{}):'.format(self.global_state.indent_seq, seq_description, current_seq.length, ending) + os.linesep)
-        basic_sequence_calculator = BasicBooleanSequenceCalculator(*args) if self.opt.enrichment_count == 0 else BasicEnrichmentSequenceCalculator(*args)
-        basic_sequence_calculator.calculate_residue_wise(self.file_handlers.detailed)
+        profiler = self.global_state.profiler
+        if self.global_state.progress is not None:
+            self.global_state.progress.add_sequence(current_seq)
+        if profiler is not None:
+            profiler.add_sequence(current_seq)
+            profiler.start('classification')
+        detailed_file_h = self.file_handlers.detailed
+        if detailed_file_h is not None:
+            detailed_file_h.SID = current_seq.SID
+            if detailed_file_h.sequence:
+                detailed_file_h.add('sequence', current_seq.length)
+            else:
+                detailed_file_h = None
+        basic_sequence_calculator = self._create_sequence_calculator(current_seq, self.get_benchmark_index(current_seq), self.opt.detect_strand)
+        basic_sequence_calculator.calculate_residue_wise(detailed_file_h)
         if self.opt.enrichment_count == 0:
-            basic_sequence_calculator.calculate_site_wise(self.file_handlers.detailed, self.file_handlers.site)
+            if profiler is not None:
+                profiler.switch('site_matching')
+            basic_sequence_calculator.calculate_site_wise(detailed_file_h, self.file_handlers.site)
+        if profiler is not None:
+            profiler.switch('sequence_statistics')
+        if self.threshold_sweep is not None:
+            self.threshold_sweep.add_sequence(current_seq.GID, basic_sequence_calculator, current_seq.length)
+        if self.sequence_windows is not None:
+            self.sequence_windows.add_sequence(current_seq, basic_sequence_calculator)
+        if self.match_distances is not None:
+            self.match_distances.add_sequence(basic_sequence_calculator)
+        if profiler is not None:
+            profiler.switch('annotation_output')
         basic_sequence_calculator.write_to_files(self.file_handlers)
+        if self.file_handlers.site is not None:
+            self.file_handlers.site.write_sequence(current_seq)
+        if self.engine_comparator is not None:
+            if profiler is not None:
+                profiler.switch('engine_comparison')
+            indexed_sequence_calculator = self._create_sequence_calculator(current_seq, self.get_benchmark_index(current_seq), self.opt.detect_strand, 'indexed')
+            indexed_sequence_calculator.calculate_residue_wise(None)
+            if self.opt.enrichment_count == 0:
+                indexed_sequence_calculator.calculate_site_wise(None, None)
+            self.engine_comparator.add_sequence(current_seq, basic_sequence_calculator.get_results(), indexed_sequence_calculator.get_results())
+        if profiler is not None:
+            profiler.stop()
         return basic_sequence_calculator.get_results()
-    def process_group(self, GID):
-        """Method to calculate all relevant performance measures for a giben sequence group"""
-        if self.opt.averaging == 'sequence':
-            group_performance_measures = None
-        else:
-            group_counts = None
-        group_counts_ = None
-        seq_length_sum = 0
-        if self.opt.grouped and (self.file_handlers.detailed is not None):
-            group_len = len(self.input_data.group_map[GID])
-            self.file_handlers.detailed.write('Information on the group "{}" (contains {} sequence{}):'.format(GID, group_len, ('s' if group_len > 1 else '')) + os.linesep)
+    def get_track_index(self, current_seq):
+        """Method to get the index of all the strands or reading frames of the sequence a track belongs to, together with the number of the track, keeping the index until all its tracks are processed"""
+        track_suffixes = ('+1', '+2', '+3', '-1', '-2', '-3') if self.opt.detect_frame else ('+', '-')
+        SID_base = current_seq.SID[: -len(track_suffixes[0])]
+        track_SIDs = [SID_base + x for x in track_suffixes]
+        if SID_base not in self.track_indices:
+            track_sites = [[None] + [self.input_data.sites[i].get(SID, {}).get(SID, []) for i in (1, 2)] for SID in track_SIDs]
+            self.track_indices[SID_base] = (TrackIndex(track_sites, current_seq.length, self.opt.circular), {x for x in track_SIDs if x in self.input_data.group_map})
+        track_index, pending_SIDs = self.track_indices[SID_base]
+        pending_SIDs.discard(current_seq.SID)
+        if not pending_SIDs:
+            del self.track_indices[SID_base]
+        return track_index, track_SIDs.index(current_seq.SID)
+    def get_benchmark_index(self, current_seq):
+        """Method to get the index of the first annotation in a sequence shared by several runs over the same first annotation"""
+        if self.benchmark_indices is None:
+            return None
+        key = (current_seq.GID, current_seq.SID)
+        if key not in self.benchmark_indices:
+            self.benchmark_indices[key] = AnnotationIndex(current_seq.sites[1], current_seq.length, self.opt.circular)
+        return self.benchmark_indices[key]
+    def calculate_group_counts(self, GID):
+        """Method to calculate basic measures for every sequence of a given group"""
+        seq_records = []
+        detailed_file_h = self.file_handlers.detailed
+        if detailed_file_h is not None:
+            detailed_file_h.GID = GID
+            detailed_file_h.SID = ''
+            if self.opt.grouped:
+                detailed_file_h.add('group', len(self.input_data.group_map[GID]))
+        sites_n = [None, 0, 0]
         for SID in self.input_data.group_map[GID]:
             seq_length = self.input_data.seq_len[SID]
             sites = [None] + [self.input_data.sites[i][GID][SID] for i in (1, 2)]
             current_seq = CurrentSequence(GID, SID, seq_length, sites)
-            seq_counts = self._process_sequence(current_seq)
-            if self.opt.averaging == 'sequence':
-                seq_performance_measures = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross)
-                PerformanceCalculator(seq_counts, seq_performance_measures).calculate_performance_measures()
-                seq_performance_measures.set_value('seq_n', 1)
-                if group_performance_measures is None:
-                    group_performance_measures = seq_performance_measures
-                else:
-                    group_performance_measures += seq_performance_measures
+            seq_records.append((self._process_sequence(current_seq), seq_length))
+            if detailed_file_h is not None:
+                sites_n[1] += len(sites[1])
+                sites_n[2] += len(sites[2])
+        if (detailed_file_h is not None) and (not detailed_file_h.sequence):
+            detailed_file_h.SID = ''
+            matched_n = [None] + [None if self.opt.enrichment_count else sum(x[0].site_m[i] for x in seq_records) for i in (1, 2)]
+            detailed_file_h.add('group_summary', len(seq_records), sum(x[1] for x in seq_records), sites_n[1], matched_n[1], sites_n[2], matched_n[2])
+        return seq_records
+    def calculate_sequence_measures(self, seq_counts, opt = None):
+        """Method to calculate all relevant performance measures for a sequence to be averaged sequence-wise"""
+        if opt is None:
+            opt = self.opt
+        seq_performance_measures = PerformanceMeasures(opt.enrichment_count, opt.benchmark, opt.gross)
+        PerformanceCalculator(seq_counts, seq_performance_measures).calculate_performance_measures()
+        seq_performance_measures.set_value('seq_n', 1)
+        return seq_performance_measures
+    def aggregate_group(self, seq_records, opt = None):
+        """Method to calculate all relevant performance measures for a group from the basic measures of its sequences, leaving the latter intact"""
+        if opt is None:
+            opt = self.opt
+        group_performance_measures = PerformanceMeasures(opt.enrichment_count, opt.benchmark, opt.gross) if opt.averaging == 'sequence' else None
+        group_counts = None
+        seq_length_sum = 0
+        for seq_counts, seq_length in seq_records:
+            if opt.averaging == 'sequence':
+                group_performance_measures += self.calculate_sequence_measures(seq_counts, opt)
             else:
-                if self.opt.len_adjust:
-                    seq_counts /= seq_length
+                if opt.len_adjust:
+                    seq_counts = seq_counts / seq_length
                 if group_counts is None:
-                    group_counts = seq_counts
+                    group_counts = copy.deepcopy(seq_counts)
                 else:
                     group_counts += seq_counts
             seq_length_sum += seq_length
-        group_seq_n = len(self.input_data.group_map[GID])
-        if self.opt.averaging == 'sequence':
+        return self.finalize_group(group_performance_measures, group_counts, len(seq_records), seq_length_sum, opt)
+    def finalize_group(self, group_performance_measures, group_counts, group_seq_n, seq_length_sum, opt = None):
+        """Method to calculate all relevant performance measures for a group from the summed performance measures or basic measures of its sequences"""
+        if opt is None:
+            opt = self.opt
+        group_counts_ = None
+        if opt.averaging == 'sequence':
             for measure in group_performance_measures.name_map:
                 if measure.basic:
                     group_performance_measures.set_count(measure.var_name, seq_length_sum)
-            group_performance_measures.average(group_seq_n if self.opt.na_zeros else 0)
+            group_performance_measures.average(group_seq_n if opt.na_zeros else 0)
         else:
             group_counts.seq_n = group_seq_n
-            if self.opt.averaging == 'dataset':
+            if opt.averaging == 'dataset':
                 group_counts_ = copy.deepcopy(group_counts)
-            group_counts /= (group_seq_n if self.opt.len_adjust else seq_length_sum)
-            group_performance_measures = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross)
+            group_counts /= (group_seq_n if opt.len_adjust else seq_length_sum)
+            group_performance_measures = PerformanceMeasures(opt.enrichment_count, opt.benchmark, opt.gross)
             PerformanceCalculator(group_counts, group_performance_measures).calculate_performance_measures()
         return group_performance_measures, group_counts_, seq_length_sum
+    def process_group(self, GID):
+        """Method to calculate all relevant performance measures for a giben sequence group"""
+        return self.aggregate_group(self.calculate_group_counts(GID))
+
+class DatasetAccumulator:
+    """Class to accumulate the group-wise results into the dataset-wide performance measures in accordance with the given averaging approach"""
+    def __init__(self, opt):
+        self.opt = opt
+        self.performance_measures = PerformanceMeasures(opt.enrichment_count, opt.benchmark, opt.gross)
+        self.counts = None
+        self.seq_length_sum = 0
+        self.groups_n = 0
+    def add_group(self, group_performance_measures, group_counts, seq_length_sum):
+        """Method to add the results for a group"""
+        if not self.opt.grouped:
+            self.performance_measures = group_performance_measures
+            return
+        if self.opt.averaging == 'dataset':
+            if self.counts is None:
+                self.counts = group_counts
+            else:
+                self.counts += group_counts
+            self.seq_length_sum += seq_length_sum
+        else:
+            self.performance_measures += group_performance_measures
+        self.groups_n += 1
+    def finalize(self):
+        """Method to calculate the dataset-wide performance measures after all the groups are added"""
+        if self.opt.grouped and (self.opt.averaging == 'dataset'):
+            self.counts /= self.seq_length_sum
+            PerformanceCalculator(self.counts, self.performance_measures).calculate_performance_measures()
+        return self.performance_measures
+    def get_bottom_line_values(self, attr_names):
+        """Method to calculate averages and sums of relevant performance measures"""
+        averages = []
+        sums = []
+        results = self.performance_measures
+        groups_n = self.groups_n
+        for attr_name in attr_names:
+            value = results.get_value(attr_name)
+            sums.append(value if type(value) == int else None)
+            if not self.opt.na_zeros:
+                if not math.isnan(value):
+                    if (self.opt.averaging == 'dataset') and (type(value) == int):
+                        value /= groups_n
+                    elif groups_n:
+                        value /= results.get_count(attr_name)
+            else:
+                if math.isnan(value):
+                    value = 0.0
+                else:
+                    value = value / groups_n if (groups_n and self.opt.averaging != 'dataset') else value
+            averages.append(value)
+        return averages, sums
+
+class StructuredOutput:
+    """Class to write the group-wise performance measures and the dataset-wide averages and sums in full precision to JSON Lines, NumPy and Parquet files"""
+    formats = ('jsonl', 'npz', 'parquet')
+    format_names = {'jsonl': 'JSON Lines', 'npz': 'NumPy', 'parquet': 'Parquet'}
+    def __init__(self, opt, measures):
+        self.opt = opt
+        self.measures = measures
+        self.GIDs = []
+        self.rows = []
+    @staticmethod
+    def is_requested(opt):
+        """Method to check whether any structured output file is requested"""
+        return any(getattr(opt, 'output_file_' + x, '') for x in StructuredOutput.formats)
+    def add_group(self, GID, group_performance_measures):
+        """Method to add the performance measures for a group"""
+        self.GIDs.append(GID)
+        self.rows.append([group_performance_measures.get_value(x.var_name) for x in self.measures])
+    def _get_metadata(self):
+        """Method to describe the measures and the averaging approach"""
+        measures = [{'name': x.displayed_name, 'var_name': x.var_name, 'description': x.description, 'type': x.type_, 'micro_averaged': (self.opt.averaging == 'dataset') and (not x.force_avg)}
+                    for x in self.measures]
+        return {'averaging': self.opt.averaging, 'len_adjust': self.opt.len_adjust, 'na_zeros': self.opt.na_zeros, 'grouped': bool(self.opt.grouped), 'measures': measures}
+    def _get_record(self, row):
+        """Method to form a JSON record of measure values, with NaN replaced by null"""
+        return {x.displayed_name: (None if (y is None) or (y != y) else y) for x, y in zip(self.measures, row)}
+    def _write_jsonl(self, averages, sums):
+        """Method to write the JSON Lines file"""
+        records = [dict(type = 'metadata', **self._get_metadata())]
+        records.extend({'type': 'group', 'group': x, 'values': self._get_record(y)} for x, y in zip(self.GIDs, self.rows))
+        records.append({'type': 'average', 'values': self._get_record(averages)})
+        if self.opt.calculate_sums:
+            records.append({'type': 'sum', 'values': self._get_record(sums)})
+        with open(self.opt.output_file_jsonl, 'w') as ofile:
+            ofile.write(os.linesep.join(map(json.dumps, records)) + os.linesep)
+    def _write_npz(self, values, averages, sums):
+        """Method to write the NumPy archive"""
+        np.savez(self.opt.output_file_npz, groups = np.array(self.GIDs, dtype = str), values = values, averages = averages, sums = sums,
+                 names = np.array([x.displayed_name for x in self.measures], dtype = str), var_names = np.array([x.var_name for x in self.measures], dtype = str),
+                 descriptions = np.array([x.description for x in self.measures], dtype = str), types = np.array([x.type_ for x in self.measures], dtype = str),
+                 metadata = np.array(json.dumps(self._get_metadata())))
+    def _write_parquet(self, values, averages, sums):
+        """Method to write the Parquet file, with a row type column to tell the groups from the averages and sums"""
+        row_types = ['group'] * len(self.GIDs) + ['average'] + (['sum'] if self.opt.calculate_sums else [])
+        table = np.vstack([values, averages[np.newaxis, :]] + ([sums[np.newaxis, :]] if self.opt.calculate_sums else []))
+        columns = {'Row type': pyarrow.array(row_types), 'Group': pyarrow.array(self.GIDs + [None] * (len(row_types) - len(self.GIDs)), type = pyarrow.string())}
+        for measure_idx, measure in enumerate(self.measures):
+            columns[measure.displayed_name] = pyarrow.array(table[:, measure_idx], from_pandas = True)
+        schema_metadata = {'slalom': json.dumps(self._get_metadata())}
+        pyarrow.parquet.write_table(pyarrow.table(columns).replace_schema_metadata(schema_metadata), self.opt.output_file_parquet)
+    def write(self, accumulator):
+        """Method to write all the requested structured output files"""
+        averages, sums = accumulator.get_bottom_line_values([x.var_name for x in self.measures])
+        values = np.array(self.rows, dtype = float).reshape(len(self.rows), len(self.measures))
+        averages_ = np.array(averages, dtype = float)
+        sums_ = np.array([np.nan if x is None else x for x in sums], dtype = float)
+        if self.opt.output_file_jsonl:
+            self._write_jsonl(averages, sums)
+        if self.opt.output_file_npz:
+            self._write_npz(values, averages_, sums_)
+        if self.opt.output_file_parquet:
+            self._write_parquet(values, averages_, sums_)
+        if not self.opt.quiet:
+            for format_ in StructuredOutput.formats:
+                filepath = getattr(self.opt, 'output_file_' + format_)
+                if filepath:
+                    print("The {} file '{}' with performance measures has been written".format(StructuredOutput.format_names[format_], filepath))
+
+class DetailedFileWriter:
+    """Class to write the information on the groups, sequences and sites to the detailed output file down to a given level of detail, either as text or as TSV or JSON Lines events, formatting only the events actually written"""
+    levels = ('group', 'sequence', 'site')
+    events = {'group': ('group', ('sequences', )),
+              'group_summary': ('group', ('sequences', 'length', 'sites1', 'matched1', 'sites2', 'matched2')),
+              'sequence': ('sequence', ('length', )),
+              'symbols': ('sequence', ('category', 'symbols')),
+              'gross_symbols': ('sequence', ('annotation', 'symbols')),
+              'enriched': ('sequence', ('category', 'symbols')),
+              'no_sites': ('sequence', ('annotation', )),
+              'sites': ('sequence', ('annotation', 'sites', 'length', 'matched', 'unmatched')),
+              'site_overlap': ('site', ('annotation', 'begin', 'end', 'name', 'matched', 'partner_begin', 'partner_end', 'partner_name', 'overlapped', 'perc', 'partner_perc')),
+              'site_nearest': ('site', ('annotation', 'begin', 'end', 'name', 'matched', 'partner_begin', 'partner_end', 'partner_name', 'distance')),
+              'site_patched': ('site', ('annotation', 'begin', 'end', 'matched', 'matched_symbols', 'perc'))}
+    def __init__(self, filepath, opt, global_state, offset = None):
+        self.opt = opt
+        self.global_state = global_state
+        self.file_handler = open_output_file(filepath, offset, SiteFileWriter.buffer_size)
+        level_idx = DetailedFileWriter.levels.index(opt.detailed_level)
+        self.sequence = level_idx >= 1
+        self.site = level_idx >= 2
+        self.GID = ''
+        self.SID = ''
+        if opt.detailed_format == 'text':
+            self.add = self._add_text
+        elif opt.detailed_format == 'tsv':
+            self.add = self._add_tsv
+            if offset is None:
+                if not opt.clean:
+                    for event, (level, fields) in DetailedFileWriter.events.items():
+                        if (DetailedFileWriter.levels.index(level) <= level_idx) and ((event != 'group_summary') or (not self.sequence)):
+                            self.file_handler.write('# {}: {}'.format(event, ', '.join(fields)) + os.linesep)
+                self.file_handler.write('Event\tGroup\tSequence\tFields' + os.linesep)
+        else:
+            self.add = self._add_jsonl
+    def _add_text(self, event, *fields):
+        """Method to write an event as text"""
+        self.file_handler.write(getattr(self, '_format_' + event)(*fields) + os.linesep)
+    def _get_structured_fields(self, event, fields):
+        """Method to replace the annotation numbers with their short names in the fields of an event"""
+        if DetailedFileWriter.events[event][1][0] == 'annotation':
+            return (self.global_state.anno_short_name[fields[0]], ) + fields[1: ]
+        return fields
+    def _add_tsv(self, event, *fields):
+        """Method to write an event as a TSV row"""
+        fields = self._get_structured_fields(event, fields)
+        self.file_handler.write('\t'.join([event, self.GID, self.SID] + ['' if x is None else str(x) for x in fields]) + os.linesep)
+    def _add_jsonl(self, event, *fields):
+        """Method to write an event as a JSON record"""
+        fields = self._get_structured_fields(event, fields)
+        record = {'event': event, 'group': self.GID, 'sequence': self.SID}
+        record.update((x, None if y == '-' else (int(y) if isinstance(y, np.integer) else y)) for x, y in zip(DetailedFileWriter.events[event][1], fields))
+        self.file_handler.write(json.dumps(record) + os.linesep)
+    def _format_group(self, seqs_n):
+        """Method to form the text on the beginning of a group"""
+        return 'Information on the group "{}" (contains {} sequence{}):'.format(self.GID, seqs_n, ('s' if seqs_n > 1 else ''))
+    def _format_group_summary(self, seqs_n, length, sites_n1, matched_n1, sites_n2, matched_n2):
+        """Method to form the text on the sequences and sites of a group"""
+        message = '{}Summary: {} sequence{} of total length {} symbol{}'.format(self.global_state.indent_seq, seqs_n, '' if seqs_n == 1 else 's', length, '' if length == 1 else 's')
+        for i, sites_n, matched_n in ((1, sites_n1, matched_n1), (2, sites_n2, matched_n2)):
+            message += '{} {} site{} in the {}'.format(',' if i == 1 else ' and', sites_n, '' if sites_n == 1 else 's', self.global_state.anno_name[i])
+            if matched_n is not None:
+                message += ' ({} matched)'.format(matched_n)
+        return message
+    def _format_sequence(self, length):
+        """Method to form the text on the beginning of a sequence"""
+        seq_description = 'sequence "{}"'.format(self.SID) if self.SID else 'unnamed sequence'
+        return '{}Information on the {} (length {} symbol{}):'.format(self.global_state.indent_seq, seq_description, length, '' if length == 1 else 's')
+    def _format_symbols(self, type_, symbols_n):
+        """Method to form the text on the symbol counts in a specific category"""
+        description = {'pp': 'present in both annotations', 'pa': 'present exclusively in the ' + self.global_state.anno_name[1],
+                       'ap': 'present exclusively in the ' + self.global_state.anno_name[2], 'aa': 'absent in both annotations'}[type_]
+        ending = '{} is' if symbols_n == 1 else 's{} are'
+        ending = ending.format(' gross' if (self.opt.gross and (type_ != 'aa')) else '')
+        return '{}{} symbol{} {}{}'.format(self.global_state.indent_site, symbols_n, ending, description, getattr(self.global_state, type_ + '_name'))
+    def _format_gross_symbols(self, i, symbols_n):
+        """Method to form the text on the symbols gross of an annotation present in the other one"""
+        ending = ('' if symbols_n == 1 else 's') + ' gross'
+        return '{}{} symbol{} present in the {} are also present in the {}'.format(self.global_state.indent_site, symbols_n, ending, self.global_state.anno_name[i], self.global_state.anno_name[3 - i])
+    def _format_enriched(self, type_, symbols_n):
+        """Method to form the text on the enriched symbol counts in a specific category"""
+        description = {'e1': 'the ' + self.global_state.anno_name[1], 'e2': 'the ' + self.global_state.anno_name[2], 'ee': 'both annotations', 'ne': 'neither annotations'}[type_]
+        return '{}{} symbol{} enriched in {}'.format(self.global_state.indent_site, symbols_n, ' is' if symbols_n == 1 else 's are', description)
+    def _format_no_sites(self, i):
+        """Method to form the text on an annotation without sites"""
+        return '{}There are no sites in the {}'.format(self.global_state.indent_site, self.global_state.anno_name[i])
+    def _format_sites(self, i, sites_n, symbols, matched_n, unmatched_n):
+        """Method to form the text on the number, total length and matches of the sites of an annotation"""
+        message = '{}There {} {} site{} in the {} with total length {}{} symbol{}{}'.format(self.global_state.indent_site, 'is' if sites_n == 1 else 'are', sites_n, '' if sites_n == 1 else 's',
+                                                                                       self.global_state.anno_name[i], symbols, '' if self.opt.gross else ' unique', '' if symbols == 1 else 's', ' gross' if self.opt.gross else '')
+        message += os.linesep + '{}{} {} site{} matched in the {}'.format(self.global_state.indent_site, matched_n, self.global_state.anno_name[i], ' is' if matched_n == 1 else 's are', self.global_state.anno_name[3 - i])
+        message += os.linesep + '{}{} {} site{} no match in the {}'.format(self.global_state.indent_site, unmatched_n, self.global_state.anno_name[i], ' has' if unmatched_n == 1 else 's have', self.global_state.anno_name[3 - i])
+        return message
+    def _format_site(self, i, begin, end, name):
+        """Method to form the beginning of the text on a site"""
+        return '{}Site {}-{}{} of the {}: '.format(self.global_state.indent_site, begin, end, ' ("{}")'.format(name) if name is not None else '', self.global_state.anno_name[i])
+    def _format_site_overlap(self, i, begin, end, name, found_match, begin_, end_, name_, overlapped_symbols, length_perc_1, length_perc_2):
+        """Method to form the text on the partner site overlapping with a site"""
+        if not found_match:
+            return self._format_site(i, begin, end, name) + 'no sufficient overlap found'
+        message = 'overlaps with site {}-{}{} of the {} by {} symbol{} ({}% and {}% of the site lengths respectively)'
+        return self._format_site(i, begin, end, name) + message.format(begin_, end_, ' ("{}")'.format(name_) if name_ is not None else '', self.global_state.anno_name[3 - i], overlapped_symbols,
+                                                                       '' if overlapped_symbols == 1 else 's', length_perc_1, length_perc_2)
+    def _format_site_nearest(self, i, begin, end, name, found_match, begin_, end_, name_, distance):
+        """Method to form the text on the nearest partner site of a site within the tolerance"""
+        if not found_match:
+            return self._format_site(i, begin, end, name) + 'no site within the tolerance found'
+        message = 'the nearest site is {}-{}{} of the {} at the distance of {} symbol{}'
+        return self._format_site(i, begin, end, name) + message.format(begin_, end_, ' ("{}")'.format(name_) if name_ is not None else '', self.global_state.anno_name[3 - i], distance, '' if distance == 1 else 's')
+    def _format_site_patched(self, i, begin, end, found_match, matched_symbols, length_perc):
+        """Method to form the text on the symbols of a site overlapped by the sites of the other annotation"""
+        if not found_match:
+            return self._format_site(i, begin, end, None) + 'no sufficient overlap found'
+        message = 'overlaps by total {} symbol{} ({}% of the site length) with sites from the {}'
+        return self._format_site(i, begin, end, None) + message.format(matched_symbols, '' if matched_symbols == 1 else 's', length_perc, self.global_state.anno_name[3 - i])
+    def tell(self):
+        """Method to flush the file and to get the current offset"""
+        self.file_handler.flush()
+        return self.file_handler.tell()
+    def close(self):
+        """Method to close the file"""
+        self.file_handler.close()
+
+class SiteFileWriter:
+    """Class to collect the site-wise statistics of a sequence and to write them to the site-wise output file in bulk, through a large buffer"""
+    buffer_size = 1 << 20
+    def __init__(self, filepath, opt, offset = None):
+        self.opt = opt
+        self.file_handler = open_output_file(filepath, offset, SiteFileWriter.buffer_size)
+        self.rows = []
+        self.row_formats = {}
+    def write(self, text):
+        """Method to write a text to the file directly"""
+        self.file_handler.write(text)
+    def add(self, row):
+        """Method to add the statistics of a site, without the GID and SID"""
+        self.rows.append(row)
+    def write_sequence(self, current_seq):
+        """Method to format all the collected rows of a sequence at once, prefixed with its GID and SID, and to write them to the file"""
+        if not self.rows:
+            return
+        prefix = (current_seq.GID + '\t' if self.opt.group_map else '') + current_seq.SID + '\t'
+        row_format = self.row_formats.get(len(self.rows[0]))
+        if row_format is None:
+            row_format = self.row_formats.setdefault(len(self.rows[0]), '\t'.join(['{}'] * len(self.rows[0])))
+        self.file_handler.write(prefix + (os.linesep + prefix).join(itertools.starmap(row_format.format, self.rows)) + os.linesep)
+        self.rows = []
+    def tell(self):
+        """Method to flush the file and to get the current offset"""
+        self.file_handler.flush()
+        return self.file_handler.tell()
+    def close(self):
+        """Method to close the file"""
+        self.file_handler.close()
 
 class DataProcessor:
     """Class to calculate and save into corresponding files performance measures as well as output annotations for each group and the whole dataset"""
-    def __init__(self, opt, global_state, input_data):
+    def __init__(self, opt, global_state, input_data, benchmark_indices = None):
         self.opt = opt
         self.input_data = input_data
         self.file_handlers = FileHandlers()
         self.global_state = global_state
-        self.calculator = CalculationCoordinator(global_state, opt, input_data, self.file_handlers)
+        self.calculator = CalculationCoordinator(global_state, opt, input_data, self.file_handlers, benchmark_indices)
         self.dataset_performance_measures = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross)
+        self.extra_modes = [(self._get_mode_options(x), []) for x in getattr(opt, 'averaging_modes', [])]
+        self.group_seq_records = {}
+        self.site_name_breakdown = SiteNameBreakdown(opt, input_data) if getattr(opt, 'output_file_names', '') else None
+        self.bootstrap = BootstrapEstimator(opt, self.calculator) if getattr(opt, 'output_file_bootstrap', '') else None
+        self.permutation_test = PermutationTest(opt, input_data, self.calculator) if getattr(opt, 'output_file_permutations', '') else None
+        self.checkpoint = CheckpointManager(opt) if getattr(opt, 'checkpoint_file', '') else None
+    def _get_mode_options(self, averaging_mode):
+        """Method to form the options for an additional averaging mode, with its own output file"""
+        mode_opt = copy.copy(self.opt)
+        mode_opt.averaging, mode_opt.len_adjust, mode_opt.na_zeros = averaging_mode
+        mode_opt.averaging_modes = []
+        mode_opt.output_file_sweep = ''
+        suffix = '_'.join([mode_opt.averaging] + [x for x, y in zip(('A', 'z'), averaging_mode[1: ]) if y])
+        for dest in ('output_file', ) + tuple('output_file_' + x for x in StructuredOutput.formats):
+            if getattr(self.opt, dest):
+                root, extension = os.path.splitext(getattr(self.opt, dest))
+                setattr(mode_opt, dest, '{}_{}{}'.format(root, suffix, extension))
+        return mode_opt
     def _float_to_fixed_width_str(value, width):
         """Method to make the best attempt to represent a float as fixed-width string"""
         for i in range(width - 2, -1, -1):
@@ -1432,30 +3408,72 @@ class DataProcessor:
             if (len(str0) == width + 2) and '+0' in str0:
                 break
         return str0.replace('+', '').replace('E0', 'E')
-    def _open_output_files(self):
-        """Method to open required output annotation files"""
+    def _format_average(value):
+        """Method to represent a dataset-wide average as in the bottom lines of the main output file"""
+        return DataProcessor._positive_int_to_fixed_width_str(value, 7) if type(value)==int else DataProcessor._float_to_fixed_width_str(value, 6)
+    def _open_output_files(self, offsets = None):
+        """Method to open required output annotation files, continuing them from the given offsets if the run is resumed"""
         for type_ in FileHandlers.output_file_types:
             filepath = getattr(self.opt, 'output_file_' + type_)
             if not filepath:
                 continue
-            file_handler = open(filepath, 'w')
+            offset = offsets[type_] if offsets is not None else None
             if type_ == 'detailed':
-                pass
+                file_handler = DetailedFileWriter(filepath, self.opt, self.global_state, offset)
             elif type_ == 'site':
+                file_handler = SiteFileWriter(filepath, self.opt, offset)
                 header = ('Group\t' if self.opt.group_map else '') + 'Sequence\tAnnotation\tSite begin\tSite end\t'
                 if self.opt.site_names:
                     header += 'Site name\t'
-                if self.opt.overlap_apply == 'patched':
-                    header += 'Matched symbols\tMatched perc.\n'
+                if self.opt.overlap_tolerance is not None:
+                    header += 'Distance\tPartner begin\tPartner end'
+                elif self.opt.overlap_apply == 'patched':
+                    header += 'Matched symbols\tMatched perc.'
                 else:
                     header += 'Overlapped symbols\tOverlapped perc.\tPartner overlapped perc.\tPartner begin\tPartner end'
-                if self.opt.site_names:
+                if self.opt.site_names and (self.opt.overlap_apply != 'patched'):
                     header += '\tPartner name'
-                file_handler.write(header + os.linesep)
+                if offset is None:
+                    file_handler.write(header + os.linesep)
             else:
+                file_handler = open_output_file(filepath, offset)
                 header = ('Group\t' if self.opt.grouped else '') + 'Sequence\tbegin\tend\n'
-                file_handler.write(header)
+                if offset is None:
+                    file_handler.write(header)
             setattr(self.file_handlers, type_, file_handler)
+    def _get_output_offsets(self):
+        """Method to flush the output files written sequence by sequence and to get their current offsets"""
+        offsets = {}
+        for type_ in FileHandlers.output_file_types:
+            file_handler = getattr(self.file_handlers, type_)
+            if file_handler is not None:
+                if type_ not in ('detailed', 'site'):
+                    file_handler.flush()
+                offsets[type_] = file_handler.tell()
+        if self.calculator.sequence_windows is not None:
+            self.calculator.sequence_windows.ofile.flush()
+            offsets['windows'] = self.calculator.sequence_windows.ofile.tell()
+        return offsets
+    def _save_checkpoint(self):
+        """Method to save the checkpoint with the results of the completed groups, in all the averaging modes, and the offsets of the output files"""
+        profiler = self.global_state.profiler
+        if profiler is not None:
+            profiler.start('checkpointing')
+        self.checkpoint.save([[ShardMerger.encode_group(*x) for x in group_results] for mode_opt, group_results in self.extra_modes], self._get_output_offsets())
+        if profiler is not None:
+            profiler.stop()
+    def _restore_checkpoint(self):
+        """Method to restore the results of the completed groups of an interrupted run in the additional averaging modes and to get the offsets of its output files"""
+        if (self.checkpoint is None) or (not self.opt.resume):
+            return None
+        checkpoint = self.checkpoint.load()
+        if checkpoint is None:
+            return None
+        for (mode_opt, group_results), groups in zip(self.extra_modes, checkpoint['extra_modes']):
+            group_results.extend(ShardMerger.decode_group(x, mode_opt) for x in groups)
+        if not self.opt.quiet:
+            print('The run is resumed after {} completed groups'.format(len(checkpoint['groups'])))
+        return checkpoint['offsets']
     def _close_output_files(self):
         """Method to close ouptput annotation files"""
         for type_ in FileHandlers.output_file_types:
@@ -1478,12 +3496,17 @@ class DataProcessor:
             description += ' ' + output_type
             if not self.opt.quiet:
                 print("The {} file '{}' has been written".format(description, filepath))
+    def _generate_launch_info(self):
+        """Method to form the header lines with basic launch information"""
+        if self.opt.clean:
+            return ''
+        header = "# This file was generated at {} with SLALOM".format(str(datetime.datetime.now())[: -7]) + os.linesep
+        header += '# Command line options (unquoted and unescaped): ' + ' '.join(self.opt.command_line) + os.linesep
+        return header
     def _generate_header(self, grouped):
         """Method to form the header with basic launch information as well as relevant column names"""
-        header = ''
+        header = self._generate_launch_info()
         if not self.opt.clean:
-            header += "# This file was generated at {} with SLALOM".format(str(datetime.datetime.now())[: -7]) + os.linesep
-            header += '# Command line options (unquoted and unescaped): ' + ' '.join(sys.argv[1: ]) + os.linesep
             header += '# The following statistics have been calculated:' + os.linesep
         column_names = ((('Frame' if self.opt.genbank else 'Seq.') if self.opt.sequences_as_groups else 'Group') + '\t') if grouped else ''
         for measure in self.dataset_performance_measures.name_map:
@@ -1498,66 +3521,715 @@ class DataProcessor:
             header += message + os.linesep
         header += column_names + os.linesep
         return header
-    def _produce_bottom_lines_string(self, results, attr_names, groups_n):
-        """Method to calculate averages and sums of relevant performance measures and save them to the string"""
-        avg_string = 'Average\t' if groups_n else ''
+    def _produce_bottom_lines_string(self, accumulator, attr_names):
+        """Method to save the averages and sums of relevant performance measures to the string"""
+        averages, sums = accumulator.get_bottom_line_values(attr_names)
+        avg_string = 'Average\t' if accumulator.groups_n else ''
         if self.opt.calculate_sums:
             sum_string = 'Sum\t'
-        for attr_name in attr_names:
-            value = results.get_value(attr_name)
+        for value, sum_value in zip(averages, sums):
             if self.opt.calculate_sums:
-                sum_string += ((DataProcessor._positive_int_to_fixed_width_str(value, 7) if type(value) == int else '') + '\t')
-            if not self.opt.na_zeros:
-                if not math.isnan(value):
-                    if (self.opt.averaging == 'dataset') and (type(value) == int):
-                        value /= groups_n
-                    elif groups_n:
-                        value /= results.get_count(attr_name)
-            else:
-                if math.isnan(value):
-                    value = 0.0
-                else:
-                    value = value / groups_n if (groups_n and self.opt.averaging != 'dataset') else value
-            avg_string += (DataProcessor._positive_int_to_fixed_width_str(value, 7) if type(value)==int else DataProcessor._float_to_fixed_width_str(value, 6)) + '\t'
+                sum_string += ((DataProcessor._positive_int_to_fixed_width_str(sum_value, 7) if sum_value is not None else '') + '\t')
+            avg_string += DataProcessor._format_average(value) + '\t'
         return avg_string[: -1] + (os.linesep + sum_string[: -1] if self.opt.calculate_sums else '')
-    def process(self):
-        """Method to coordinate the input data processing and outputting"""
-        self._open_output_files()
+    def _produce_group_row_string(self, GID, group_performance_measures, attr_names):
+        """Method to save the performance measures for a group to the string"""
+        row = GID
+        for attr_name in attr_names:
+            value = group_performance_measures.get_value(attr_name)
+            value = '{:.4f}'.format(value) if type(value) != int else str(value)
+            row += '\t' + value
+        return row + os.linesep
+    def get_group_order(self):
+        """Method to get the GIDs in the order of processing"""
+        return sorted(self.input_data.group_map.keys()) if self.opt.sort_output else list(self.input_data.group_map.keys())
+    def _calculate_groups(self):
+        """Method to calculate the performance measures for every group (of the current shard) in the order of processing"""
+        group_order = self.get_group_order() if self.opt.grouped else ['']
+        profiler = self.global_state.profiler
+        progress = self.global_state.progress
+        completed_n = 0
+        if self.checkpoint is not None:
+            for group in list(self.checkpoint.groups):
+                yield ShardMerger.decode_group(group, self.opt)
+            completed_n = self.checkpoint.completed_n
+        pending = [(group_idx, GID) for group_idx, GID in enumerate(group_order) if (group_idx >= completed_n) and ((self.opt.shard is None) or (group_idx % self.opt.shard[1] == self.opt.shard[0] - 1))]
+        if progress is not None:
+            progress.start([x[1] for x in pending], self.input_data)
+        for group_idx, GID in pending:
+            if profiler is not None:
+                group_start = profiler.start_group()
+            seq_records = self.calculator.calculate_group_counts(GID)
+            if profiler is not None:
+                profiler.start('aggregation')
+            if self.input_data.group_levels:
+                self.group_seq_records[GID] = seq_records
+            if self.site_name_breakdown is not None:
+                self.site_name_breakdown.add_group(GID, self.calculator)
+            for mode_opt, group_results in self.extra_modes:
+                group_results.append((group_idx, GID) + self.calculator.aggregate_group(seq_records, mode_opt))
+            group_result = self.calculator.aggregate_group(seq_records)
+            if self.bootstrap is not None:
+                self.bootstrap.add_group(seq_records, group_result)
+            if profiler is not None:
+                profiler.stop()
+                profiler.add_group(GID, group_start)
+            if progress is not None:
+                progress.add_group()
+            if self.checkpoint is not None:
+                self.checkpoint.add_group(group_idx, GID, *group_result)
+                if self.checkpoint.is_due():
+                    self._save_checkpoint()
+            yield (group_idx, GID) + group_result
+        if progress is not None:
+            progress.finish()
+        if self.calculator.engine_comparator is not None:
+            self.calculator.engine_comparator.report()
+    def _write_partial_state(self, group_results):
+        """Method to save the group-wise results of the current shard to be merged with the other shards"""
+        options = ShardMerger.get_comparable_options(self.opt)
+        partial_state = {'version': ShardMerger.version, 'shard': list(self.opt.shard), 'fingerprint': ShardMerger.get_fingerprint(options), 'options': options,
+                         'groups': [ShardMerger.encode_group(*x) for x in group_results]}
+        with open(self.opt.output_file, 'w') as ofile:
+            json.dump(partial_state, ofile, separators = (',', ':'))
+        if not self.opt.quiet:
+            print("The partial result file '{}' for the shard {}/{} has been written".format(self.opt.output_file, *self.opt.shard))
+    def write_results(self, group_results):
+        """Method to write the performance measures for the groups, given in the order of processing, and the dataset-wide averages to the output file"""
+        accumulator = DatasetAccumulator(self.opt)
+        profiler = self.global_state.profiler
+        if profiler is not None:
+            profiler.start('output_writing')
         with open(self.opt.output_file, 'w') as ofile:
             header = self._generate_header(self.opt.grouped)
             ofile.write(header)
             attr_names = [x.var_name for x in self.dataset_performance_measures.name_map]
-            if self.opt.grouped:
-                if self.opt.averaging == 'dataset':
-                    dataset_counts = None
-                    seq_length_sum_dataset = 0
-                for GID in (sorted(self.input_data.group_map.keys()) if self.opt.sort_output else self.input_data.group_map.keys()):
-                    group_performance_measures, group_counts, seq_length_sum_group = self.calculator.process_group(GID)
-                    row = GID
-                    for attr_name in attr_names:
-                        value = group_performance_measures.get_value(attr_name)
-                        value = '{:.4f}'.format(value) if type(value) != int else str(value)
-                        row += '\t' + value
-                    ofile.write(row + os.linesep)
-                    if self.opt.averaging == 'dataset':
-                        if dataset_counts is None:
-                            dataset_counts = group_counts
-                        else:
-                            dataset_counts += group_counts
-                        seq_length_sum_dataset += seq_length_sum_group
-                    else:
-                        self.dataset_performance_measures += group_performance_measures
-                groups_n = len(self.input_data.group_map)
-                if self.opt.averaging == 'dataset':
-                    dataset_counts /= seq_length_sum_dataset
-                    PerformanceCalculator(dataset_counts, self.dataset_performance_measures).calculate_performance_measures()
-                if not self.opt.clean:
-                    ofile.write('#' + '-' * (8 * (len(attr_names) + 1) - 1) + os.linesep)
-            else:
-                self.dataset_performance_measures = self.calculator.process_group('')[0]
-                groups_n = 0
-            ofile.write(self._produce_bottom_lines_string(self.dataset_performance_measures, attr_names, groups_n))
+            structured_output = StructuredOutput(self.opt, self.dataset_performance_measures.name_map) if StructuredOutput.is_requested(self.opt) else None
+            for group_idx, GID, group_performance_measures, group_counts, seq_length_sum_group in group_results:
+                if self.opt.grouped:
+                    ofile.write(self._produce_group_row_string(GID, group_performance_measures, attr_names))
+                    if structured_output is not None:
+                        structured_output.add_group(GID, group_performance_measures)
+                accumulator.add_group(group_performance_measures, group_counts, seq_length_sum_group)
+            if self.opt.grouped and (not self.opt.clean):
+                ofile.write('#' + '-' * (8 * (len(attr_names) + 1) - 1) + os.linesep)
+            self.dataset_performance_measures = accumulator.finalize()
+            ofile.write(self._produce_bottom_lines_string(accumulator, attr_names))
         if not self.opt.quiet:
             print("The output file '{}' with performance measures has been written".format(self.opt.output_file))
+        if structured_output is not None:
+            structured_output.write(accumulator)
+        if profiler is not None:
+            profiler.stop()
+        return accumulator
+    def process(self):
+        """Method to coordinate the input data processing and outputting"""
+        offsets = self._restore_checkpoint()
+        self._open_output_files(offsets)
+        if self.opt.shard is not None:
+            self._write_partial_state(list(self._calculate_groups()))
+            self._close_output_files()
+            if self.checkpoint is not None:
+                self.checkpoint.remove()
+            return None
+        if self.opt.output_file_windows:
+            self._open_windows_file(offsets['windows'] if offsets is not None else None)
+        accumulator = self.write_results(self._calculate_groups())
         self._close_output_files()
-            
\ No newline at end of file
+        if self.calculator.sequence_windows is not None:
+            self._close_windows_file()
+        profiler = self.global_state.profiler
+        if profiler is not None:
+            profiler.start('additional_outputs')
+        for mode_opt, group_results in self.extra_modes:
+            DataProcessor(mode_opt, self.global_state, self.input_data).write_results(group_results)
+        for level_idx in range(len(self.input_data.group_levels)):
+            self._write_group_level(level_idx)
+        if self.site_name_breakdown is not None:
+            self._write_site_name_breakdown_file()
+        if self.calculator.threshold_sweep is not None:
+            self._write_sweep_file()
+        if self.calculator.match_distances is not None:
+            self._write_match_distance_file()
+        if self.bootstrap is not None:
+            if profiler is not None:
+                profiler.switch('bootstrap')
+            self._write_bootstrap_file(accumulator)
+        if self.permutation_test is not None:
+            if profiler is not None:
+                profiler.switch('permutation_test')
+            self._write_permutation_file(accumulator)
+        if profiler is not None:
+            profiler.stop()
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+        return accumulator
+    def _open_windows_file(self, offset = None):
+        """Method to open the output file for the sliding windows, continuing it from the given offset if the run is resumed, and to set up their calculation"""
+        ofile = open_output_file(self.opt.output_file_windows, offset)
+        self.calculator.sequence_windows = SequenceWindows(self.opt, self.global_state, self.input_data, ofile, self.dataset_performance_measures.name_map)
+        if offset is not None:
+            return
+        ofile.write(self._generate_launch_info())
+        if not self.opt.clean:
+            units = 'symbols' if self.opt.time_unit == 'none' else 'time units'
+            ofile.write('# Residue-wise performance measures for the sliding windows of {} {} with the step of {} {} along every sequence'.format(self.opt.window[0], units, self.opt.window[1], units) + os.linesep)
+        self.calculator.sequence_windows.write_header()
+    def _close_windows_file(self):
+        """Method to close the output file for the sliding windows"""
+        self.calculator.sequence_windows.ofile.close()
+        if not self.opt.quiet:
+            print("The sliding window file '{}' has been written".format(self.opt.output_file_windows))
+    def _write_group_level(self, level_idx):
+        """Method to write the performance measures for the groups of a higher hierarchy level, rolled up from the sequence counts of their subgroups"""
+        level_opt = copy.copy(self.opt)
+        level_opt.averaging_modes = []
+        level_opt.output_file_sweep = ''
+        for dest in ('output_file', ) + tuple('output_file_' + x for x in StructuredOutput.formats):
+            if getattr(self.opt, dest):
+                root, extension = os.path.splitext(getattr(self.opt, dest))
+                setattr(level_opt, dest, '{}_level{}{}'.format(root, level_idx + 2, extension))
+        group_level = self.input_data.group_levels[level_idx]
+        group_results = []
+        for group_idx, parent_GID in enumerate(sorted(group_level.keys()) if self.opt.sort_output else list(group_level.keys())):
+            seq_records = []
+            SIDs = set()
+            for GID in group_level[parent_GID]:
+                for SID, seq_record in zip(self.input_data.group_map[GID], self.group_seq_records.get(GID, [])):
+                    if SID not in SIDs:
+                        SIDs.add(SID)
+                        seq_records.append(seq_record)
+            if seq_records:
+                group_results.append((group_idx, parent_GID) + self.calculator.aggregate_group(seq_records))
+        if not group_results:
+            error('No groups of the hierarchy level {} contain any retained groups'.format(level_idx + 2))
+        DataProcessor(level_opt, self.global_state, self.input_data).write_results(group_results)
+    def _write_site_name_breakdown_file(self):
+        """Method to write the dataset-wide performance measures for every site name"""
+        with open(self.opt.output_file_names, 'w') as ofile:
+            ofile.write(self._generate_launch_info())
+            if not self.opt.clean:
+                ofile.write('# Dataset-wide averages of the performance measures for the sites of every {}'.format('name pattern' if self.opt.site_name_patterns else 'name') + os.linesep)
+            self.site_name_breakdown.write(ofile, self.dataset_performance_measures.name_map)
+        if not self.opt.quiet:
+            print("The site name breakdown file '{}' has been written".format(self.opt.output_file_names))
+    def _write_sweep_file(self):
+        """Method to write the dataset-wide performance measures for the grid of thresholds"""
+        threshold_sweep = self.calculator.threshold_sweep
+        measures = self.dataset_performance_measures.name_map
+        if isinstance(threshold_sweep, OverlapSweep):
+            measures = [x for x in measures if x.var_name.startswith('site_')]
+        with open(self.opt.output_file_sweep, 'w') as ofile:
+            ofile.write(self._generate_launch_info())
+            if not self.opt.clean:
+                ofile.write('# Dataset-wide averages of the {}'.format(threshold_sweep.description) + os.linesep)
+            threshold_sweep.write(ofile, self.calculator, self.get_group_order() if self.opt.grouped else [''], measures)
+        if not self.opt.quiet:
+            print("The threshold sweep file '{}' has been written".format(self.opt.output_file_sweep))
+    def _write_match_distance_file(self):
+        """Method to write the dataset-wide distribution of the match distances"""
+        with open(self.opt.output_file_distances, 'w') as ofile:
+            ofile.write(self._generate_launch_info())
+            if not self.opt.clean:
+                ofile.write('# Numbers of the sites matched within the tolerance of {} symbols at every distance to their nearest partners'.format(self.opt.overlap_tolerance) + os.linesep)
+            self.calculator.match_distances.write(ofile)
+        if not self.opt.quiet:
+            print("The match distance file '{}' has been written".format(self.opt.output_file_distances))
+
+    def _write_bootstrap_file(self, accumulator):
+        """Method to write the bootstrap confidence intervals of the dataset-wide averages"""
+        measures = self.dataset_performance_measures.name_map
+        estimates = accumulator.get_bottom_line_values([x.var_name for x in measures])[0]
+        with open(self.opt.output_file_bootstrap, 'w') as ofile:
+            ofile.write(self._generate_launch_info())
+            if not self.opt.clean:
+                units = 'groups' if self.opt.grouped else 'sequences'
+                ofile.write('# Percentile confidence intervals ({:g}%) of the dataset-wide averages over {} resamples of the {} with replacement (seed {})'.format(self.opt.bootstrap_level * 100, self.opt.bootstrap, units, self.opt.bootstrap_seed) + os.linesep)
+            self.bootstrap.write(ofile, measures, estimates)
+        if not self.opt.quiet:
+            print("The bootstrap file '{}' has been written".format(self.opt.output_file_bootstrap))
+    def _write_permutation_file(self, accumulator):
+        """Method to write the permutation test of the dataset-wide averages"""
+        measures = self.dataset_performance_measures.name_map
+        observed = accumulator.get_bottom_line_values([x.var_name for x in measures])[0]
+        with open(self.opt.output_file_permutations, 'w') as ofile:
+            ofile.write(self._generate_launch_info())
+            if not self.opt.clean:
+                kept = 'lengths and the gaps between them' if self.opt.permutation_keep == 'gaps' else 'lengths'
+                message = '# Permutation test of the dataset-wide averages against {} random relocations of the sites of the {} within every sequence, keeping the site {} (seed {})'
+                ofile.write(message.format(self.opt.permutations, self.global_state.anno_name[2], kept, self.opt.permutation_seed) + os.linesep)
+            self.permutation_test.write(ofile, self.get_group_order() if self.opt.grouped else [''], measures, observed)
+        if not self.opt.quiet:
+            print("The permutation test file '{}' has been written".format(self.opt.output_file_permutations))
+
+class ShardMerger:
+    """Class to merge the partial results of all the shards into the output of a full run"""
+    version = 2
+    run_specific_options = ('shard', 'output_file', 'output_file_jsonl', 'output_file_npz', 'output_file_parquet', 'command_line', 'quiet', 'warnings', 'processes', 'progress', 'progress_interval',
+                            'checkpoint_file', 'checkpoint_interval', 'resume', 'profile_file', 'profile_memory', 'profile_groups')
+    def __init__(self, opt):
+        self.opt = opt
+    @staticmethod
+    def get_comparable_options(opt):
+        """Method to get the options which must be the same for all the shards, in a JSON-compatible form"""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in vars(opt).items() if key not in ShardMerger.run_specific_options}
+    @staticmethod
+    def get_fingerprint(options):
+        """Method to calculate the fingerprint of the options which must be the same for all the shards"""
+        return hashlib.sha256(json.dumps(options, sort_keys = True).encode('utf-8')).hexdigest()
+    @staticmethod
+    def _encode_value(value):
+        """Method to convert a measure value to a JSON-compatible one, with NaN stored as null"""
+        if isinstance(value, list):
+            return [ShardMerger._encode_value(x) for x in value]
+        if isinstance(value, np.integer):
+            return int(value)
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return float(value) if isinstance(value, np.floating) else value
+    @staticmethod
+    def encode_group(group_idx, GID, group_performance_measures, group_counts, seq_length_sum):
+        """Method to convert the results for a group to the compact form of the partial result file"""
+        group = {'idx': group_idx, 'GID': GID, 'length': int(seq_length_sum)}
+        group['measures'] = {x: ShardMerger._encode_value(getattr(group_performance_measures, x)) for x in group_performance_measures._attr_list}
+        if group_counts is not None:
+            group['counts'] = {x: ShardMerger._encode_value(value) for x, value in vars(group_counts).items() if not x.startswith('_')}
+        return group
+    @staticmethod
+    def decode_group(group, run_opt):
+        """Method to restore the results for a group from the compact form of the partial result file"""
+        group_performance_measures = PerformanceMeasures(run_opt.enrichment_count, run_opt.benchmark, run_opt.gross)
+        for attr, (value, count) in group['measures'].items():
+            setattr(group_performance_measures, attr, [float('nan') if value is None else value, count])
+        group_counts = None
+        if 'counts' in group:
+            group_counts = BasicEnrichmentMeasures() if run_opt.enrichment_count else BasicBooleanMeasures()
+            for attr, value in group['counts'].items():
+                setattr(group_counts, attr, value)
+        return group['idx'], group['GID'], group_performance_measures, group_counts, group['length']
+    def _read_partial_state(self, fname):
+        """Method to read a partial result file"""
+        if not os.path.isfile(fname):
+            error('The partial result file "{}" does not exist'.format(fname))
+        try:
+            with open(fname, 'r') as ifile:
+                partial_state = json.load(ifile)
+        except (ValueError, UnicodeDecodeError):
+            error('The file "{}" is not a valid partial result file'.format(fname))
+        if (not isinstance(partial_state, dict)) or (partial_state.get('version') != ShardMerger.version) or any(x not in partial_state for x in ('shard', 'fingerprint', 'options', 'groups')):
+            error('The file "{}" is not a valid partial result file'.format(fname))
+        if ShardMerger.get_fingerprint(partial_state['options']) != partial_state['fingerprint']:
+            error('The options stored in the partial result file "{}" do not match its fingerprint'.format(fname))
+        return partial_state
+    def process(self):
+        """Method to check the completeness of the shards and to write the merged output"""
+        partial_states = [self._read_partial_state(x) for x in self.opt.merge]
+        fingerprint = partial_states[0]['fingerprint']
+        shards_n = partial_states[0]['shard'][1]
+        shards = set()
+        for fname, partial_state in zip(self.opt.merge, partial_states):
+            shard_idx, shards_n_ = partial_state['shard']
+            if (shards_n_ != shards_n) or (partial_state['fingerprint'] != fingerprint):
+                error('The partial result file "{}" was produced with different options than "{}"'.format(fname, self.opt.merge[0]))
+            if shard_idx in shards:
+                error('The shard {}/{} is provided more than once'.format(shard_idx, shards_n))
+            shards.add(shard_idx)
+        missing = sorted(set(range(1, shards_n + 1)) - shards)
+        if missing:
+            error('The partial results of the following shards are missing: {}'.format(', '.join('{}/{}'.format(x, shards_n) for x in missing)))
+        merged_opt = argparse.Namespace(**partial_states[0]['options'])
+        for key in ShardMerger.run_specific_options:
+            setattr(merged_opt, key, getattr(self.opt, key))
+        merged_opt.shard = None
+        group_results = [ShardMerger.decode_group(x, merged_opt) for partial_state in partial_states for x in partial_state['groups']]
+        group_results.sort(key = itemgetter(0))
+        DataProcessor(merged_opt, GlobalState(merged_opt), None).write_results(group_results)
+
+class CheckpointManager:
+    """Class to save, at most once per interval, the results of the completed groups together with the offsets of the output files written sequence by sequence, and to restore them to resume an interrupted run"""
+    version = 1
+    def __init__(self, opt):
+        self.opt = opt
+        options = ShardMerger.get_comparable_options(opt)
+        options['shard'] = list(opt.shard) if opt.shard is not None else None
+        self.fingerprint = ShardMerger.get_fingerprint(options)
+        self.groups = []
+        self.completed_n = 0
+        self.next_save = time.perf_counter() + opt.checkpoint_interval
+    def load(self):
+        """Method to read the checkpoint of an interrupted run with the same options, if any, keeping the results of its completed groups"""
+        if not os.path.isfile(self.opt.checkpoint_file):
+            if not self.opt.quiet:
+                print("The checkpoint file '{}' does not exist, the run is started from the beginning".format(self.opt.checkpoint_file))
+            return None
+        try:
+            with open(self.opt.checkpoint_file, 'r') as ifile:
+                checkpoint = json.load(ifile)
+        except (ValueError, UnicodeDecodeError):
+            error('The file "{}" is not a valid checkpoint file'.format(self.opt.checkpoint_file))
+        if (not isinstance(checkpoint, dict)) or (checkpoint.get('version') != CheckpointManager.version) or any(x not in checkpoint for x in ('fingerprint', 'completed', 'groups', 'extra_modes', 'offsets')):
+            error('The file "{}" is not a valid checkpoint file'.format(self.opt.checkpoint_file))
+        if checkpoint['fingerprint'] != self.fingerprint:
+            error('The checkpoint file "{}" was produced with different options'.format(self.opt.checkpoint_file))
+        self.groups = checkpoint['groups']
+        self.completed_n = checkpoint['completed']
+        return checkpoint
+    def add_group(self, group_idx, GID, group_performance_measures, group_counts, seq_length_sum):
+        """Method to keep the results of a completed group"""
+        self.groups.append(ShardMerger.encode_group(group_idx, GID, group_performance_measures, group_counts, seq_length_sum))
+        self.completed_n = group_idx + 1
+    def is_due(self):
+        """Method to check if the interval since the last checkpoint has passed"""
+        return time.perf_counter() >= self.next_save
+    def save(self, extra_modes, offsets):
+        """Method to replace the checkpoint file with the current one at once, so that an interruption leaves the previous checkpoint intact"""
+        checkpoint = {'version': CheckpointManager.version, 'fingerprint': self.fingerprint, 'completed': self.completed_n, 'groups': self.groups, 'extra_modes': extra_modes,
+                      'offsets': offsets}
+        temp_filepath = self.opt.checkpoint_file + '.tmp'
+        with open(temp_filepath, 'w') as ofile:
+            json.dump(checkpoint, ofile, separators = (',', ':'))
+        os.replace(temp_filepath, self.opt.checkpoint_file)
+        self.next_save = time.perf_counter() + self.opt.checkpoint_interval
+    def remove(self):
+        """Method to remove the checkpoint file after the run is completed"""
+        if os.path.isfile(self.opt.checkpoint_file):
+            os.remove(self.opt.checkpoint_file)
+
+def _process_batch_job(job_idx):
+    """Function to process a single job of a batch run in a worker process"""
+    return BatchProcessor.current.process_job(job_idx)
+
+class BatchProcessor:
+    """Class to run a batch of comparisons listed in a manifest file, parsing every distinct input file only once"""
+    current = None
+    batch_keys = ('-M', '--manifest', '-P', '--processes')
+    def __init__(self, opt, arg_processor):
+        self.opt = opt
+        self.arg_processor = arg_processor
+        self.cache = InputDataCache()
+        self.jobs = []
+    def _get_common_args(self):
+        """Method to extract the options shared by all the jobs from the command line"""
+        common_args = []
+        skip_next = False
+        for arg in self.opt.command_line:
+            if skip_next:
+                skip_next = False
+                continue
+            if arg in BatchProcessor.batch_keys:
+                skip_next = True
+                continue
+            if arg.split('=')[0] in BatchProcessor.batch_keys:
+                continue
+            common_args.append(arg)
+        return common_args
+    def _read_manifest(self):
+        """Method to read the lists of command line options for all the jobs from the manifest file"""
+        if not os.path.isfile(self.opt.manifest):
+            error('The manifest file does not exist')
+        with open(self.opt.manifest, 'r') as ifile:
+            content = ifile.read()
+        job_args = []
+        if self.opt.manifest.endswith('.json') or content.lstrip().startswith('['):
+            try:
+                records = json.loads(content)
+            except ValueError as e:
+                error('The manifest file "{}" is not a valid JSON: {}'.format(self.opt.manifest, str(e)))
+            if not isinstance(records, list):
+                error('The manifest file "{}" must contain a list of jobs'.format(self.opt.manifest))
+            for record in records:
+                if isinstance(record, str):
+                    job_args.append(shlex.split(record))
+                elif isinstance(record, list):
+                    job_args.append([str(x) for x in record])
+                elif isinstance(record, dict):
+                    args = []
+                    for key, value in record.items():
+                        if (value is False) or (value is None):
+                            continue
+                        args.append(key)
+                        if isinstance(value, list):
+                            args.extend(str(x) for x in value)
+                        elif value is not True:
+                            args.append(str(value))
+                    job_args.append(args)
+                else:
+                    error('Invalid job record in the manifest file "{}": {}'.format(self.opt.manifest, record))
+        else:
+            for line_idx, line in enumerate(content.splitlines()):
+                if (not line.strip()) or line.lstrip().startswith('#'):
+                    continue
+                try:
+                    job_args.append(shlex.split(line))
+                except ValueError as e:
+                    error('Error while parsing the line {} of the manifest file "{}". {}'.format(line_idx + 1, self.opt.manifest, str(e)))
+        if not job_args:
+            error('The manifest file "{}" does not contain any jobs'.format(self.opt.manifest))
+        return job_args
+    def _prepare_jobs(self):
+        """Method to validate the options of all the jobs and to parse the input data required by them"""
+        common_args = self._get_common_args()
+        output_files = set()
+        for job_idx, args in enumerate(self._read_manifest()):
+            job_opt = self.arg_processor.prepare_input_options(common_args + args)
+            if job_opt.manifest:
+                error('Job {} of the manifest: nested manifest files are not supported'.format(job_idx + 1))
+            if (len(job_opt.anno2_files) > 1) or job_opt.all_vs_all:
+                error('Job {} of the manifest: several files with the second annotation are not supported within a job'.format(job_idx + 1))
+            if job_opt.output_file in output_files:
+                error('Job {} of the manifest: the output file "{}" is already used by another job'.format(job_idx + 1, job_opt.output_file))
+            output_files.add(job_opt.output_file)
+            global_state = GlobalState(job_opt)
+            file_parser = CSVParser(job_opt, global_state)
+            input_data = InputFileProcessor(job_opt, file_parser, self.cache).process_input_files()
+            self.jobs.append((job_opt, global_state, input_data))
+    def process_job(self, job_idx):
+        """Method to calculate and save the performance measures for a single job"""
+        job_opt, global_state, input_data = self.jobs[job_idx]
+        try:
+            DataProcessor(job_opt, global_state, input_data).process()
+        except SystemExit:
+            return job_idx, False
+        return job_idx, True
+    def _run_jobs(self):
+        """Method to process all the jobs over the pool of worker processes and to collect their results in the job order"""
+        BatchProcessor.current = self
+        job_indices = range(len(self.jobs))
+        processes = min(self.opt.processes, len(self.jobs))
+        if processes > 1:
+            try:
+                context = multiprocessing.get_context('fork')
+            except ValueError:
+                context = None
+                if self.opt.warnings:
+                    print('Warning: worker processes are not supported on this platform. The jobs are processed sequentially')
+        if (processes > 1) and (context is not None):
+            with context.Pool(processes) as pool:
+                statuses = list(pool.imap_unordered(_process_batch_job, job_indices))
+        else:
+            statuses = [self.process_job(job_idx) for job_idx in job_indices]
+        return sorted(statuses, key = itemgetter(0))
+    def process(self):
+        """Method to coordinate processing of all the jobs of the manifest"""
+        self._prepare_jobs()
+        failed = [job_idx + 1 for job_idx, success in self._run_jobs() if not success]
+        if failed:
+            error('The following jobs of the manifest have failed: {}'.format(', '.join(str(x) for x in failed)))
+        if not self.opt.quiet:
+            print('All {} jobs of the manifest have been processed'.format(len(self.jobs)))
+
+class MultiPredictionProcessor(BatchProcessor):
+    """Class to evaluate several predictions against the same first annotation, parsing and indexing the latter only once"""
+    output_keys = (('-o', 'output_file'), ('-od', 'output_file_detailed'), ('-os', 'output_file_site'), ('-ou', 'output_file_union'), ('-oi', 'output_file_intersection'),
+                   ('-oc1', 'output_file_complement1'), ('-oc2', 'output_file_complement2'), ('-ore1', 'output_file_re1'), ('-ore2', 'output_file_re2'), ('-osw', 'output_file_sweep'), ('-on', 'output_file_names'),
+                   ('-ow', 'output_file_windows'), ('-odi', 'output_file_distances'), ('-obs', 'output_file_bootstrap'),
+                   ('-opm', 'output_file_permutations'), ('-oj', 'output_file_jsonl'), ('-onp', 'output_file_npz'), ('-opq', 'output_file_parquet'))
+    def __init__(self, opt, arg_processor):
+        BatchProcessor.__init__(self, opt, arg_processor)
+        self.predictor_names = []
+        self.benchmark_indices = None
+    def _get_predictor_names(self):
+        """Method to derive unique predictor names from the names of the prediction files"""
+        names = []
+        for fname in self.opt.anno2_files:
+            name = os.path.splitext(os.path.basename(fname))[0]
+            if name in names:
+                name = '{}_{}'.format(name, len(names) + 1)
+            names.append(name)
+        return names
+    def _get_job_args(self, fname, predictor_name):
+        """Method to form the command line options for the evaluation of a single prediction, with the output files named after the predictor"""
+        args = self.opt.command_line + ['-a2', fname]
+        for key, dest in MultiPredictionProcessor.output_keys:
+            filepath = getattr(self.opt, dest)
+            if filepath:
+                root, extension = os.path.splitext(filepath)
+                args += [key, '{}_{}{}'.format(root, predictor_name, extension)]
+        return args
+    def _parse_job(self, job_idx):
+        """Method to parse the input data of a job unless it is already parsed"""
+        job = self.jobs[job_idx]
+        if job[2] is None:
+            job[1] = GlobalState(job[0])
+            job[2] = InputFileProcessor(job[0], CSVParser(job[0], job[1]), self.cache).process_input_files()
+        return job
+    def _build_benchmark_indices(self, input_data):
+        """Method to index the first annotation in every sequence before the predictions are evaluated"""
+        self.benchmark_indices = {}
+        for GID, SIDs in input_data.group_map.items():
+            for SID in SIDs:
+                current_seq = CurrentSequence(GID, SID, input_data.seq_len[SID], [None, input_data.sites[1][GID][SID], None])
+                self.benchmark_indices[(GID, SID)] = AnnotationIndex(current_seq.sites[1], current_seq.length, self.opt.circular)
+    def _prepare_jobs(self):
+        """Method to validate the options for every prediction and to parse the first annotation, leaving the predictions to be parsed by the workers"""
+        self.predictor_names = self._get_predictor_names()
+        for fname, predictor_name in zip(self.opt.anno2_files, self.predictor_names):
+            self.jobs.append([self.arg_processor.prepare_input_options(self._get_job_args(fname, predictor_name)), None, None])
+        input_data = self._parse_job(0)[2]
+        if self.cache.annotations_are_independent(self.opt) and (self.opt.engine != 'differential'):
+            self._build_benchmark_indices(input_data)
+    def process_job(self, job_idx):
+        """Method to evaluate a single prediction and to get its dataset-wide averages"""
+        try:
+            job_opt, global_state, input_data = self._parse_job(job_idx)
+            accumulator = DataProcessor(job_opt, global_state, input_data, self.benchmark_indices).process()
+        except SystemExit:
+            return job_idx, None
+        attr_names = [x.var_name for x in accumulator.performance_measures.name_map]
+        return job_idx, accumulator.get_bottom_line_values(attr_names)[0]
+    def _write_summary(self, results):
+        """Method to write the table of the dataset-wide averages for all the predictions"""
+        measures = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross).name_map
+        with open(self.opt.output_file, 'w') as ofile:
+            if not self.opt.clean:
+                ofile.write("# This file was generated at {} with SLALOM".format(str(datetime.datetime.now())[: -7]) + os.linesep)
+                ofile.write('# Command line options (unquoted and unescaped): ' + ' '.join(self.opt.command_line) + os.linesep)
+                ofile.write('# Dataset-wide averages of the performance measures for every prediction evaluated against "{}"'.format(self.opt.anno1) + os.linesep)
+            ofile.write('\t'.join(['Predictor'] + [x.displayed_name for x in measures]) + os.linesep)
+            for job_idx, averages in results:
+                row = self.predictor_names[job_idx]
+                for value in averages:
+                    row += '\t' + DataProcessor._format_average(value)
+                ofile.write(row + os.linesep)
+        if not self.opt.quiet:
+            print("The output file '{}' with performance measures for all the predictions has been written".format(self.opt.output_file))
+    def process(self):
+        """Method to coordinate evaluation of all the predictions"""
+        self._prepare_jobs()
+        results = self._run_jobs()
+        failed = [self.opt.anno2_files[job_idx] for job_idx, averages in results if averages is None]
+        if failed:
+            error('The evaluation of the following predictions has failed: {}'.format(', '.join(failed)))
+        self._write_summary(results)
+
+class AllVsAllProcessor(MultiPredictionProcessor):
+    """Class to compare all the annotations pairwise, classifying the symbols of every sequence by all the annotations at once"""
+    max_annotations_n = 62
+    measure_names = (('F1', 'f1'), ('MCC', 'mcc'), ('Jaccard', 'pc'))
+    def _prepare_jobs(self):
+        """Method to validate the options for every annotation file and to parse all of them"""
+        self.predictor_names = self._get_predictor_names()
+        for job_idx, (fname, predictor_name) in enumerate(zip(self.opt.anno2_files, self.predictor_names)):
+            self.jobs.append([self.arg_processor.prepare_input_options(self._get_job_args(fname, predictor_name)), None, None])
+            self._parse_job(job_idx)
+    def _get_annotation_names(self):
+        """Method to get the unique names of all the compared annotations"""
+        name = os.path.splitext(os.path.basename(self.opt.anno1))[0]
+        return [name + '_1' if name in self.predictor_names else name] + self.predictor_names
+    def _get_shared_symbols(self, annotation_indices, seq_length):
+        """Method to calculate numbers of symbols covered by every pair of annotations in a sequence from the unique coverage patterns"""
+        codes = np.zeros(shape = seq_length, dtype = 'i8')
+        for k, annotation_index in enumerate(annotation_indices):
+            codes |= (annotation_index.coverage > 0).astype('i8') << k
+        patterns, counts = np.unique(codes, return_counts = True)
+        bits = (patterns[:, None] >> np.arange(len(annotation_indices))) & 1
+        return bits.T @ (bits * counts[:, None])
+    def _get_pair_counts(self, shared_symbols, a, b, seq_length):
+        """Method to form the basic Boolean measures for a pair of annotations in a sequence"""
+        results = BasicBooleanMeasures()
+        results.pp = shared_symbols[a, b]
+        results.pp_ = [None, results.pp, results.pp]
+        results.pa = shared_symbols[a, a] - results.pp
+        results.ap = shared_symbols[b, b] - results.pp
+        results.aa = seq_length - results.pp - results.pa - results.ap
+        return results
+    def _check_site_match(self, overlapped_symbols, site_length, site_length_):
+        """Method to check if a site is sufficiently overlapped by a site of another annotation"""
+        if self.opt.overlap_apply == 'shortest':
+            site_length = min(site_length, site_length_)
+        elif self.opt.overlap_apply == 'longest':
+            site_length = max(site_length, site_length_)
+        return (overlapped_symbols >= self.opt.overlap_symbols) and (overlapped_symbols / site_length >= self.opt.overlap_part)
+    def _get_matched_sites(self, sites, seq_length):
+        """Method to count the sites of every annotation matched in every other annotation of a sequence by one sweep over the sites of all the annotations sorted by their begins"""
+        annotations_n = len(sites)
+        intervals = []
+        shifts = (-seq_length, 0, seq_length) if self.opt.circular else (0, )
+        for shift in shifts:
+            for k in range(annotations_n):
+                intervals.extend((site[0] + shift, site[1] + shift, k, site_idx) for site_idx, site in enumerate(sites[k]))
+        intervals.sort()
+        overlaps = {}
+        active = []
+        for begin, end, k, site_idx in intervals:
+            while active and (active[0][0] < begin):
+                heapq.heappop(active)
+            for end_, k_, site_idx_ in active:
+                key = (k, site_idx, k_, site_idx_) if (k, site_idx) <= (k_, site_idx_) else (k_, site_idx_, k, site_idx)
+                overlaps[key] = max(overlaps.get(key, 0), min(end, end_) - begin + 1)
+            heapq.heappush(active, (end, k, site_idx))
+        for k in range(annotations_n):
+            for site_idx, site in enumerate(sites[k]):
+                overlaps[(k, site_idx, k, site_idx)] = site[1] - site[0] + 1
+        matched = [[set() for x in sites[k]] for k in range(annotations_n)]
+        for (k, site_idx, k_, site_idx_), overlapped_symbols in overlaps.items():
+            site_length = sites[k][site_idx][1] - sites[k][site_idx][0] + 1
+            site_length_ = sites[k_][site_idx_][1] - sites[k_][site_idx_][0] + 1
+            if self._check_site_match(overlapped_symbols, site_length, site_length_):
+                matched[k][site_idx].add(k_)
+            if self._check_site_match(overlapped_symbols, site_length_, site_length):
+                matched[k_][site_idx_].add(k)
+        matched_sites = np.zeros((annotations_n, annotations_n), dtype = 'i8')
+        for k in range(annotations_n):
+            for annotations_matched in matched[k]:
+                for k_ in annotations_matched:
+                    matched_sites[k, k_] += 1
+        return matched_sites
+    def _add_site_counts(self, results, matched_sites, shared_symbols, sites, a, b):
+        """Method to add the site-wise counts for a pair of annotations in a sequence to its basic Boolean measures"""
+        for i, (k, k_) in ((1, (a, b)), (2, (b, a))):
+            results.site_m[i] = int(matched_sites[k, k_])
+            results.site_nm[i] = len(sites[k]) - results.site_m[i]
+            results.site_len[i] = int(shared_symbols[k, k])
+        return results
+    def _write_matrices(self, names, matrices):
+        """Method to write the similarity matrices to the output file"""
+        with open(self.opt.output_file, 'w') as ofile:
+            if not self.opt.clean:
+                ofile.write("# This file was generated at {} with SLALOM".format(str(datetime.datetime.now())[: -7]) + os.linesep)
+                ofile.write('# Command line options (unquoted and unescaped): ' + ' '.join(self.opt.command_line) + os.linesep)
+                ofile.write('# Dataset-wide averages of the pairwise similarity measures for all the annotations' + os.linesep)
+            for displayed_name, matrix in matrices:
+                ofile.write('\t'.join([displayed_name] + names) + os.linesep)
+                for name, row in zip(names, matrix):
+                    ofile.write('\t'.join([name] + ['{:.4f}'.format(x) for x in row]) + os.linesep)
+        if not self.opt.quiet:
+            print("The output file '{}' with the similarity matrices has been written".format(self.opt.output_file))
+    def process(self):
+        """Method to coordinate the pairwise comparison of all the annotations"""
+        self._prepare_jobs()
+        opt, global_state, input_data = self.jobs[0]
+        annotations = [input_data.sites[1]] + [job[2].sites[2] for job in self.jobs]
+        annotations_n = len(annotations)
+        pairs = [(a, b) for a in range(annotations_n) for b in range(a, annotations_n)]
+        pair_opt = copy.copy(opt)
+        pair_opt.benchmark = True
+        calculator = CalculationCoordinator(global_state, pair_opt, input_data, FileHandlers())
+        accumulators = {pair: DatasetAccumulator(pair_opt) for pair in pairs}
+        group_order = sorted(input_data.group_map.keys()) if opt.sort_output else list(input_data.group_map.keys())
+        for GID in group_order:
+            seq_records = {pair: [] for pair in pairs}
+            for SID in input_data.group_map[GID]:
+                seq_length = input_data.seq_len[SID]
+                sites = [x[GID][SID] for x in annotations]
+                annotation_indices = [AnnotationIndex(x, seq_length, opt.circular) for x in sites]
+                shared_symbols = self._get_shared_symbols(annotation_indices, seq_length)
+                if opt.all_vs_all_sites:
+                    matched_sites = self._get_matched_sites(sites, seq_length)
+                for a, b in pairs:
+                    seq_counts = self._get_pair_counts(shared_symbols, a, b, seq_length)
+                    if opt.all_vs_all_sites:
+                        seq_counts = self._add_site_counts(seq_counts, matched_sites, shared_symbols, sites, a, b)
+                    seq_records[(a, b)].append((seq_counts, seq_length))
+            for pair in pairs:
+                accumulators[pair].add_group(*calculator.aggregate_group(seq_records[pair]))
+        for accumulator in accumulators.values():
+            accumulator.finalize()
+        measure_names = AllVsAllProcessor.measure_names + ((('SiteF1', 'site_f1'), ) if opt.all_vs_all_sites else ())
+        matrices = []
+        for displayed_name, var_name in measure_names:
+            matrix = np.full((annotations_n, annotations_n), np.nan)
+            for (a, b), accumulator in accumulators.items():
+                matrix[a, b] = matrix[b, a] = accumulator.get_bottom_line_values([var_name])[0][0]
+            matrices.append((displayed_name, matrix))
+        self._write_matrices(self._get_annotation_names(), matrices)
@@ -0,0 +1,681 @@
+"""SLALOM (StatisticaL Analysis of Locus Overlap Method)
+Copyright (C) 2017  Roman Prytuliak
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/."""
+
+import os, sys, argparse, datetime, json, platform, shutil, subprocess, tempfile, time
+import numpy as np
+
+def error(message):
+    """Function for error reporting"""
+    sys.stderr.write('Error: {}\n'.format(message))
+    sys.stderr.flush()
+    sys.exit(1)
+
+class SyntheticDataGenerator:
+    """Class to generate a synthetic dataset of two annotations with a given size, site density, overlap density, group structure, circularity and time-series mode"""
+    time_format = '%m/%d/%Y %H:%M'
+    series_start = datetime.datetime(2015, 1, 1)
+    def __init__(self, opt):
+        self.opt = opt
+        self.rng = np.random.default_rng(opt.seed)
+    def _get_sites(self, seq_lengths, partner_sites = None):
+        """Method to draw the sites of every sequence, copying and shifting a part of the partner sites if given"""
+        sites_n = self.rng.poisson(self.opt.sites, size = len(seq_lengths))
+        seq_indices = np.repeat(np.arange(len(seq_lengths)), sites_n)
+        lengths = self.rng.integers(self.opt.site_length[0], self.opt.site_length[1] + 1, size = len(seq_indices))
+        begins = (self.rng.random(len(seq_indices)) * seq_lengths[seq_indices]).astype('i8') + 1
+        if partner_sites is not None:
+            copied = self.rng.random(len(seq_indices)) < self.opt.overlap
+            partner_seq_indices, partner_begins, partner_lengths = partner_sites
+            first_partner = np.searchsorted(partner_seq_indices, seq_indices)
+            partners_n = np.searchsorted(partner_seq_indices, seq_indices, side = 'right') - first_partner
+            copied &= partners_n > 0
+            partner_idx = first_partner[copied] + (self.rng.random(int(np.sum(copied))) * partners_n[copied]).astype('i8')
+            shifts = self.rng.integers(-self.opt.site_length[0] // 2, self.opt.site_length[0] // 2 + 1, size = len(partner_idx))
+            begins[copied] = np.clip(partner_begins[partner_idx] + shifts, 1, seq_lengths[seq_indices[copied]])
+            lengths[copied] = partner_lengths[partner_idx]
+        lengths = np.minimum(lengths, seq_lengths[seq_indices])
+        if not self.opt.circular:
+            begins = np.minimum(begins, seq_lengths[seq_indices] - lengths + 1)
+        return seq_indices, begins, lengths
+    def _format_time(self, minutes):
+        """Method to convert the numbers of minutes since the start of the time series to time strings"""
+        return [(SyntheticDataGenerator.series_start + datetime.timedelta(minutes = int(x))).strftime(SyntheticDataGenerator.time_format) for x in minutes]
+    def _write_table(self, filepath, columns):
+        """Method to write the columns of a table to a TSV file at once"""
+        with open(filepath, 'w') as ofile:
+            ofile.write(''.join('\t'.join(x) + '\n' for x in zip(*columns)))
+    def generate(self):
+        """Method to generate the dataset and to return the paths of its files"""
+        os.makedirs(self.opt.directory, exist_ok = True)
+        paths = {x: os.path.join(self.opt.directory, x + '.tsv') for x in ('len', 'map', 'anno1', 'anno2')}
+        seq_lengths = self.rng.integers(self.opt.seq_length[0], self.opt.seq_length[1] + 1, size = self.opt.sequences)
+        SIDs = ['seq{}'.format(x) for x in range(self.opt.sequences)]
+        if self.opt.time_series:
+            self._write_table(paths['len'], (SIDs, self._format_time(np.zeros(len(SIDs))), self._format_time(seq_lengths)))
+        else:
+            self._write_table(paths['len'], (SIDs, [str(x) for x in seq_lengths]))
+        if self.opt.groups:
+            group_indices = self.rng.integers(0, self.opt.groups, size = self.opt.sequences)
+            self._write_table(paths['map'], (SIDs, ['group{}'.format(x) for x in group_indices]))
+        else:
+            del paths['map']
+        sites = self._get_sites(seq_lengths)
+        for i in (1, 2):
+            seq_indices, begins, lengths = sites
+            if self.opt.time_series:
+                ends = self._format_time(begins + lengths - 1)
+                begins = self._format_time(begins - 1)
+            else:
+                ends = [str(x) for x in begins + lengths - 1]
+                begins = [str(x) for x in begins]
+            self._write_table(paths['anno{}'.format(i)], ([SIDs[x] for x in seq_indices], begins, ends))
+            if i == 1:
+                sites = self._get_sites(seq_lengths, sites)
+        return paths
+    @staticmethod
+    def get_slalom_args(paths, opt):
+        """Method to form the SLALOM options reading a generated dataset"""
+        args = ['-s', paths['len'], '-a1', paths['anno1'], '-a2', paths['anno2']]
+        if 'map' in paths:
+            args += ['-m', paths['map'], '-nOg']
+        if opt.circular:
+            args += ['-e', 'circular']
+        if opt.time_series:
+            args += ['-t', 'min']
+        return args
+
+class BenchmarkRunner:
+    """Class to run SLALOM in every mode over the synthetic datasets of every scale and to collect the run times and the times of its processing phases"""
+    modes = {'shortest': ['-Oa', 'shortest'], 'longest': ['-Oa', 'longest'], 'current': ['-Oa', 'current'], 'patched': ['-Oa', 'patched'],
+             'gross': ['-E', 'gross'], 'enrichment': ['-E', '1']}
+    variants = ('linear', 'circular', 'time')
+    def __init__(self, opt):
+        self.opt = opt
+        self.slalom_path = opt.slalom_path if opt.slalom_path else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'slalom.py')
+        self.profiling = self._check_profiling()
+    def _check_profiling(self):
+        """Method to check if the SLALOM revision to benchmark supports the profile (the option '-prof')"""
+        try:
+            result = subprocess.run([sys.executable, self.slalom_path, '-h'], capture_output = True, text = True)
+        except OSError:
+            return False
+        return '-prof' in result.stdout
+    def _get_git_commit(self):
+        """Method to get the current commit of the repository, if any"""
+        try:
+            result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd = os.path.dirname(os.path.abspath(self.slalom_path)), capture_output = True, text = True)
+        except OSError:
+            return None
+        return result.stdout.strip() if result.returncode == 0 else None
+    def _get_dataset_options(self, scale, variant, directory):
+        """Method to form the generator options for a dataset of a given scale and variant"""
+        sequences, seq_length = scale
+        return argparse.Namespace(directory = directory, sequences = sequences, seq_length = (seq_length // 2, seq_length * 3 // 2), sites = self.opt.sites,
+                                  site_length = self.opt.site_length, overlap = self.opt.overlap, groups = self.opt.groups, circular = variant == 'circular',
+                                  time_series = variant == 'time', seed = self.opt.seed)
+    def _run_slalom(self, args, directory):
+        """Method to run SLALOM, with the profile on if supported, and to return its wall-clock time and the profile (or the process time only), or None if the run fails"""
+        profile_path = os.path.join(directory, 'profile.json')
+        command = [sys.executable, self.slalom_path] + args + ['-o', os.path.join(directory, 'output.tsv'), '-q'] + (['-prof', profile_path] if self.profiling else [])
+        started = time.perf_counter()
+        result = subprocess.run(command, capture_output = True, text = True)
+        wall = time.perf_counter() - started
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'exit status {}'.format(result.returncode)
+        if not self.profiling:
+            return {'wall': wall, 'process_wall': wall}, None
+        with open(profile_path, 'r') as ifile:
+            profile = json.load(ifile)
+        profile['process_wall'] = wall
+        return profile, None
+    def _run_case(self, dataset_name, mode, args, directory):
+        """Method to run a case several times and to keep the fastest run, timed without the interpreter startup if the profile is supported"""
+        best = None
+        for repeat_idx in range(self.opt.repeats):
+            profile, message = self._run_slalom(args + BenchmarkRunner.modes[mode], directory)
+            if profile is None:
+                return {'dataset': dataset_name, 'mode': mode, 'error': message}
+            if (best is None) or (profile['wall'] < best['wall']):
+                best = profile
+        if not self.profiling:
+            return {'dataset': dataset_name, 'mode': mode, 'wall': best['wall'], 'process_wall': best['process_wall']}
+        return {'dataset': dataset_name, 'mode': mode, 'wall': best['wall'], 'process_wall': best['process_wall'], 'cpu': best['cpu'], 'peak_memory': best['peak_memory'],
+                'counts': best['counts'], 'phases': {x['phase']: x['wall'] for x in best['phases']}}
+    def run(self):
+        """Method to run all the cases and to write the results"""
+        directory = self.opt.keep if self.opt.keep else tempfile.mkdtemp(prefix = 'slalom_benchmark_')
+        results = []
+        if not (self.profiling or self.opt.quiet):
+            print('The SLALOM revision does not support the profile: the whole runs are timed, without the times of the processing phases')
+        try:
+            for scale in self.opt.scales:
+                for variant in self.opt.variants:
+                    dataset_name = '{}x{}_{}'.format(scale[0], scale[1], variant)
+                    dataset_directory = os.path.join(directory, dataset_name)
+                    dataset_opt = self._get_dataset_options(scale, variant, dataset_directory)
+                    started = time.perf_counter()
+                    paths = SyntheticDataGenerator(dataset_opt).generate()
+                    if not self.opt.quiet:
+                        print('The dataset {} has been generated in {:.1f} s'.format(dataset_name, time.perf_counter() - started))
+                    args = SyntheticDataGenerator.get_slalom_args(paths, dataset_opt)
+                    for mode in self.opt.modes:
+                        result = self._run_case(dataset_name, mode, args, dataset_directory)
+                        results.append(result)
+                        if not self.opt.quiet:
+                            if 'error' in result:
+                                print('    {}: failed ({})'.format(mode, result['error']))
+                            else:
+                                print('    {}: {:.3f} s'.format(mode, result['wall']))
+        finally:
+            if not self.opt.keep:
+                shutil.rmtree(directory, ignore_errors = True)
+        report = {'commit': self._get_git_commit(), 'date': str(datetime.datetime.now())[: -7], 'python': platform.python_version(), 'numpy': np.__version__,
+                  'machine': platform.platform(), 'repeats': self.opt.repeats, 'seed': self.opt.seed, 'profiled': self.profiling, 'results': results}
+        with open(self.opt.output_file, 'w') as ofile:
+            json.dump(report, ofile, indent = 1)
+        if not self.opt.quiet:
+            print("The benchmark results '{}' have been written".format(self.opt.output_file))
+
+class BenchmarkComparator:
+    """Class to compare the benchmark results of two commits case by case and phase by phase"""
+    def __init__(self, opt):
+        self.opt = opt
+    @staticmethod
+    def _read_results(filepath):
+        """Method to read the benchmark results indexed by the dataset and the mode"""
+        try:
+            with open(filepath, 'r') as ifile:
+                report = json.load(ifile)
+        except (OSError, ValueError):
+            error('The file "{}" is not a valid benchmark result file'.format(filepath))
+        return report, {(x['dataset'], x['mode']): x for x in report['results']}
+    def compare(self):
+        """Method to print the ratios of the new to the baseline times and to report whether any case or phase has slowed down beyond the tolerance"""
+        base_report, base = self._read_results(self.opt.baseline)
+        new_report, new = self._read_results(self.opt.new)
+        print('Baseline: {} ({}); new: {} ({})'.format(base_report['commit'], base_report['date'], new_report['commit'], new_report['date']))
+        time_key = 'wall' if base_report.get('profiled', True) and new_report.get('profiled', True) else 'process_wall'
+        if time_key == 'process_wall':
+            print('The whole runs are compared, since one of the revisions does not support the profile')
+        print('Dataset\tMode\tBaseline, s\tNew, s\tRatio\tSlower phases')
+        regressions_n = 0
+        for key in [x for x in new if x in base]:
+            base_result = base[key]
+            new_result = new[key]
+            if ('error' in base_result) or ('error' in new_result):
+                print('{}\t{}\t{}\t{}\t-\t-'.format(key[0], key[1], base_result.get(time_key, 'failed'), new_result.get(time_key, 'failed')))
+                regressions_n += 'error' in new_result
+                continue
+            ratio = new_result[time_key] / base_result[time_key]
+            slower_phases = []
+            for phase, wall in new_result.get('phases', {}).items():
+                base_wall = base_result.get('phases', {}).get(phase)
+                if base_wall and (wall >= self.opt.min_time) and (wall / base_wall > 1.0 + self.opt.tolerance):
+                    slower_phases.append('{} x{:.2f}'.format(phase, wall / base_wall))
+            regressions_n += ratio > 1.0 + self.opt.tolerance
+            print('{}\t{}\t{:.3f}\t{:.3f}\t{:.2f}\t{}'.format(key[0], key[1], base_result[time_key], new_result[time_key], ratio, ', '.join(slower_phases) if slower_phases else '-'))
+        missing = sorted(set(base) - set(new))
+        if missing:
+            print('Cases missing from the new results: {}'.format(', '.join('{} {}'.format(*x) for x in missing)))
+        if regressions_n:
+            print('{} case{} slower by more than {:g}% or failed'.format(regressions_n, '' if regressions_n == 1 else 's', self.opt.tolerance * 100))
+        return regressions_n
+
+class DifferentialTester:
+    """Class to run SLALOM with the differential engine over synthetic datasets in the modes and edge cases where the indexed engine must reproduce the reference one"""
+    cases = {'shortest': ['-Oa', 'shortest'], 'longest': ['-Oa', 'longest'], 'current': ['-Oa', 'current'], 'patched': ['-Oa', 'patched'], 'gross': ['-E', 'gross'],
+             'enrichment': ['-E', '1'], 'enrichment2': ['-E', '2'], 'benchmark': ['-b'], 'lagging': ['-b', '-On', 'lagging'], 'leading': ['-b', '-On', 'leading'],
+             'tolerance': ['-b', '-Ot', '5'], 'length_adjusted': ['-A'], 'na_zeros': ['-z', '-a', 'sequence'], 'sequence_averaged': ['-a', 'sequence']}
+    linear_cases = ('lagging', 'leading')
+    def __init__(self, opt):
+        self.opt = opt
+        self.slalom_path = opt.slalom_path if opt.slalom_path else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'slalom.py')
+    def _get_dataset_options(self, variant, seed, directory):
+        """Method to form the generator options for a dataset of a given variant and seed"""
+        return argparse.Namespace(directory = directory, sequences = self.opt.sequences, seq_length = self.opt.seq_length, sites = self.opt.sites, site_length = self.opt.site_length,
+                                  overlap = self.opt.overlap, groups = self.opt.groups, circular = variant == 'circular', time_series = variant == 'time', seed = seed)
+    def _run_case(self, args, directory):
+        """Method to run SLALOM with the differential engine and to return the error message, or None if the engines agree"""
+        command = [sys.executable, self.slalom_path] + args + ['-engine', 'differential', '-o', os.path.join(directory, 'output.tsv'), '-q']
+        result = subprocess.run(command, capture_output = True, text = True)
+        if result.returncode == 0:
+            return None
+        return result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'exit status {}'.format(result.returncode)
+    def run(self):
+        """Method to run all the cases over the datasets of every variant and seed, and to return the number of failed cases"""
+        directory = self.opt.keep if self.opt.keep else tempfile.mkdtemp(prefix = 'slalom_differential_')
+        failures_n = 0
+        cases_n = 0
+        try:
+            for variant in self.opt.variants:
+                for seed in range(self.opt.seed, self.opt.seed + self.opt.datasets):
+                    dataset_name = '{}_{}'.format(variant, seed)
+                    dataset_directory = os.path.join(directory, dataset_name)
+                    dataset_opt = self._get_dataset_options(variant, seed, dataset_directory)
+                    args = SyntheticDataGenerator.get_slalom_args(SyntheticDataGenerator(dataset_opt).generate(), dataset_opt)
+                    for case in self.opt.cases:
+                        if (variant == 'circular') and (case in DifferentialTester.linear_cases):
+                            continue
+                        message = self._run_case(args + DifferentialTester.cases[case], dataset_directory)
+                        cases_n += 1
+                        if message is not None:
+                            failures_n += 1
+                            print('{} {}: {}'.format(dataset_name, case, message))
+                        elif not self.opt.quiet:
+                            print('{} {}: the engines agree'.format(dataset_name, case))
+        finally:
+            if not self.opt.keep:
+                shutil.rmtree(directory, ignore_errors = True)
+        print('{} of {} cases failed'.format(failures_n, cases_n))
+        return failures_n
+
+class EquivalenceTester:
+    """Class to check over the test data and a synthetic dataset that the sharded, resumed, batch, multi-prediction and all-vs-all runs reproduce the single runs and that the one-to-one and tolerance matchers reproduce a brute-force matching"""
+    checks = ('shards', 'checkpoint', 'manifest', 'multi', 'all_vs_all', 'matchers')
+    launch_info = ('# This file was generated', '# Command line options')
+    matcher_cases = {'maximal': ['-Om', 'maximal'], 'maximal_part': ['-Om', 'maximal', '-Op', '0.5'], 'tolerance0': ['-Ot', '0'], 'tolerance10': ['-Ot', '10']}
+    def __init__(self, opt):
+        self.opt = opt
+        self.slalom_path = opt.slalom_path if opt.slalom_path else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'slalom.py')
+        self.test_data = opt.test_data if opt.test_data else os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_data')
+    def _get_datasets(self, directory):
+        """Method to list the datasets with their common options, their annotation files and the checks they are used in"""
+        test_data = lambda x: os.path.join(self.test_data, x)
+        datasets = [{'name': 'test_grouped', 'args': ['-s', test_data('test_seqlenfile1.tsv'), '-m', test_data('test_groupmapping.tsv')],
+                     'annotations': [test_data('test_anno3.tsv'), test_data('test_anno4.tsv')], 'checks': ('shards', 'manifest', 'multi', 'all_vs_all')},
+                    {'name': 'test_sequences', 'args': ['-s', test_data('test_seqlenfile1.tsv'), '-sg'],
+                     'annotations': [test_data('test_anno1.tsv'), test_data('test_anno2.tsv')], 'checks': ('shards', 'manifest', 'multi', 'all_vs_all', 'matchers')},
+                    {'name': 'test_benchmark', 'args': ['-s', test_data('test_seqlenfile3.tsv'), '-b'],
+                     'annotations': [test_data('test_anno_benchmark.tsv'), test_data('test_anno_prediction1.tsv'), test_data('test_anno_prediction2.tsv')],
+                     'checks': ('manifest', 'multi', 'all_vs_all', 'matchers')}]
+        dataset_opt = argparse.Namespace(directory = os.path.join(directory, 'synthetic'), sequences = self.opt.sequences, seq_length = self.opt.seq_length, sites = self.opt.sites,
+                                         site_length = self.opt.site_length, overlap = self.opt.overlap, groups = self.opt.groups, circular = False, time_series = False, seed = self.opt.seed)
+        paths = SyntheticDataGenerator(dataset_opt).generate()
+        #The same seed with another overlap gives the same sequences, groups and first annotation, and another second annotation
+        other_opt = argparse.Namespace(**dict(vars(dataset_opt), directory = os.path.join(directory, 'synthetic_other'), overlap = self.opt.overlap / 2))
+        other_paths = SyntheticDataGenerator(other_opt).generate()
+        args = SyntheticDataGenerator.get_slalom_args(paths, dataset_opt)
+        args = args[: 2] + args[6: ]
+        datasets.append({'name': 'synthetic', 'args': args, 'annotations': [paths['anno1'], paths['anno2'], other_paths['anno2']], 'checks': EquivalenceTester.checks})
+        return datasets
+    def _run_slalom(self, args):
+        """Method to run SLALOM and to return the error message, or None if the run succeeds"""
+        result = subprocess.run([sys.executable, self.slalom_path] + args + ['-q'], capture_output = True, text = True)
+        if result.returncode == 0:
+            return None
+        return result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'exit status {}'.format(result.returncode)
+    @staticmethod
+    def _read_output(filepath):
+        """Method to read the lines of an output file without the launch information, or None if the file does not exist"""
+        if not os.path.isfile(filepath):
+            return None
+        with open(filepath, 'r') as ifile:
+            return [x for x in ifile.read().splitlines() if not x.startswith(EquivalenceTester.launch_info)]
+    def _compare_outputs(self, filepath, filepath_):
+        """Method to compare two output files line by line and to return the description of the first difference, or None if they are the same"""
+        lines = self._read_output(filepath)
+        lines_ = self._read_output(filepath_)
+        for path, content in ((filepath, lines), (filepath_, lines_)):
+            if content is None:
+                return 'the file "{}" has not been written'.format(path)
+        for line_idx, (line, line_) in enumerate(zip(lines, lines_)):
+            if line != line_:
+                return 'the files "{}" and "{}" differ in the line {} (without the launch information): "{}" and "{}"'.format(filepath, filepath_, line_idx + 1, line, line_)
+        if len(lines) != len(lines_):
+            return 'the files "{}" and "{}" differ in the number of lines'.format(filepath, filepath_)
+        return None
+    def _read_table(self, filepath):
+        """Method to read the column names and the rows of the main output file, without the bottom lines"""
+        lines = [x for x in self._read_output(filepath) if not x.startswith('#')]
+        return lines[0].split('\t'), [x.split('\t') for x in lines[1: ]]
+    def _get_bottom_line(self, filepath):
+        """Method to read the dataset-wide averages of the main output file by the column names"""
+        lines = [x for x in self._read_output(filepath) if not x.startswith('#')]
+        return dict(zip(lines[0].split('\t'), lines[-1].split('\t')))
+    def _check_shards(self, dataset, directory):
+        """Method to check that the merged partial results of the shards reproduce the main output file of a single run"""
+        args = dataset['args'] + ['-a1', dataset['annotations'][0], '-a2', dataset['annotations'][1]]
+        message = self._run_slalom(args + ['-o', os.path.join(directory, 'single.tsv')])
+        shards_n = 3
+        partial_paths = [os.path.join(directory, 'shard{}.json'.format(k)) for k in range(1, shards_n + 1)]
+        for k, partial_path in enumerate(partial_paths):
+            message = message or self._run_slalom(args + ['-shard', '{}/{}'.format(k + 1, shards_n), '-o', partial_path])
+        message = message or self._run_slalom(['-merge'] + partial_paths + ['-o', os.path.join(directory, 'merged.tsv')])
+        return message or self._compare_outputs(os.path.join(directory, 'single.tsv'), os.path.join(directory, 'merged.tsv'))
+    def _get_checkpoint_args(self, dataset, directory):
+        """Method to form the options of a run with the main, detailed and site output files written to a given directory"""
+        return dataset['args'] + ['-a1', dataset['annotations'][0], '-a2', dataset['annotations'][1], '-o', os.path.join(directory, 'main.tsv'),
+                                  '-od', os.path.join(directory, 'detailed.txt'), '-os', os.path.join(directory, 'sites.tsv')]
+    def _check_checkpoint(self, dataset, directory):
+        """Method to check that a run killed after its first checkpoint and resumed reproduces the output files of an uninterrupted run"""
+        single_directory = os.path.join(directory, 'single')
+        resumed_directory = os.path.join(directory, 'resumed')
+        os.makedirs(single_directory, exist_ok = True)
+        os.makedirs(resumed_directory, exist_ok = True)
+        message = self._run_slalom(self._get_checkpoint_args(dataset, single_directory))
+        if message is not None:
+            return message
+        checkpoint_path = os.path.join(directory, 'checkpoint.json')
+        args = self._get_checkpoint_args(dataset, resumed_directory) + ['-ckpt', checkpoint_path, '-ckpti', '0']
+        process = subprocess.Popen([sys.executable, self.slalom_path] + args + ['-q'], stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        while (process.poll() is None) and (not os.path.isfile(checkpoint_path)):
+            time.sleep(0.002)
+        if process.poll() is not None:
+            return 'the run has been completed before its first checkpoint and could not be interrupted; a larger dataset is required'
+        process.kill()
+        process.wait()
+        message = self._run_slalom(args + ['-resume'])
+        for filename in ('main.tsv', 'detailed.txt', 'sites.tsv'):
+            message = message or self._compare_outputs(os.path.join(single_directory, filename), os.path.join(resumed_directory, filename))
+        return message
+    def _get_pairs(self, dataset):
+        """Method to get the pairs of the first annotation with every other annotation of a dataset"""
+        return [(dataset['annotations'][0], x) for x in dataset['annotations'][1: ]]
+    def _get_job_output_args(self, job_name, directory):
+        """Method to form the options of the main and site output files of a job written to a given directory"""
+        return ['-o', os.path.join(directory, job_name + '.tsv'), '-os', os.path.join(directory, job_name + '_sites.tsv')]
+    def _check_manifest(self, datasets, directory):
+        """Method to check that the jobs of a manifest run one by one and in two worker processes reproduce the single runs"""
+        jobs = []
+        for dataset in datasets:
+            for pair_idx, (anno1, anno2) in enumerate(self._get_pairs(dataset)):
+                jobs.append(('{}_{}'.format(dataset['name'], pair_idx), dataset['args'] + ['-a1', anno1, '-a2', anno2]))
+        single_directory = os.path.join(directory, 'single')
+        os.makedirs(single_directory, exist_ok = True)
+        message = None
+        for job_name, args in jobs:
+            message = message or self._run_slalom(args + self._get_job_output_args(job_name, single_directory))
+        for processes_n in (1, 2):
+            batch_directory = os.path.join(directory, 'batch{}'.format(processes_n))
+            os.makedirs(batch_directory, exist_ok = True)
+            manifest_path = os.path.join(batch_directory, 'manifest.json')
+            with open(manifest_path, 'w') as ofile:
+                json.dump([args + self._get_job_output_args(job_name, batch_directory) for job_name, args in jobs], ofile, indent = 1)
+            message = message or self._run_slalom(['-M', manifest_path, '-P', str(processes_n)])
+            for job_name, args in jobs:
+                for filename in (job_name + '.tsv', job_name + '_sites.tsv'):
+                    message = message or self._compare_outputs(os.path.join(single_directory, filename), os.path.join(batch_directory, filename))
+        return message
+    def _check_multi_prediction(self, dataset, directory):
+        """Method to check that the evaluation of several predictions reproduces the single runs, both the output files of every prediction and the summary table"""
+        predictions = dataset['annotations'][1: ] if len(dataset['annotations']) > 2 else dataset['annotations'][:: -1]
+        message = self._run_slalom(dataset['args'] + ['-a1', dataset['annotations'][0], '-a2'] + predictions + ['-o', os.path.join(directory, 'multi.tsv'),
+                                   '-os', os.path.join(directory, 'multi_sites.tsv')])
+        if message is not None:
+            return message
+        header, rows = self._read_table(os.path.join(directory, 'multi.tsv'))
+        for prediction, row in zip(predictions, rows):
+            name = row[0]
+            main_path = os.path.join(directory, 'single_{}.tsv'.format(name))
+            site_path = os.path.join(directory, 'single_{}_sites.tsv'.format(name))
+            message = message or self._run_slalom(dataset['args'] + ['-a1', dataset['annotations'][0], '-a2', prediction, '-o', main_path, '-os', site_path])
+            message = message or self._compare_outputs(main_path, os.path.join(directory, 'multi_{}.tsv'.format(name)))
+            message = message or self._compare_outputs(site_path, os.path.join(directory, 'multi_sites_{}.tsv'.format(name)))
+            if message is not None:
+                return message
+            averages = self._get_bottom_line(main_path)
+            for column_name, value in zip(header[1: ], row[1: ]):
+                if averages.get(column_name) != value:
+                    return 'the summary of the prediction "{}" has {} {} instead of {}'.format(name, column_name, value, averages.get(column_name))
+        if len(rows) != len(predictions):
+            return 'the summary has {} rows instead of {}'.format(len(rows), len(predictions))
+        return None
+    def _check_all_vs_all(self, dataset, directory):
+        """Method to check that every cell of the all-vs-all matrices reproduces the dataset-wide average of the pairwise run in the benchmark mode"""
+        args = [x for x in dataset['args'] if x not in ('-b', '-sg')]
+        annotations = dataset['annotations'] if len(dataset['annotations']) > 2 else dataset['annotations'] + dataset['annotations'][: 1]
+        message = self._run_slalom(args + ['-a1', annotations[0], '-a2'] + annotations[1: ] + ['-X', '-Xs', '-o', os.path.join(directory, 'matrices.tsv')])
+        if message is not None:
+            return message
+        matrices = {}
+        for line in [x for x in self._read_output(os.path.join(directory, 'matrices.tsv')) if not x.startswith('#')]:
+            values = line.split('\t')
+            if values[0] in ('F1', 'MCC', 'Jaccard', 'SiteF1'):
+                matrix = matrices[values[0]] = []
+            else:
+                matrix.append(values[1: ])
+        column_names = {'F1': 'F1', 'MCC': 'MCC', 'Jaccard': 'PC', 'SiteF1': 'SiteF1'}
+        for a in range(len(annotations)):
+            for b in range(a + 1, len(annotations)):
+                pair_path = os.path.join(directory, 'pair_{}_{}.tsv'.format(a, b))
+                message = self._run_slalom(args + ['-a1', annotations[a], '-a2', annotations[b], '-b', '-o', pair_path])
+                if message is not None:
+                    return message
+                averages = self._get_bottom_line(pair_path)
+                for displayed_name, column_name in column_names.items():
+                    value = float(matrices[displayed_name][a][b])
+                    value_ = float(averages[column_name])
+                    if not ((np.isnan(value) and np.isnan(value_)) or (abs(value - value_) <= 1e-3)):
+                        return 'the cell of the {} matrix for the annotations {} and {} is {} instead of {}'.format(displayed_name, a + 1, b + 1, value, value_)
+        return None
+    @staticmethod
+    def _read_sites(filepath):
+        """Method to read the sites of every sequence from an annotation file with the SID, the begin and the end in every line"""
+        sites = {}
+        with open(filepath, 'r') as ifile:
+            for line in ifile:
+                values = line.split()
+                sites.setdefault(values[0], []).append((int(values[1]), int(values[2])))
+        return sites
+    @staticmethod
+    def _augment(site_idx, adjacency, partners, visited):
+        """Method to search for an augmenting path from a site of the first annotation, rematching its partners recursively"""
+        for site_idx_ in adjacency[site_idx]:
+            if site_idx_ in visited:
+                continue
+            visited.add(site_idx_)
+            if (site_idx_ not in partners) or EquivalenceTester._augment(partners[site_idx_], adjacency, partners, visited):
+                partners[site_idx_] = site_idx
+                return True
+        return False
+    def _get_matched_sites(self, sites, case):
+        """Method to count the matched sites of both annotations in a sequence by brute force: every pair of sites is tried, and the maximal matching is grown by augmenting paths"""
+        if case.startswith('tolerance'):
+            tolerance = int(case[len('tolerance'): ])
+            return [None] + [sum(any(max(begin - end_, begin_ - end, 0) <= tolerance for begin_, end_ in sites[3 - i]) for begin, end in sites[i]) for i in (1, 2)]
+        part = 0.5 if case == 'maximal_part' else 0.0
+        adjacency = []
+        for begin, end in sites[1]:
+            adjacency.append([])
+            for site_idx_, (begin_, end_) in enumerate(sites[2]):
+                overlapped_symbols = min(end, end_) - max(begin, begin_) + 1
+                if (overlapped_symbols >= 1) and (overlapped_symbols / min(end - begin + 1, end_ - begin_ + 1) >= part):
+                    adjacency[-1].append(site_idx_)
+        partners = {}
+        matched_n = sum(self._augment(site_idx, adjacency, partners, set()) for site_idx in range(len(adjacency)))
+        return [None, matched_n, matched_n]
+    def _check_matchers(self, dataset, directory):
+        """Method to check that the site-wise counts of the maximal one-to-one and the tolerance matchers in every sequence reproduce the brute-force matching"""
+        anno1, anno2 = dataset['annotations'][: 2]
+        sites = [None] + [self._read_sites(x) for x in (anno1, anno2)]
+        args = dataset['args'][: 2] + ['-sg', '-a1', anno1, '-a2', anno2]
+        for case, case_args in EquivalenceTester.matcher_cases.items():
+            output_path = os.path.join(directory, '{}.tsv'.format(case))
+            message = self._run_slalom(args + case_args + ['-o', output_path])
+            if message is not None:
+                return message
+            header, rows = self._read_table(output_path)
+            column_indices = [None] + [header.index(x) for x in ('SiteN1m', 'SiteN2m')]
+            SIDs = set()
+            for row in rows[: -1]:
+                SIDs.add(row[0])
+                matched_n = self._get_matched_sites([None] + [sorted(sites[i].get(row[0], [])) for i in (1, 2)], case)
+                for i in (1, 2):
+                    if int(round(float(row[column_indices[i]]))) != matched_n[i]:
+                        return '{}: {} sites of the annotation {} in the sequence {} are matched instead of {}'.format(case, row[column_indices[i]], i, row[0], matched_n[i])
+            missing = (set(sites[1]) | set(sites[2])) - SIDs
+            if missing:
+                return '{}: the sequences {} are missing from the output'.format(case, ', '.join(sorted(missing)))
+        return None
+    def run(self):
+        """Method to run all the checks over every dataset they apply to, and to return the number of failed checks"""
+        directory = self.opt.keep if self.opt.keep else tempfile.mkdtemp(prefix = 'slalom_equivalence_')
+        failures_n = 0
+        checks_n = 0
+        try:
+            datasets = self._get_datasets(directory)
+            for check in self.opt.checks:
+                targets = [[x for x in datasets if check in x['checks']]] if check == 'manifest' else [x for x in datasets if check in x['checks']]
+                for target in targets:
+                    name = 'all' if check == 'manifest' else target['name']
+                    check_directory = os.path.join(directory, check, name)
+                    os.makedirs(check_directory, exist_ok = True)
+                    if check == 'shards':
+                        message = self._check_shards(target, check_directory)
+                    elif check == 'checkpoint':
+                        message = self._check_checkpoint(target, check_directory)
+                    elif check == 'manifest':
+                        message = self._check_manifest(target, check_directory)
+                    elif check == 'multi':
+                        message = self._check_multi_prediction(target, check_directory)
+                    elif check == 'all_vs_all':
+                        message = self._check_all_vs_all(target, check_directory)
+                    else:
+                        message = self._check_matchers(target, check_directory)
+                    checks_n += 1
+                    if message is not None:
+                        failures_n += 1
+                        print('{} {}: {}'.format(check, name, message))
+                    elif not self.opt.quiet:
+                        print('{} {}: the outputs agree'.format(check, name))
+        finally:
+            if not self.opt.keep:
+                shutil.rmtree(directory, ignore_errors = True)
+        print('{} of {} checks failed'.format(failures_n, checks_n))
+        return failures_n
+
+def parse_pair(value):
+    """Function to parse a pair of integers 'MIN:MAX' (or a single integer)"""
+    try:
+        values = [int(x) for x in value.split(':')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("'{}' is not an integer or a pair of integers 'MIN:MAX'".format(value)) from None
+    if (len(values) > 2) or (min(values) < 1) or (values[0] > values[-1]):
+        raise argparse.ArgumentTypeError("'{}' is not a positive integer or a pair of positive integers 'MIN:MAX'".format(value))
+    return values[0], values[-1]
+
+def parse_scales(value):
+    """Function to parse a comma-delimited list of scales 'SEQUENCESxLENGTH'"""
+    scales = []
+    for scale in value.split(','):
+        try:
+            sequences, seq_length = (int(x) for x in scale.split('x'))
+        except ValueError:
+            raise argparse.ArgumentTypeError("'{}' is not a scale 'SEQUENCESxLENGTH'".format(scale)) from None
+        if (sequences < 1) or (seq_length < 2):
+            raise argparse.ArgumentTypeError("'{}' is not a scale 'SEQUENCESxLENGTH'".format(scale))
+        scales.append((sequences, seq_length))
+    return scales
+
+def parse_choices(choices):
+    """Function to make a parser of a comma-delimited list of the given choices"""
+    def parse(value):
+        values = value.split(',')
+        for x in values:
+            if x not in choices:
+                raise argparse.ArgumentTypeError("'{}' is not one of {}".format(x, ', '.join(choices)))
+        return values
+    return parse
+
+def add_dataset_arguments(arg_parser):
+    """Function to add the options of the synthetic datasets shared by the generator and the benchmark"""
+    arg_parser.add_argument('-sites', '--sites', dest = 'sites', type = float, default = 5.0, help = 'Mean number of sites per sequence in every annotation (default: 5)')
+    arg_parser.add_argument('-sl', '--site_length', dest = 'site_length', type = parse_pair, default = (10, 100), help = "Range of the site lengths 'MIN:MAX' (default: 10:100)")
+    arg_parser.add_argument('-ov', '--overlap', dest = 'overlap', type = float, default = 0.5,
+                            help = 'Part of the sites of the second annotation copied from the first one with a small shift, the rest being placed at random (default: 0.5)')
+    arg_parser.add_argument('-g', '--groups', dest = 'groups', type = int, default = 0, help = 'Number of groups the sequences are randomly split into; 0 - no group mapping (default: 0)')
+    arg_parser.add_argument('-seed', '--seed', dest = 'seed', type = int, default = 0, help = 'Seed of the random number generator (default: 0)')
+
+if __name__ != '__main__':
+    sys.exit()
+
+arg_parser = argparse.ArgumentParser(description = 'Synthetic data generator and benchmark harness of SLALOM')
+subparsers = arg_parser.add_subparsers(dest = 'command')
+generate_parser = subparsers.add_parser('generate', help = 'Generate a synthetic dataset')
+generate_parser.add_argument('-d', '--directory', dest = 'directory', type = str, required = True, help = 'Output directory of the dataset')
+generate_parser.add_argument('-n', '--sequences', dest = 'sequences', type = int, default = 1000, help = 'Number of sequences (default: 1000)')
+generate_parser.add_argument('-l', '--seq_length', dest = 'seq_length', type = parse_pair, default = (500, 1500), help = "Range of the sequence lengths 'MIN:MAX' (default: 500:1500)")
+generate_parser.add_argument('-c', '--circular', dest = 'circular', action = 'store_true', help = 'Let the sites wrap around the ends of circular sequences')
+generate_parser.add_argument('-t', '--time_series', dest = 'time_series', action = 'store_true', help = 'Write the sequences and sites as time series in minutes')
+add_dataset_arguments(generate_parser)
+run_parser = subparsers.add_parser('run', help = 'Run the benchmark and save its results')
+run_parser.add_argument('-o', '--outfile', dest = 'output_file', type = str, required = True, help = 'Output JSON file with the benchmark results')
+run_parser.add_argument('-scales', '--scales', dest = 'scales', type = parse_scales, default = parse_scales('100x1000,1000x10000'),
+                        help = "Comma-delimited list of dataset scales 'SEQUENCESxLENGTH', the length being the mean sequence length (default: 100x1000,1000x10000)")
+run_parser.add_argument('-modes', '--modes', dest = 'modes', type = parse_choices(list(BenchmarkRunner.modes)), default = list(BenchmarkRunner.modes),
+                        help = 'Comma-delimited list of the modes to run: {} (default: all)'.format(', '.join(BenchmarkRunner.modes)))
+run_parser.add_argument('-variants', '--variants', dest = 'variants', type = parse_choices(BenchmarkRunner.variants), default = list(BenchmarkRunner.variants),
+                        help = 'Comma-delimited list of the dataset variants: {} (default: all)'.format(', '.join(BenchmarkRunner.variants)))
+run_parser.add_argument('-r', '--repeats', dest = 'repeats', type = int, default = 3, help = 'Number of runs of every case, the fastest one being kept (default: 3)')
+run_parser.add_argument('-keep', '--keep', dest = 'keep', type = str, default = '', help = 'Keep the generated datasets in the given directory (default: a temporary directory is removed)')
+run_parser.add_argument('-slalom', '--slalom', dest = 'slalom_path', type = str, default = '', help = 'SLALOM script to benchmark (default: slalom.py next to this script)')
+run_parser.add_argument('-q', '--quiet', dest = 'quiet', action = 'store_true', help = 'Quiet run: do not print progress')
+add_dataset_arguments(run_parser)
+compare_parser = subparsers.add_parser('compare', help = 'Compare the benchmark results of two commits; the exit status is 1 if any case is slower beyond the tolerance')
+compare_parser.add_argument('baseline', type = str, help = 'Baseline benchmark result file')
+compare_parser.add_argument('new', type = str, help = 'New benchmark result file')
+compare_parser.add_argument('-tol', '--tolerance', dest = 'tolerance', type = float, default = 0.1, help = 'Tolerated relative slowdown (default: 0.1)')
+compare_parser.add_argument('-min', '--min_time', dest = 'min_time', type = float, default = 0.01, help = 'Minimal time in seconds of a phase to be compared (default: 0.01)')
+diff_parser = subparsers.add_parser('diff', help = 'Check that the indexed engine reproduces the reference one over synthetic datasets; the exit status is 1 if any case diverges or fails')
+diff_parser.add_argument('-datasets', '--datasets', dest = 'datasets', type = int, default = 5, help = 'Number of datasets of every variant, generated with consecutive seeds (default: 5)')
+diff_parser.add_argument('-n', '--sequences', dest = 'sequences', type = int, default = 20, help = 'Number of sequences (default: 20)')
+diff_parser.add_argument('-l', '--seq_length', dest = 'seq_length', type = parse_pair, default = (20, 300), help = "Range of the sequence lengths 'MIN:MAX' (default: 20:300)")
+diff_parser.add_argument('-cases', '--cases', dest = 'cases', type = parse_choices(list(DifferentialTester.cases)), default = list(DifferentialTester.cases),
+                         help = 'Comma-delimited list of the cases to run: {} (default: all)'.format(', '.join(DifferentialTester.cases)))
+diff_parser.add_argument('-variants', '--variants', dest = 'variants', type = parse_choices(BenchmarkRunner.variants), default = list(BenchmarkRunner.variants),
+                         help = 'Comma-delimited list of the dataset variants: {} (default: all)'.format(', '.join(BenchmarkRunner.variants)))
+diff_parser.add_argument('-keep', '--keep', dest = 'keep', type = str, default = '', help = 'Keep the generated datasets in the given directory (default: a temporary directory is removed)')
+diff_parser.add_argument('-slalom', '--slalom', dest = 'slalom_path', type = str, default = '', help = 'SLALOM script to test (default: slalom.py next to this script)')
+diff_parser.add_argument('-q', '--quiet', dest = 'quiet', action = 'store_true', help = 'Quiet run: print only the failed cases')
+add_dataset_arguments(diff_parser)
+equiv_parser = subparsers.add_parser('equiv', help = 'Check that the sharded, resumed, batch, multi-prediction and all-vs-all runs and the site matchers reproduce the single runs or brute force; the exit status is 1 if any check fails')
+equiv_parser.add_argument('-td', '--test_data', dest = 'test_data', type = str, default = '', help = 'Directory with the test data (default: test_data next to the directory of this script)')
+equiv_parser.add_argument('-n', '--sequences', dest = 'sequences', type = int, default = 2000, help = 'Number of sequences of the synthetic dataset (default: 2000)')
+equiv_parser.add_argument('-l', '--seq_length', dest = 'seq_length', type = parse_pair, default = (50, 500), help = "Range of the sequence lengths 'MIN:MAX' (default: 50:500)")
+equiv_parser.add_argument('-checks', '--checks', dest = 'checks', type = parse_choices(EquivalenceTester.checks), default = list(EquivalenceTester.checks),
+                          help = 'Comma-delimited list of the checks to run: {} (default: all)'.format(', '.join(EquivalenceTester.checks)))
+equiv_parser.add_argument('-keep', '--keep', dest = 'keep', type = str, default = '', help = 'Keep the generated datasets and the outputs in the given directory (default: a temporary directory is removed)')
+equiv_parser.add_argument('-slalom', '--slalom', dest = 'slalom_path', type = str, default = '', help = 'SLALOM script to test (default: slalom.py next to this script)')
+equiv_parser.add_argument('-q', '--quiet', dest = 'quiet', action = 'store_true', help = 'Quiet run: print only the failed checks')
+add_dataset_arguments(equiv_parser)
+equiv_parser.set_defaults(groups = 20)
+opt = arg_parser.parse_args()
+
+if opt.command == 'generate':
+    if opt.circular and opt.time_series:
+        error('Time series cannot be circular')
+    if opt.sequences < 1:
+        error('The number of sequences must be positive')
+    paths = SyntheticDataGenerator(opt).generate()
+    print('The dataset has been generated. SLALOM options: {}'.format(' '.join(SyntheticDataGenerator.get_slalom_args(paths, opt))))
+elif opt.command == 'run':
+    if opt.repeats < 1:
+        error('The number of repeats must be positive')
+    BenchmarkRunner(opt).run()
+elif opt.command == 'diff':
+    if opt.datasets < 1:
+        error('The number of datasets must be positive')
+    sys.exit(1 if DifferentialTester(opt).run() else 0)
+elif opt.command == 'equiv':
+    if opt.sequences < 1:
+        error('The number of sequences must be positive')
+    if opt.groups < 1:
+        error('The synthetic dataset of the equivalence checks must be grouped')
+    sys.exit(1 if EquivalenceTester(opt).run() else 0)
+elif opt.command == 'compare':
+    sys.exit(1 if BenchmarkComparator(opt).compare() else 0)
+else:
+    arg_parser.print_help()
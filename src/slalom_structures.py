@@ -46,7 +46,7 @@ class DefaultOrderedDict(OrderedDict):
     def __copy__(self):
         return type(self)(self.default_factory, self)
     def __deepcopy__(self, memo):
-        return type(self)(self.default_factory, copy.deepcopy(self.items()))
+        return type(self)(self.default_factory, copy.deepcopy(list(self.items()), memo))
     def __repr__(self):
         return 'OrderedDefaultDict(%s, %s)' % (self.default_factory, OrderedDict.__repr__(self))
 
@@ -62,8 +62,10 @@ class InputData:
     def __init__(self):
         self.seq_len = {}
         self.time_series_starts = {}
+        self.time_format = None
         self.group_map = DefaultOrderedDict(list)
-        self.sites = (None, defaultdict(lambda: defaultdict(list)), defaultdict(lambda: defaultdict(list)))
+        self.group_levels = []
+        self.sites = [None, defaultdict(lambda: defaultdict(list)), defaultdict(lambda: defaultdict(list))]
 
 class GlobalState:
     """Class to hold the global state of the program"""
@@ -93,6 +95,8 @@ class GlobalState:
             self.time_unit_seconds = 3600 * 24
         else:
             self.time_unit_seconds = 0
+        self.profiler = None
+        self.progress = None
 
 class CurrentSequence:
     """Class to hold the information about the current sequence being processed"""